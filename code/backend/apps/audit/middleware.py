@@ -0,0 +1,18 @@
+from .signals import clear_thread_locals
+from .writer import start_audit_log_buffer, stop_audit_log_buffer
+
+
+class AuditLogBufferMiddleware:
+    """请求范围内缓冲审计日志，请求结束时批量写入"""
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        buffer_token = start_audit_log_buffer()
+        try:
+            return self.get_response(request)
+        finally:
+            stop_audit_log_buffer(buffer_token)
+            # 丢弃事务回滚后未提交的多对多变更记录
+            clear_thread_locals()
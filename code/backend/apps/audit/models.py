@@ -20,4 +20,8 @@ class AuditLog(BaseModel):
         db_table = 'audit_log'
         verbose_name = '审计日志'
         verbose_name_plural = verbose_name
-        ordering = ['-create_time']
\ No newline at end of file
+        ordering = ['-create_time']
+        indexes = [
+            # 游标分页按 (create_time, uuid) 倒序查找
+            models.Index(fields=['-create_time', '-uuid']),
+        ]
@@ -1,15 +1,17 @@
-from django.db.models.signals import pre_save, post_save, pre_delete, m2m_changed
+from django.db.models.signals import post_init, pre_save, post_save, pre_delete, m2m_changed
 from django.dispatch import receiver
+from django.db import transaction
 from django.db.models import Model
 
 from apps.myAuth.token_utils import TokenManager
 from lib.time_tools import utc_obj_to_time_zone_str
 from .models import AuditLog
-from lib.request_tool import get_authorization_token, get_current_request, get_client_ip
+from .writer import enqueue_audit_log, is_model_audited, should_sample_audit
+from lib.request_tool import get_authorization_token, get_current_request, get_client_ip, get_current_operator
 from lib.log import color_logger
 from datetime import datetime
+import copy
 import uuid
-from django.db import transaction
 from threading import local
 from decimal import Decimal
 
@@ -33,6 +35,14 @@ def get_operator_info():
     username = 'UNKNOWN'
     ip_address = 'UNKNOWN'
 
+    # 优先使用中间件已解析的操作者信息
+    operator = get_current_operator()
+    if operator is not None:
+        if operator[0] is None:
+            return None, None
+        return operator
+
+    # 未经过中间件（如 shell、脚本）时回退为从请求中解析
     request = get_current_request()
     if request is not None:
         username = TokenManager().get_username_from_access_token(get_authorization_token(request))
@@ -41,27 +51,22 @@ def get_operator_info():
             return None, None
         ip_address = get_client_ip(request)
     else:
-        color_logger.warning("当前请求中没有获取到请求对象")
+        # Celery 等后台写入没有请求对象，属于正常情况
+        color_logger.debug("当前请求中没有获取到请求对象")
         return None, None
 
     return username, ip_address
 
 def create_audit_log(username, model_name, record_id, action, detail, ip_address):
-    """创建审计日志"""
-    def _create():
-        try:
-            AuditLog.objects.create(
-                operator_username=username,
-                model_name=model_name,
-                record_id=record_id,
-                action=action,
-                detail=detail,
-                ip_address=ip_address
-            )
-        except Exception as e:
-            color_logger.error(f"创建审计日志失败: {str(e)}")
-
-    transaction.on_commit(_create)
+    """创建审计日志（事务提交后批量写入）"""
+    enqueue_audit_log({
+        'operator_username': username,
+        'model_name': model_name,
+        'record_id': record_id,
+        'action': action,
+        'detail': detail,
+        'ip_address': ip_address
+    })
 
 def serialize_value(value):
     """序列化值，处理特殊类型"""
@@ -94,74 +99,124 @@ def get_relation_changes(field, old_instance, new_instance):
             }
     return None
 
-def get_changes(old_instance, new_instance):
-    """获取实例变更的字段"""
+def _snapshot_value(value):
+    # JSONField 等可变值复制一份，避免保存前原地修改（如 obj.extra_probes.append）使快照一起变化
+    if isinstance(value, (dict, list)):
+        return copy.deepcopy(value)
+    return value
+
+def get_field_snapshot(instance):
+    """获取实例已加载字段的快照 {attname: value}（延迟加载的字段不包含在内）"""
+    instance_dict = instance.__dict__
+    return {
+        field.attname: _snapshot_value(instance_dict[field.attname])
+        for field in instance._meta.concrete_fields
+        if field.attname in instance_dict
+    }
+
+def get_changes(old_state, new_instance, update_fields=None):
+    """
+    获取实例变更的字段
+
+    :param old_state: 原始字段快照 {attname: value}，None 表示新建记录
+    :param new_instance: 当前实例
+    :param update_fields: save(update_fields=...) 指定的字段，只对比这些字段
+    """
     changes = {}
-    if not old_instance:
-        # 新建记录
-        for field in new_instance._meta.fields:
-            # 跳过 update_time 字段
-            if field.name == 'update_time':
-                continue
-            if field.is_relation:
-                relation_changes = get_relation_changes(field, None, new_instance)
-                if relation_changes:
-                    changes[field.name] = relation_changes
-            else:
+    new_state = new_instance.__dict__
+    for field in new_instance._meta.fields:
+        # 跳过 update_time 字段
+        if field.name == 'update_time':
+            continue
+        if update_fields is not None and field.name not in update_fields and field.attname not in update_fields:
+            continue
+        if field.attname not in new_state:
+            continue
+
+        new_value = new_state[field.attname]
+        if old_state is None:
+            # 新建记录
+            old_value = None
+        elif field.attname in old_state:
+            # 更新记录
+            old_value = old_state[field.attname]
+        else:
+            continue
+
+        if field.is_relation:
+            # 关系字段直接对比外键值，避免查询关联对象
+            if old_value != new_value:
                 changes[field.name] = {
-                    'old': None,
-                    'new': serialize_value(getattr(new_instance, field.name))
+                    'old': None if old_value is None else str(old_value),
+                    'new': None if new_value is None else str(new_value)
                 }
-    else:
-        # 更新记录
-        for field in new_instance._meta.fields:
-            # 跳过 update_time 字段
-            if field.name == 'update_time':
-                continue
-            if field.is_relation:
-                relation_changes = get_relation_changes(field, old_instance, new_instance)
-                if relation_changes:
-                    changes[field.name] = relation_changes
-            else:
-                old_value = getattr(old_instance, field.name)
-                new_value = getattr(new_instance, field.name)
-                if old_value != new_value:
-                    changes[field.name] = {
-                        'old': serialize_value(old_value),
-                        'new': serialize_value(new_value)
-                    }
+        elif old_state is None or old_value != new_value:
+            changes[field.name] = {
+                'old': serialize_value(old_value),
+                'new': serialize_value(new_value)
+            }
     return changes
 
+def refresh_field_snapshot(instance, base_state, update_fields=None):
+    """保存后的字段快照：update_fields 指定时只有这些字段以当前值为准"""
+    current_state = get_field_snapshot(instance)
+    if update_fields is None or base_state is None:
+        return current_state
+
+    saved_attnames = {
+        field.attname for field in instance._meta.concrete_fields
+        if field.name in update_fields or field.attname in update_fields
+    }
+    snapshot = dict(base_state)
+    snapshot.update({k: v for k, v in current_state.items() if k in saved_attnames})
+    return snapshot
+
+@receiver(post_init)
+def model_post_init(sender, instance, **kwargs):
+    """实例加载时记录字段快照，保存时在内存中对比，无需再查询原始数据"""
+    if not issubclass(sender, Model) or sender == AuditLog:
+        return
+
+    # 只在有操作者的请求中记录快照，后台批量加载（如 Celery 探活）不产生额外开销
+    operator = get_current_operator()
+    if not operator or not operator[0]:
+        return
+    if not is_model_audited(sender._meta.model_name):
+        return
+
+    instance._audit_snapshot = get_field_snapshot(instance)
+
 @receiver(pre_save)
 def model_pre_save(sender, instance, **kwargs):
     """保存前记录原始数据"""
     if not issubclass(sender, Model) or sender == AuditLog:
         return
-        
-    try:
-        # 获取原始实例
-        original_instance = type(instance).objects.get(pk=instance.pk)
-        instance._original_state = original_instance
-        color_logger.debug(f"pre_save: 获取到原始实例 {instance._meta.model_name}_{instance.pk}")
-        
-        # 记录多对多关系的原始状态
-        instance._original_m2m_state = {}
-        for field in instance._meta.many_to_many:
-            original_value = set(getattr(original_instance, field.name).all())
-            instance._original_m2m_state[field.name] = original_value
-            color_logger.debug(f"pre_save: 记录多对多字段 {field.name} 的原始状态: {[serialize_value(item) for item in original_value]}")
-
-        # 初始化多对多操作的标记
-        if hasattr(instance, '_m2m_add_pending'):
-            delattr(instance, '_m2m_add_pending')
-        if hasattr(instance, '_m2m_clear_pending'):
-            delattr(instance, '_m2m_clear_pending')
-        if hasattr(instance, '_m2m_remove_pending'):
-            delattr(instance, '_m2m_remove_pending')
-    except (type(instance).DoesNotExist, AttributeError):
+
+    # 不审计的模型、没有操作者的后台写入（如 Celery 探活）无需记录原始数据
+    if not is_model_audited(sender._meta.model_name):
+        return
+    if not get_operator_info()[0]:
+        return
+
+    update_fields = kwargs.get('update_fields')
+    instance._audit_update_fields = set(update_fields) if update_fields is not None else None
+
+    snapshot = getattr(instance, '_audit_snapshot', None)
+    if instance._state.adding:
+        # 新建记录（主键有默认值时 Django 直接 INSERT）
         instance._original_state = None
-        instance._original_m2m_state = {}
-        color_logger.debug(f"pre_save: 无法获取原始实例 {instance._meta.model_name}_{instance.pk}")
+    elif snapshot is not None:
+        instance._original_state = snapshot
+        color_logger.debug(f"pre_save: 使用加载时的字段快照 {instance._meta.model_name}_{instance.pk}")
+    else:
+        try:
+            # 没有快照（如手动构造的实例）时回退为查询原始数据
+            original_instance = type(instance).objects.get(pk=instance.pk)
+            instance._original_state = get_field_snapshot(original_instance)
+            color_logger.debug(f"pre_save: 获取到原始实例 {instance._meta.model_name}_{instance.pk}")
+        except (type(instance).DoesNotExist, AttributeError):
+            instance._original_state = None
+            color_logger.debug(f"pre_save: 无法获取原始实例 {instance._meta.model_name}_{instance.pk}")
 
 @receiver(post_save)
 def model_post_save(sender, instance, created, **kwargs):
@@ -169,6 +224,14 @@ def model_post_save(sender, instance, created, **kwargs):
     if not issubclass(sender, Model) or sender == AuditLog:
         return
 
+    if hasattr(instance, '_original_state'):
+        # 写入成功后才更新快照，同一实例再次保存时以本次保存的值为原始值（保存失败时保留原快照）
+        instance._audit_snapshot = refresh_field_snapshot(
+            instance, instance._original_state, getattr(instance, '_audit_update_fields', None))
+
+    if not should_sample_audit(sender._meta.model_name):
+        return
+
     try:
         username, ip_address = get_operator_info()
         if not username:
@@ -177,7 +240,11 @@ def model_post_save(sender, instance, created, **kwargs):
         color_logger.debug(f"post_save: 开始处理实例 {instance._meta.model_name}_{instance.pk}")
 
         # 获取普通字段的变更
-        changes = get_changes(getattr(instance, '_original_state', None), instance)
+        changes = get_changes(
+            getattr(instance, '_original_state', None),
+            instance,
+            update_fields=getattr(instance, '_audit_update_fields', None)
+        )
         color_logger.debug(f"post_save: 获取到普通字段变更: {changes}")
         
         # 过滤掉没有实际变化的字段
@@ -208,6 +275,8 @@ def model_pre_delete(sender, instance, **kwargs):
     """删除前记录"""
     if not issubclass(sender, Model) or sender == AuditLog:
         return
+    if not should_sample_audit(sender._meta.model_name):
+        return
 
     try:
         username, ip_address = get_operator_info()
@@ -236,134 +305,87 @@ def model_pre_delete(sender, instance, **kwargs):
     except Exception as e:
         color_logger.error(f"审计日志记录失败: {str(e)}")
 
+def _flush_m2m_change(instance, instance_key, field_name):
+    """事务提交后对比多对多字段的原始值和最终值，有实际变化时才记录审计日志"""
+    changes = get_thread_locals()
+    field_changes = changes.get(instance_key, {}).pop(field_name, None)
+    if instance_key in changes and not changes[instance_key]:
+        del changes[instance_key]
+    if field_changes is None:
+        # 同一事务中的多次变更已由第一个回调处理
+        return
+
+    try:
+        final_value = set(getattr(instance, field_name).values_list('pk', flat=True))
+        if final_value == field_changes['original']:
+            color_logger.debug(f"m2m_changed: 字段 {field_name} 没有实际变化，跳过记录")
+            return
+
+        detail = {
+            field_name: {
+                'old': [serialize_value(pk) for pk in field_changes['original']],
+                'new': [serialize_value(pk) for pk in final_value]
+            }
+        }
+        color_logger.info(f"多对多关系变更，开始记录审计日志: {detail}")
+        create_audit_log(
+            username=field_changes['username'],
+            model_name=instance._meta.model_name,
+            record_id=str(instance.pk),
+            action='UPDATE',
+            detail=detail,
+            ip_address=field_changes['ip_address']
+        )
+    except Exception as e:
+        color_logger.error(f"多对多关系审计日志记录失败: {str(e)}")
+
 @receiver(m2m_changed)
 def model_m2m_changed(sender, instance, action, pk_set, **kwargs):
-    """处理多对多关系变更"""
+    """
+    处理多对多关系变更
+
+    字段第一次变更前（pre_* 动作）记录原始值，事务提交后再读取最终值对比，
+    set() 产生的 remove/add、clear/add 等多次变更合并为一条审计日志，经缓冲区批量写入
+    """
     if not issubclass(sender, Model) or sender == AuditLog:
         return
+    if not action.startswith('pre_'):
+        return
+    if not is_model_audited(instance._meta.model_name):
+        return
 
     try:
         username, ip_address = get_operator_info()
         if not username:
             return
 
-        # 获取变更的字段名
+        # 找到变更的多对多字段（反向关系不记录）
         model_name = kwargs.get('model')._meta.model_name
-        color_logger.debug(f"m2m_changed: 当前处理的模型名: {model_name}")
-        color_logger.debug(f"m2m_changed: 当前实例类型: {instance._meta.model_name}")
-        color_logger.debug(f"m2m_changed: 当前动作: {action}")
-        color_logger.debug(f"m2m_changed: 变更的ID集合: {pk_set}")
-        
-        # 遍历实例的所有字段，找到对应的多对多字段
         field_name = None
-        color_logger.debug(f"m2m_changed: 实例的所有字段: {[field.name for field in instance._meta.fields]}")
-        color_logger.debug(f"m2m_changed: 实例的所有多对多字段: {[field.name for field in instance._meta.many_to_many]}")
-        
-        # 遍历多对多字段而不是所有字段
         for field in instance._meta.many_to_many:
-            related_model = field.related_model
-            color_logger.debug(f"m2m_changed: 检查字段: {field.name}, 关联模型: {related_model._meta.model_name}")
-            # 检查关联模型是否匹配
-            if related_model._meta.model_name == model_name:
+            if field.related_model._meta.model_name == model_name:
                 field_name = field.name
-                color_logger.debug(f"m2m_changed: 找到匹配的字段: {field_name}")
                 break
-        
         if not field_name:
             color_logger.warning(f"未找到对应的多对多字段: {model_name}")
-            color_logger.debug(f"m2m_changed: 当前实例: {instance}")
             return
 
-        field = getattr(instance, field_name)
-        
-        # 获取原始状态
-        original_m2m_state = getattr(instance, '_original_m2m_state', {})
-        original_value = original_m2m_state.get(field_name, set())
-        current_value = set(field.all())
-        
-        color_logger.debug(f"m2m_changed: 原始值: {[serialize_value(item) for item in original_value]}")
-        color_logger.debug(f"m2m_changed: 当前值: {[serialize_value(item) for item in current_value]}")
-        
-        # # 检查是否有实际变化
-        # 在 Django 的多对多关系处理中，当我们修改一个多对多字段时，Django 会先清空所有关系，然后重新添加。
-        # if original_value == current_value:
-        #     color_logger.debug(f"m2m_changed: 字段 {field_name} 没有实际变化，跳过记录")
-        #     return
-
-        # 获取线程本地存储
         changes = get_thread_locals()
         instance_key = f"{instance._meta.model_name}_{instance.pk}"
-        
-        # 初始化字段的状态记录
-        if instance_key not in changes:
-            changes[instance_key] = {}
-        if field_name not in changes[instance_key]:
-            changes[instance_key][field_name] = {
-                'original': original_value,
-                'states': [],
-                'audit_logs': []  # 记录每个字段创建的 audit log 对象
+        instance_changes = changes.setdefault(instance_key, {})
+        if field_name not in instance_changes:
+            instance_changes[field_name] = {
+                'original': set(getattr(instance, field_name).values_list('pk', flat=True)),
+                'username': username,
+                'ip_address': ip_address,
             }
-        
-        # 记录当前状态
-        changes[instance_key][field_name]['states'].append({
-            'action': action,
-            'value': current_value
-        })
-        
-        # 在最后一个操作时记录变更
-        if action in ["post_add", "post_clear"]:
-            field_changes = changes[instance_key][field_name]
-            final_value = field_changes['states'][-1]['value']
-            
-            # 记录最终变更
-            changes = {
-                field_name: {
-                    'old': [serialize_value(item) for item in field_changes['original']],
-                    'new': [serialize_value(item) for item in final_value]
-                }
-            }
-            color_logger.debug(f"m2m_changed: 记录最终变更 - 旧值: {changes[field_name]['old']}")
-            color_logger.debug(f"m2m_changed: 记录最终变更 - 新值: {changes[field_name]['new']}")
-            color_logger.info(f"多对多关系变更，开始记录审计日志: {changes}")
-
-            # 创建 audit log 对象
-            audit_log = AuditLog(
-                operator_username=username,
-                model_name=instance._meta.model_name,
-                record_id=str(instance.pk),
-                action='UPDATE',
-                detail=changes,
-                ip_address=ip_address
-            )
-            audit_log.save()
-            
-            # 记录 audit log 对象
-            field_changes['audit_logs'].append(audit_log)
-            
-            # 如果是 post_add，删除所有之前的记录
-            if action == "post_add":
-                for log in field_changes['audit_logs'][:-1]:  # 删除除最后一个之外的所有记录
-                    log.delete()
-                field_changes['audit_logs'] = [field_changes['audit_logs'][-1]]  # 只保留最后一个记录
-            
-                if final_value == original_value:
-                    color_logger.debug(f"m2m_changed: 字段 {field_name} 没有实际变化，删除审计日志")
-                    for log in field_changes['audit_logs']:
-                        log.delete()
-                    field_changes['audit_logs'] = []
-            
-            # 清理线程本地存储
-            try:
-                if instance_key in changes:
-                    if field_name in changes[instance_key]:
-                        del changes[instance_key][field_name]
-                    if not changes[instance_key]:
-                        del changes[instance_key]
-            except Exception as e:
-                color_logger.error(f"清理线程本地存储失败: {str(e)}")
+            color_logger.debug(f"m2m_changed: 记录多对多字段 {field_name} 的原始状态: {instance_changes[field_name]['original']}")
+
+        # 每次变更都注册回调：事务回滚时回调不会执行，下一次变更所在的事务仍能提交记录
+        transaction.on_commit(lambda: _flush_m2m_change(instance, instance_key, field_name))
 
     except Exception as e:
         color_logger.error(f"审计日志记录失败(外层): {str(e)}")
         color_logger.error(f"错误详情: {str(e.__class__.__name__)}")
         import traceback
-        color_logger.error(f"堆栈跟踪: {traceback.format_exc()}")
\ No newline at end of file
+        color_logger.error(f"堆栈跟踪: {traceback.format_exc()}")
@@ -0,0 +1,11 @@
+from celery import shared_task
+from lib.log import color_logger
+
+
+@shared_task
+def write_audit_logs_task(entries):
+    """异步批量写入审计日志"""
+    from .writer import bulk_create_audit_logs
+
+    color_logger.debug(f"异步写入审计日志: {len(entries)} 条")
+    bulk_create_audit_logs(entries)
@@ -1,3 +1,151 @@
+from django.db import connection
+from django.db.models.signals import pre_save
 from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
 
-# Create your tests here.
+from apps.monitor.models import BaseInfo
+from apps.perm.models import Permission, Role
+from lib.request_tool import reset_current_operator, set_current_operator
+from .models import AuditLog
+from .writer import _audit_log_buffer, flush_audit_log_buffer, start_audit_log_buffer
+
+
+class OperatorMixin:
+    """在有操作者的请求上下文中执行（与 AuditLogMiddleware 设置的一致）"""
+
+    def setUp(self):
+        super().setUp()
+        self._operator_token = set_current_operator('tester', '127.0.0.1')
+
+    def tearDown(self):
+        reset_current_operator(self._operator_token)
+        super().tearDown()
+
+
+class AuditSnapshotTest(OperatorMixin, TestCase):
+
+    def setUp(self):
+        super().setUp()
+        with self.captureOnCommitCallbacks(execute=True):
+            self.base_info = BaseInfo.objects.create(host='10.0.0.1', port=80, extra_probes=[{'type': 'http'}])
+
+    def _last_update_detail(self):
+        return AuditLog.objects.filter(
+            model_name='baseinfo', record_id=str(self.base_info.pk), action='UPDATE'
+        ).order_by('-create_time').first().detail
+
+    def test_in_place_json_mutation_is_diffed(self):
+        base_info = BaseInfo.objects.get(pk=self.base_info.pk)
+        base_info.extra_probes.append({'type': 'ssh'})
+        with self.captureOnCommitCallbacks(execute=True):
+            base_info.save(update_fields=['extra_probes'])
+
+        detail = self._last_update_detail()
+        self.assertEqual(detail['extra_probes']['old'], [{'type': 'http'}])
+        self.assertEqual(detail['extra_probes']['new'], [{'type': 'http'}, {'type': 'ssh'}])
+
+    def test_failed_save_keeps_snapshot(self):
+        base_info = BaseInfo.objects.get(pk=self.base_info.pk)
+
+        def fail_save(sender, instance, **kwargs):
+            raise RuntimeError('save failed')
+
+        base_info.port = 81
+        pre_save.connect(fail_save, sender=BaseInfo)
+        try:
+            with self.assertRaises(RuntimeError):
+                base_info.save()
+        finally:
+            pre_save.disconnect(fail_save, sender=BaseInfo)
+
+        # 上次保存未写入，再次保存仍以数据库中的值为原始值
+        with self.captureOnCommitCallbacks(execute=True):
+            base_info.save()
+        self.assertEqual(self._last_update_detail()['port'], {'old': 80, 'new': 81})
+
+
+class PostInitSnapshotBenchmark(TestCase):
+    """列表接口加载大量实例时 post_init 快照的开销"""
+
+    ROWS = 500
+
+    @classmethod
+    def setUpTestData(cls):
+        BaseInfo.objects.bulk_create([
+            BaseInfo(host=f'10.0.{i // 256}.{i % 256}', port=80, extra_probes=[{'type': 'http', 'path': '/'}])
+            for i in range(cls.ROWS)
+        ])
+
+    def _load(self):
+        with CaptureQueriesContext(connection) as queries:
+            instances = list(BaseInfo.objects.all())
+        return instances, len(queries)
+
+    def test_post_init_snapshot_cost(self):
+        _, plain_queries = self._load()
+
+        token = set_current_operator('tester', '127.0.0.1')
+        try:
+            instances, audited_queries = self._load()
+            self.assertEqual(len(instances), self.ROWS)
+            self.assertTrue(all(hasattr(instance, '_audit_snapshot') for instance in instances))
+            # 快照只在内存中记录，不产生额外查询
+            self.assertEqual(audited_queries, plain_queries)
+
+            # 保存时使用加载时的快照，不再从数据库重新读取原始值
+            instance = instances[0]
+            instance.port = 81
+            with CaptureQueriesContext(connection) as queries:
+                instance.save(update_fields=['port'])
+            base_info_selects = [
+                query['sql'] for query in queries.captured_queries
+                if query['sql'].startswith('SELECT') and BaseInfo._meta.db_table in query['sql']
+            ]
+            self.assertEqual(base_info_selects, [])
+        finally:
+            reset_current_operator(token)
+
+
+class M2MAuditTest(OperatorMixin, TestCase):
+    """多对多变更合并为一条审计日志，经缓冲区写入"""
+
+    def setUp(self):
+        super().setUp()
+        self.role = Role.objects.create(name='role', code='role')
+        self.permissions = [
+            Permission.objects.create(name=f'perm-{i}', code=f'perm-{i}', permission_json={}) for i in range(3)
+        ]
+        with self.captureOnCommitCallbacks(execute=True):
+            self.role.permissions.set(self.permissions[:2])
+        AuditLog.objects.all().delete()
+        self.buffer_token = start_audit_log_buffer()
+
+    def tearDown(self):
+        _audit_log_buffer.reset(self.buffer_token)
+        super().tearDown()
+
+    def _m2m_logs(self):
+        return AuditLog.objects.filter(model_name='role', record_id=str(self.role.pk), action='UPDATE')
+
+    def test_set_writes_one_buffered_log(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            self.role.permissions.set(self.permissions[1:])
+        # 请求结束前只进入缓冲区，没有逐条写入
+        self.assertEqual(self._m2m_logs().count(), 0)
+        with CaptureQueriesContext(connection) as queries:
+            flush_audit_log_buffer()
+        self.assertEqual(len([q for q in queries.captured_queries if q['sql'].startswith('INSERT')]), 1)
+        self.assertFalse([q for q in queries.captured_queries if q['sql'].startswith('DELETE')])
+
+        detail = self._m2m_logs().get().detail['permissions']
+        self.assertEqual(set(detail['old']), {str(p.pk) for p in self.permissions[:2]})
+        self.assertEqual(set(detail['new']), {str(p.pk) for p in self.permissions[1:]})
+
+    def test_no_real_change_is_not_written(self):
+        with CaptureQueriesContext(connection) as queries:
+            with self.captureOnCommitCallbacks(execute=True):
+                self.role.permissions.set(self.permissions[:2], clear=True)
+        flush_audit_log_buffer()
+        self.assertEqual(self._m2m_logs().count(), 0)
+        audit_table = AuditLog._meta.db_table
+        self.assertFalse([q for q in queries.captured_queries if audit_table in q['sql']])
@@ -1,13 +1,27 @@
 from django.shortcuts import render
 from django.db.models import Q
-from lib.request_tool import pub_success_response, pub_error_response, pub_get_request_body
+from lib.request_tool import pub_bool_check, pub_success_response, pub_error_response, pub_get_request_body
 from lib.log import color_logger
-from lib.paginator_tool import pub_paging_tool
+from lib.paginator_tool import is_cursor_paging, pub_cursor_paging_tool, pub_paging_tool
 from .models import AuditLog
 from lib.time_tools import utc_obj_to_time_zone_str
 
 # Create your views here.
 
+def format_audit_log_data(record: AuditLog):
+    """格式化审计日志数据"""
+    return {
+        'uuid': record.uuid,
+        'operator_username': record.operator_username,
+        'model_name': record.model_name,
+        'record_id': record.record_id,
+        'action': record.action,
+        'action_display': record.get_action_display(),
+        'detail': record.detail,
+        'ip_address': record.ip_address,
+        'create_time': utc_obj_to_time_zone_str(record.create_time)
+    }
+
 def get_audit_logs(request):
     """获取审计日志列表"""
     try:
@@ -49,27 +63,29 @@ def get_audit_logs(request):
             )
             
         # 分页处理
-        page = int(body.get('page', 1))
         page_size = int(body.get('page_size', 20))
-        
+
+        # 游标分页：大表深度翻页时不使用 OFFSET，不统计精确总数
+        if is_cursor_paging(body):
+            has_next, next_cursor, prev_cursor, total, records = pub_cursor_paging_tool(
+                query, body.get('cursor'), page_size,
+                with_count=pub_bool_check(body.get('with_count', False))
+            )
+            return pub_success_response({
+                'data': [format_audit_log_data(record) for record in records],
+                'total': total,
+                'has_next': has_next,
+                'next_cursor': next_cursor,
+                'prev_cursor': prev_cursor
+            })
+
+        page = int(body.get('page', 1))
         has_next, next_page, page_list, total, records = pub_paging_tool(
             page, query.order_by('-create_time'), page_size
         )
         
         # 构建返回数据
-        result = []
-        for record in records:
-            result.append({
-                'uuid': record.uuid,
-                'operator_username': record.operator_username,
-                'model_name': record.model_name,
-                'record_id': record.record_id,
-                'action': record.action,
-                'action_display': record.get_action_display(),
-                'detail': record.detail,
-                'ip_address': record.ip_address,
-                'create_time': utc_obj_to_time_zone_str(record.create_time)
-            })
+        result = [format_audit_log_data(record) for record in records]
         
         return pub_success_response({
             'data': result,
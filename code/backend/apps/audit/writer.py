@@ -0,0 +1,134 @@
+"""
+审计日志批量写入
+
+- 审计日志在事务提交后（on_commit）进入缓冲区，事务回滚的变更不会写入
+- 请求范围内的日志由 AuditLogBufferMiddleware 在请求结束时统一 bulk_create
+- 不在请求范围内（脚本、Celery 等）时提交后立即写入
+- 可配置为通过 Celery 异步写入
+- 按模型配置白名单/黑名单/采样率，跳过高频的系统写入
+"""
+import contextvars
+import random
+
+from django.db import transaction
+
+from backend.settings import config_data
+from lib.log import color_logger
+from .models import AuditLog
+
+# 当前请求的审计日志缓冲区，None 表示不在缓冲范围内
+_audit_log_buffer = contextvars.ContextVar('audit_log_buffer', default=None)
+
+# 模型名 -> 采样率 的解析结果缓存
+_model_sample_rates = {}
+
+
+def get_audit_config():
+    """获取审计配置"""
+    return config_data.get('AUDIT', {}) or {}
+
+
+def get_model_sample_rate(model_name):
+    """
+    获取模型的审计采样率
+
+    - 不在白名单（白名单非空时）或在黑名单中：0，不记录
+    - SAMPLE_RATES 中配置的值：按比例记录
+    - 其他：1，全部记录
+    """
+    sample_rate = _model_sample_rates.get(model_name)
+    if sample_rate is not None:
+        return sample_rate
+
+    audit_config = get_audit_config()
+    allow_models = set(audit_config.get('ALLOW_MODELS') or [])
+    deny_models = set(audit_config.get('DENY_MODELS') or [])
+    sample_rates = audit_config.get('SAMPLE_RATES') or {}
+
+    if (allow_models and model_name not in allow_models) or model_name in deny_models:
+        sample_rate = 0
+    else:
+        sample_rate = float(sample_rates.get(model_name, 1))
+
+    _model_sample_rates[model_name] = sample_rate
+    return sample_rate
+
+
+def is_model_audited(model_name):
+    """模型是否需要审计（不考虑采样）"""
+    return get_model_sample_rate(model_name) > 0
+
+
+def should_sample_audit(model_name):
+    """按采样率决定本次变更是否记录"""
+    sample_rate = get_model_sample_rate(model_name)
+    if sample_rate >= 1:
+        return True
+    if sample_rate <= 0:
+        return False
+    return random.random() < sample_rate
+
+
+def write_audit_logs(entries):
+    """批量写入审计日志"""
+    if not entries:
+        return
+
+    if get_audit_config().get('ASYNC_WRITE', False):
+        try:
+            from .tasks import write_audit_logs_task
+            write_audit_logs_task.delay(entries)
+            return
+        except Exception as e:
+            color_logger.error(f"审计日志投递Celery失败，改为同步写入: {str(e)}")
+
+    bulk_create_audit_logs(entries)
+
+
+def bulk_create_audit_logs(entries):
+    """bulk_create 写入审计日志"""
+    try:
+        AuditLog.objects.bulk_create(
+            [AuditLog(**entry) for entry in entries],
+            batch_size=get_audit_config().get('BATCH_SIZE', 100)
+        )
+    except Exception as e:
+        color_logger.error(f"批量创建审计日志失败: {str(e)}")
+
+
+def enqueue_audit_log(entry):
+    """事务提交后将审计日志放入缓冲区（不在缓冲范围内时直接写入）"""
+    def _enqueue():
+        buffer = _audit_log_buffer.get()
+        if buffer is None:
+            write_audit_logs([entry])
+            return
+
+        buffer.append(entry)
+        if len(buffer) >= get_audit_config().get('BATCH_SIZE', 100):
+            flush_audit_log_buffer()
+
+    transaction.on_commit(_enqueue)
+
+
+def start_audit_log_buffer():
+    """开始缓冲审计日志，返回用于 stop 的 token"""
+    return _audit_log_buffer.set([])
+
+
+def flush_audit_log_buffer():
+    """写入并清空当前缓冲区"""
+    buffer = _audit_log_buffer.get()
+    if not buffer:
+        return
+    entries = list(buffer)
+    buffer.clear()
+    write_audit_logs(entries)
+
+
+def stop_audit_log_buffer(token):
+    """写入剩余的审计日志并结束缓冲"""
+    try:
+        flush_audit_log_buffer()
+    finally:
+        _audit_log_buffer.reset(token)
@@ -4,3 +4,6 @@ from django.apps import AppConfig
 class MonitorConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'apps.monitor'
+
+    def ready(self):
+        from . import signals
@@ -1,17 +1,102 @@
 import asyncio
-import subprocess
+import re
+import time
 from typing import List, Dict, Any
 from lib.log import color_logger
+from .dns_resolver import DnsResolutionError, get_dns_resolver
+from .probe_runtime import get_subprocess_semaphore
+
+# 探测失败类型
+PROBE_ERROR_DNS = 'dns'          # 域名解析失败
+PROBE_ERROR_CONNECT = 'connect'  # 连接被拒绝/网络不可达等
+PROBE_ERROR_TIMEOUT = 'timeout'  # 超时无响应
+
+
+# 采样间隔（秒），非 root 用户 ping 的最小间隔为 0.2 秒
+PING_SAMPLE_INTERVAL = 0.2
+PORT_SAMPLE_INTERVAL = 0.2
+
+
+def summarize_rtt_samples(rtts: List[float], sample_count: int) -> Dict[str, Any]:
+    """
+    汇总多次采样的往返时间（毫秒）
+    jitter 为相邻两次采样差值的平均值
+    """
+    sample_count = max(sample_count, len(rtts), 1)
+    loss_percent = round((sample_count - len(rtts)) / sample_count * 100, 2)
+    if not rtts:
+        return {
+            'samples': sample_count,
+            'min_rtt': None,
+            'avg_rtt': None,
+            'max_rtt': None,
+            'jitter': None,
+            'loss_percent': loss_percent,
+        }
+    jitter = sum(abs(b - a) for a, b in zip(rtts, rtts[1:])) / (len(rtts) - 1) if len(rtts) > 1 else 0.0
+    return {
+        'samples': sample_count,
+        'min_rtt': min(rtts),
+        'avg_rtt': sum(rtts) / len(rtts),
+        'max_rtt': max(rtts),
+        'jitter': jitter,
+        'loss_percent': loss_percent,
+    }
 
 
 class AsyncProbeManager:
     """
     异步探针管理器，支持并发执行ping和端口检测
+
+    每次探测发送 sample_count 个采样，丢包率不超过 loss_threshold 时判定为健康；
+    判定为不健康时按 retry_count / retry_delay 重试（域名解析失败不重试）
     """
     
-    def __init__(self, timeout: int = 3):
+    def __init__(self, timeout: int = 3, ping_timeout: float = None, port_timeout: float = None,
+                 sample_count: int = 1, retry_count: int = 0, retry_delay: float = 0, loss_threshold: float = 0):
         self.timeout = timeout
-    
+        self.ping_timeout = ping_timeout or timeout
+        self.port_timeout = port_timeout or timeout
+        self.sample_count = max(int(sample_count), 1)
+        self.retry_count = max(int(retry_count), 0)
+        self.retry_delay = max(retry_delay, 0)
+        self.loss_threshold = loss_threshold
+
+    @classmethod
+    def from_probe_settings(cls, probe_settings: Dict[str, Any]) -> 'AsyncProbeManager':
+        """根据探活配置（ProbeConfig.get_probe_settings）创建"""
+        return cls(
+            ping_timeout=probe_settings['ping_timeout'],
+            port_timeout=probe_settings['port_timeout'],
+            sample_count=probe_settings['sample_count'],
+            retry_count=probe_settings['retry_count'],
+            retry_delay=probe_settings['retry_delay'],
+            loss_threshold=probe_settings['loss_threshold'],
+        )
+
+    async def _resolve(self, host: str):
+        """
+        解析主机名（共享缓存）
+        :return: (地址, 解析耗时(毫秒))
+        """
+        start_time = time.perf_counter()
+        addresses, _ = await get_dns_resolver().resolve(host)
+        return addresses[0], (time.perf_counter() - start_time) * 1000
+
+    async def _with_retries(self, probe, *args) -> Dict[str, Any]:
+        """执行探测，不健康时重试，返回最后一次的结果"""
+        result = await probe(*args)
+        attempts = 1
+        while not result['is_healthy'] and result['error_type'] != PROBE_ERROR_DNS and attempts <= self.retry_count:
+            await asyncio.sleep(self.retry_delay)
+            result = await probe(*args)
+            attempts += 1
+        result['attempts'] = attempts
+        return result
+
+    def _is_healthy(self, stats: Dict[str, Any]) -> bool:
+        return stats['avg_rtt'] is not None and stats['loss_percent'] <= self.loss_threshold
+
     async def ping_async(self, host: str) -> Dict[str, Any]:
         """
         异步ping检测
@@ -20,100 +105,146 @@ class AsyncProbeManager:
         - {
             'host': 主机地址,
             'is_healthy': 是否健康,
-            'response_time': 响应时间(毫秒),
+            'response_time': 响应时间(毫秒)，多次采样的平均值,
+            'min_rtt' / 'avg_rtt' / 'max_rtt' / 'jitter': 采样统计(毫秒),
+            'loss_percent': 丢包率(%),
+            'samples': 采样次数,
+            'attempts': 探测次数（含重试）,
+            'dns_time': 域名解析耗时(毫秒)，解析失败时为 None,
+            'error_type': 失败类型 dns / connect / timeout，成功时为 None,
             'error_message': 错误信息
         }
         """
+        return await self._with_retries(self._ping_once, host)
+
+    async def _ping_once(self, host: str) -> Dict[str, Any]:
+        dns_time = None
         try:
-            # 使用系统ping命令，更可靠
-            process = await asyncio.create_subprocess_exec(
-                'ping', '-c', '1', '-W', str(self.timeout), host,
-                stdout=asyncio.subprocess.PIPE,
-                stderr=asyncio.subprocess.PIPE
-            )
-            stdout, stderr = await asyncio.wait_for(process.communicate(), timeout=self.timeout + 1)
-            
-            is_healthy = process.returncode == 0
-            response_time = None
-            
-            # 从ping输出中提取响应时间
-            if is_healthy and stdout:
-                output = stdout.decode()
-                import re
-                match = re.search(r'time=(\d+\.?\d*)', output)
-                if match:
-                    response_time = float(match.group(1))
+            address, dns_time = await self._resolve(host)
+
+            # 使用系统ping命令，更可靠（直接 ping 解析后的地址，不再重复解析）
+            async with get_subprocess_semaphore():
+                process = await asyncio.create_subprocess_exec(
+                    'ping', '-c', str(self.sample_count), '-i', str(PING_SAMPLE_INTERVAL),
+                    '-W', str(max(int(self.ping_timeout), 1)), address,
+                    stdout=asyncio.subprocess.PIPE,
+                    stderr=asyncio.subprocess.PIPE
+                )
+                try:
+                    stdout, stderr = await asyncio.wait_for(
+                        process.communicate(),
+                        timeout=self.ping_timeout + self.sample_count * PING_SAMPLE_INTERVAL + 1
+                    )
+                except asyncio.TimeoutError:
+                    process.kill()
+                    await process.wait()
+                    raise
             
+            # 从ping输出中提取每个采样的响应时间
+            rtts = [float(value) for value in re.findall(r'time=(\d+\.?\d*)', stdout.decode())] if stdout else []
+            stats = summarize_rtt_samples(rtts, self.sample_count)
+            is_healthy = self._is_healthy(stats)
+
+            error_type = None
+            error_message = None
+            if not is_healthy:
+                # 返回码 0/1 表示发送正常但回复不足，其他为网络/参数错误
+                error_type = PROBE_ERROR_TIMEOUT if process.returncode in (0, 1) else PROBE_ERROR_CONNECT
+                error_message = stderr.decode() or f"{stats['loss_percent']}% packet loss to {address}"
+
             return {
                 'host': host,
                 'is_healthy': is_healthy,
-                'response_time': response_time,
-                'error_message': stderr.decode() if not is_healthy else None
+                'response_time': stats['avg_rtt'],
+                **stats,
+                'dns_time': dns_time,
+                'error_type': error_type,
+                'error_message': error_message
             }
+        except DnsResolutionError as e:
+            return self._failed_result(host, PROBE_ERROR_DNS, str(e))
         except asyncio.TimeoutError:
-            return {
-                'host': host,
-                'is_healthy': False,
-                'response_time': None,
-                'error_message': f'Ping timeout after {self.timeout}s'
-            }
+            return self._failed_result(host, PROBE_ERROR_TIMEOUT, f'Ping timeout after {self.ping_timeout}s', dns_time=dns_time)
         except Exception as e:
-            return {
-                'host': host,
-                'is_healthy': False,
-                'response_time': None,
-                'error_message': str(e)
-            }
+            return self._failed_result(host, PROBE_ERROR_CONNECT, str(e), dns_time=dns_time)
 
     async def port_check_async(self, host: str, port: int) -> Dict[str, Any]:
         """
-        异步端口检测
+        异步端口检测，response_time 只包含建立连接的耗时，域名解析耗时单独记录在 dns_time
 
         Return: 
         - {
             'host': 主机地址,
             'port': 端口号,
-            'is_healthy': 是否健康,
-            'response_time': 响应时间(毫秒),
-            'error_message': 错误信息
+            其余字段同 ping_async
         }
         """
+        return await self._with_retries(self._port_check_once, host, port)
+
+    async def _port_check_once(self, host: str, port: int) -> Dict[str, Any]:
+        dns_time = None
         try:
-            start_time = asyncio.get_event_loop().time()
-            reader, writer = await asyncio.wait_for(
-                asyncio.open_connection(host, port),
-                timeout=self.timeout
-            )
-            end_time = asyncio.get_event_loop().time()
-            
+            address, dns_time = await self._resolve(host)
+        except DnsResolutionError as e:
+            return self._failed_result(host, PROBE_ERROR_DNS, str(e), port=port)
+
+        # 所有采样共享超时预算，预算用完后未发送的采样计为丢失
+        deadline = time.perf_counter() + self.port_timeout + (self.sample_count - 1) * PORT_SAMPLE_INTERVAL
+        rtts = []
+        error_type = None
+        error_message = None
+        for index in range(self.sample_count):
+            if index:
+                await asyncio.sleep(PORT_SAMPLE_INTERVAL)
+            remaining = min(self.port_timeout, deadline - time.perf_counter())
+            if remaining <= 0:
+                break
+            start_time = time.perf_counter()
+            try:
+                reader, writer = await asyncio.wait_for(
+                    asyncio.open_connection(address, port),
+                    timeout=remaining
+                )
+            except asyncio.TimeoutError:
+                error_type, error_message = PROBE_ERROR_TIMEOUT, f'Port {port} timeout after {self.port_timeout}s'
+                continue
+            except Exception as e:
+                error_type, error_message = PROBE_ERROR_CONNECT, str(e)
+                continue
+            rtts.append((time.perf_counter() - start_time) * 1000)  # 转换为毫秒
+
             writer.close()
-            await writer.wait_closed()
-            
-            response_time = (end_time - start_time) * 1000  # 转换为毫秒
-            
-            return {
-                'host': host,
-                'port': port,
-                'is_healthy': True,
-                'response_time': response_time,
-                'error_message': None
-            }
-        except asyncio.TimeoutError:
-            return {
-                'host': host,
-                'port': port,
-                'is_healthy': False,
-                'response_time': None,
-                'error_message': f'Port {port} timeout after {self.timeout}s'
-            }
-        except Exception as e:
-            return {
-                'host': host,
-                'port': port,
-                'is_healthy': False,
-                'response_time': None,
-                'error_message': str(e)
-            }
+            try:
+                await writer.wait_closed()
+            except Exception:
+                pass
+
+        stats = summarize_rtt_samples(rtts, self.sample_count)
+        is_healthy = self._is_healthy(stats)
+        return {
+            'host': host,
+            'port': port,
+            'is_healthy': is_healthy,
+            'response_time': stats['avg_rtt'],
+            **stats,
+            'dns_time': dns_time,
+            'error_type': None if is_healthy else error_type,
+            'error_message': None if is_healthy else error_message
+        }
+
+    def _failed_result(self, host, error_type, error_message, port=None, dns_time=None) -> Dict[str, Any]:
+        result = {
+            'host': host,
+            'is_healthy': False,
+            'response_time': None,
+            **summarize_rtt_samples([], self.sample_count),
+            'dns_time': dns_time,
+            'error_type': error_type,
+            'error_message': error_message
+        }
+        if port is not None:
+            result['port'] = port
+        return result
 
     async def check_multiple_hosts(self, hosts: List[str]) -> List[Dict[str, Any]]:
         """
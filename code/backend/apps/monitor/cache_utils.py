@@ -0,0 +1,55 @@
+"""
+监控数据缓存版本
+
+按数据域维护 Redis 中的版本号，写入时递增，缓存的 key 中带上版本号，
+版本变化后旧缓存自然失效（依赖过期时间回收）。
+
+数据域：
+- topology: 架构图结构（链路、节点、连接、基础信息的增删改）
+- health: 健康状态（探活任务发现状态变化、一轮探活完成）
+- alert: 告警（告警的创建、更新、删除）
+- app_setting: 应用设置（AppSetting 的增删改，见 probe_config）
+"""
+from django.db import transaction
+from django_redis import get_redis_connection
+
+from lib.log import color_logger
+
+CACHE_VERSION_REDIS_DB = 'default'
+CACHE_VERSION_KEY_PREFIX = 'monitor_cache_version'
+
+TOPOLOGY_CACHE_DOMAIN = 'topology'
+HEALTH_CACHE_DOMAIN = 'health'
+ALERT_CACHE_DOMAIN = 'alert'
+APP_SETTING_CACHE_DOMAIN = 'app_setting'
+
+
+def get_cache_version(domain):
+    """获取数据域的当前版本号"""
+    redis_conn = get_redis_connection(CACHE_VERSION_REDIS_DB)
+    version = redis_conn.get(f'{CACHE_VERSION_KEY_PREFIX}:{domain}')
+    return int(version) if version else 0
+
+
+def bump_cache_version(domain):
+    """递增数据域的版本号"""
+    redis_conn = get_redis_connection(CACHE_VERSION_REDIS_DB)
+    return redis_conn.incr(f'{CACHE_VERSION_KEY_PREFIX}:{domain}')
+
+
+def get_cache_versions(domains):
+    """一次获取多个数据域的版本号 {domain: version}"""
+    redis_conn = get_redis_connection(CACHE_VERSION_REDIS_DB)
+    versions = redis_conn.mget([f'{CACHE_VERSION_KEY_PREFIX}:{domain}' for domain in domains])
+    return {domain: int(version) if version else 0 for domain, version in zip(domains, versions)}
+
+
+def bump_cache_version_on_commit(domain):
+    """事务提交后递增版本号，避免并发读取在提交前把旧数据缓存到新版本下"""
+    def _bump():
+        try:
+            bump_cache_version(domain)
+        except Exception as e:
+            color_logger.error(f"更新缓存版本失败: {domain}, {e}")
+
+    transaction.on_commit(_bump)
@@ -0,0 +1,156 @@
+"""
+仪表板概要统计计数器
+
+概要统计（链路数、健康链路数、各状态节点数）保存在 Redis hash 中：
+- 探活任务在节点状态变化时通过 Lua 脚本原子地增减计数
+- 链路/节点的增删改（非健康状态字段）直接删除计数器，下次读取时重建
+- 定时任务周期性重建，修正并发等原因造成的偏差
+
+hash 字段：
+- total_links / total_nodes / healthy_links
+- status:{healthy_status}   启用节点按健康状态计数
+- link_green:{link_uuid}    每个链路下启用且健康的节点数，用于维护 healthy_links（只统计未删除的链路）
+"""
+from django.db import transaction
+from django.db.models import Count
+from django_redis import get_redis_connection
+
+from lib.log import color_logger
+from .models import Link, Node
+
+SUMMARY_REDIS_DB = 'default'
+SUMMARY_REDIS_KEY = 'monitor_dashboard_summary'
+NODE_HEALTHY_STATUSES = ('green', 'yellow', 'red', 'unknown')
+
+# 计数器不存在时不做任何操作（等待重建），避免在空 hash 上累加出错误的值
+_NODE_STATUS_TRANSITION_SCRIPT = """
+if redis.call('EXISTS', KEYS[1]) == 0 then
+    return 0
+end
+redis.call('HINCRBY', KEYS[1], 'status:' .. ARGV[1], -1)
+redis.call('HINCRBY', KEYS[1], 'status:' .. ARGV[2], 1)
+if ARGV[4] ~= '1' then
+    return 1
+end
+if ARGV[1] == 'green' then
+    if redis.call('HINCRBY', KEYS[1], 'link_green:' .. ARGV[3], -1) == 0 then
+        redis.call('HINCRBY', KEYS[1], 'healthy_links', -1)
+    end
+end
+if ARGV[2] == 'green' then
+    if redis.call('HINCRBY', KEYS[1], 'link_green:' .. ARGV[3], 1) == 1 then
+        redis.call('HINCRBY', KEYS[1], 'healthy_links', 1)
+    end
+end
+return 1
+"""
+
+# 计入健康链路统计的节点所属链路范围，重建（查询条件）与增量更新（is_link_counted）使用同一规则
+COUNTED_LINK_FILTER = {'link__is_del': False}
+
+
+def is_link_counted(node):
+    """节点所属链路是否计入健康链路统计（与 COUNTED_LINK_FILTER 一致）"""
+    return not node.link.is_del
+
+
+def compute_summary_counters():
+    """从数据库计算概要统计计数器"""
+    counters = {
+        'total_links': Link.objects.count(),
+        'total_nodes': Node.objects.count(),
+    }
+
+    status_counts = dict(
+        Node.objects.filter(is_active=True).values_list('healthy_status').annotate(count=Count('uuid'))
+    )
+    for healthy_status in NODE_HEALTHY_STATUSES:
+        counters[f'status:{healthy_status}'] = status_counts.get(healthy_status, 0)
+
+    # 健康链路：包含至少一个启用且健康节点的链路
+    link_green_counts = Node.objects.filter(
+        healthy_status='green', is_active=True, **COUNTED_LINK_FILTER
+    ).values_list('link_id').annotate(count=Count('uuid'))
+    healthy_links = 0
+    for link_id, count in link_green_counts:
+        counters[f'link_green:{link_id}'] = count
+        if count > 0:
+            healthy_links += 1
+    counters['healthy_links'] = healthy_links
+
+    return counters
+
+
+def rebuild_summary_counters():
+    """重建 Redis 中的概要统计计数器"""
+    counters = compute_summary_counters()
+    redis_conn = get_redis_connection(SUMMARY_REDIS_DB)
+    pipeline = redis_conn.pipeline(transaction=True)
+    pipeline.delete(SUMMARY_REDIS_KEY)
+    pipeline.hset(SUMMARY_REDIS_KEY, mapping=counters)
+    pipeline.execute()
+    return counters
+
+
+def invalidate_summary_counters():
+    """删除计数器，下次读取时重建（事务提交后执行）"""
+    def _invalidate():
+        try:
+            get_redis_connection(SUMMARY_REDIS_DB).delete(SUMMARY_REDIS_KEY)
+        except Exception as e:
+            color_logger.error(f"删除仪表板概要统计计数器失败: {e}")
+
+    transaction.on_commit(_invalidate)
+
+
+def record_node_status_transition(node, old_status, new_status):
+    """记录启用节点的健康状态变化（事务提交后执行），所属链路已删除时只更新节点状态计数"""
+    if old_status == new_status:
+        return
+    link_uuid = node.link_id
+    link_counted = '1' if is_link_counted(node) else '0'
+
+    def _record():
+        try:
+            redis_conn = get_redis_connection(SUMMARY_REDIS_DB)
+            redis_conn.eval(
+                _NODE_STATUS_TRANSITION_SCRIPT, 1, SUMMARY_REDIS_KEY,
+                old_status, new_status, str(link_uuid), link_counted
+            )
+        except Exception as e:
+            color_logger.error(f"更新仪表板概要统计计数器失败: {e}")
+
+    transaction.on_commit(_record)
+
+
+def get_dashboard_summary():
+    """获取仪表板概要统计（一次 Redis 读取，计数器不存在时重建）"""
+    counters = {}
+    try:
+        raw_counters = get_redis_connection(SUMMARY_REDIS_DB).hgetall(SUMMARY_REDIS_KEY)
+        counters = {
+            (key.decode('utf-8') if isinstance(key, bytes) else key): int(value)
+            for key, value in raw_counters.items()
+        }
+    except Exception as e:
+        color_logger.error(f"读取仪表板概要统计计数器失败: {e}")
+
+    if not counters:
+        try:
+            counters = rebuild_summary_counters()
+        except Exception as e:
+            color_logger.error(f"重建仪表板概要统计计数器失败: {e}")
+            counters = compute_summary_counters()
+
+    yellow_nodes = counters.get('status:yellow', 0)
+    red_nodes = counters.get('status:red', 0)
+    return {
+        'total_links': counters.get('total_links', 0),
+        'healthy_links': counters.get('healthy_links', 0),
+        'total_nodes': counters.get('total_nodes', 0),
+        'healthy_nodes': counters.get('status:green', 0),
+        'yellow_nodes': yellow_nodes,  # 部分异常节点
+        'red_nodes': red_nodes,  # 异常节点
+        'unknown_nodes': counters.get('status:unknown', 0),  # 未知节点
+        'unhealthy_nodes': yellow_nodes + red_nodes  # 不健康节点（黄色+红色）
+    }
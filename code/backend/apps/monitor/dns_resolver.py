@@ -0,0 +1,147 @@
+"""
+探活目标的异步 DNS 解析缓存
+
+- 安装了 aiodns 时异步查询 A/AAAA 记录并使用记录的 TTL（限制在最小/最大 TTL 之间）
+- 未安装时使用事件循环的 getaddrinfo（线程池），缓存默认 TTL
+- 解析失败的结果按负缓存 TTL 缓存，避免对失效域名反复查询
+- 同一主机的并发解析只发起一次查询
+- 每个事件循环一个解析器实例（探活运行时的常驻事件循环中长期复用）
+"""
+import asyncio
+import ipaddress
+import socket
+import time
+import weakref
+
+from backend.settings import config_data
+
+try:
+    import aiodns
+except ImportError:  # 可选依赖，未安装时使用 getaddrinfo
+    aiodns = None
+
+
+def get_dns_config():
+    """获取 DNS 解析配置"""
+    probe_config = config_data.get('PROBE', {}) or {}
+    return {
+        'default_ttl': probe_config.get('DNS_DEFAULT_TTL', 300),
+        'min_ttl': probe_config.get('DNS_MIN_TTL', 30),
+        'max_ttl': probe_config.get('DNS_MAX_TTL', 3600),
+        'negative_ttl': probe_config.get('DNS_NEGATIVE_TTL', 30),
+        'timeout': probe_config.get('DNS_TIMEOUT', 2),
+        'max_size': probe_config.get('DNS_CACHE_SIZE', 10000),
+    }
+
+
+class DnsResolutionError(Exception):
+    """主机名解析失败"""
+
+
+class AsyncDnsResolver:
+    """带 TTL 和负缓存的异步解析器，需在同一个事件循环中使用"""
+
+    def __init__(self, dns_config=None):
+        self.config = dns_config or get_dns_config()
+        # host -> (过期时间, 地址列表 或 DnsResolutionError)
+        self._cache = {}
+        self._pending = {}
+        self._resolver = aiodns.DNSResolver(timeout=self.config['timeout']) if aiodns is not None else None
+
+    async def resolve(self, host):
+        """
+        解析主机名
+        :return: (地址列表, 是否命中缓存)
+        :raises DnsResolutionError: 解析失败或超时
+        """
+        if _is_ip_address(host):
+            return [host], True
+
+        now = time.monotonic()
+        cached = self._cache.get(host)
+        if cached and cached[0] > now:
+            if isinstance(cached[1], DnsResolutionError):
+                # 每次抛出新的异常实例，避免缓存的异常累积 traceback
+                raise DnsResolutionError(str(cached[1]))
+            return cached[1], True
+
+        # 同一主机的并发解析共享一次查询
+        future = self._pending.get(host)
+        if future is None:
+            future = asyncio.ensure_future(self._lookup_and_cache(host))
+            self._pending[host] = future
+            future.add_done_callback(lambda _: self._pending.pop(host, None))
+        return await asyncio.shield(future), False
+
+    async def _lookup_and_cache(self, host):
+        try:
+            addresses, ttl = await asyncio.wait_for(self._lookup(host), timeout=self.config['timeout'])
+            if not addresses:
+                raise DnsResolutionError(f'No address found for {host}')
+        except (DnsResolutionError, asyncio.TimeoutError, OSError) as e:
+            error = e if isinstance(e, DnsResolutionError) else DnsResolutionError(
+                f'Timeout resolving {host}' if isinstance(e, asyncio.TimeoutError) else f'Failed to resolve {host}: {e}'
+            )
+            self._store(host, error, self.config['negative_ttl'])
+            raise error
+        except Exception as e:
+            # aiodns.error.DNSError 等
+            error = DnsResolutionError(f'Failed to resolve {host}: {e}')
+            self._store(host, error, self.config['negative_ttl'])
+            raise error
+
+        ttl = self.config['default_ttl'] if ttl is None else min(max(ttl, self.config['min_ttl']), self.config['max_ttl'])
+        self._store(host, addresses, ttl)
+        return addresses
+
+    async def _lookup(self, host):
+        """返回 (地址列表, TTL)，TTL 未知时为 None"""
+        if self._resolver is not None:
+            for query_type in ('A', 'AAAA'):
+                try:
+                    records = await self._resolver.query(host, query_type)
+                except aiodns.error.DNSError:
+                    continue
+                if records:
+                    return [record.host for record in records], min(record.ttl for record in records)
+            raise DnsResolutionError(f'Failed to resolve {host}')
+
+        infos = await asyncio.get_running_loop().getaddrinfo(host, None, type=socket.SOCK_STREAM)
+        return list(dict.fromkeys(info[4][0] for info in infos)), None
+
+    def _store(self, host, value, ttl):
+        if len(self._cache) >= self.config['max_size']:
+            self._evict()
+        self._cache[host] = (time.monotonic() + ttl, value)
+
+    def _evict(self):
+        now = time.monotonic()
+        for host in [host for host, (expire_at, _) in self._cache.items() if expire_at <= now]:
+            del self._cache[host]
+        # 仍然超出容量时丢弃最早写入的一半
+        if len(self._cache) >= self.config['max_size']:
+            for host in list(self._cache)[:len(self._cache) // 2]:
+                del self._cache[host]
+
+    def clear(self):
+        self._cache.clear()
+
+
+def _is_ip_address(host):
+    try:
+        ipaddress.ip_address(host)
+        return True
+    except ValueError:
+        return False
+
+
+_resolvers = weakref.WeakKeyDictionary()
+
+
+def get_dns_resolver():
+    """获取当前事件循环的解析器"""
+    loop = asyncio.get_running_loop()
+    resolver = _resolvers.get(loop)
+    if resolver is None:
+        resolver = _resolvers[loop] = AsyncDnsResolver()
+    return resolver
@@ -0,0 +1,172 @@
+"""
+监控事件（短轮询）
+
+探活任务和告警处理在状态变化时把事件追加到 Redis Stream `monitor_events`（按条数上限裁剪），
+前端携带上次的事件ID短轮询事件接口，只取新增的事件，并根据返回的数据域版本号判断是否需要刷新列表。
+
+不使用 SSE 长连接：uwsgi 以同步进程/线程运行，每个长连接会占用一个工作线程，
+在线人数较多时会耗尽工作线程，影响普通接口。短轮询每次请求只做一次 Redis 读取。
+
+事件格式：{"type": 事件类型, "link_uuid": 链路ID, "data": {...}, "time": 发布时间}
+"""
+import json
+import uuid
+
+from django.db import transaction
+from django.utils import timezone
+from django_redis import get_redis_connection
+
+from backend.settings import config_data
+from lib.json_tools import DateTimeEncoder
+from lib.log import color_logger
+from .cache_utils import ALERT_CACHE_DOMAIN, HEALTH_CACHE_DOMAIN, TOPOLOGY_CACHE_DOMAIN, get_cache_versions
+
+MONITOR_EVENT_REDIS_DB = 'default'
+MONITOR_EVENT_STREAM_KEY = 'monitor_events'
+# 事件接口返回的数据域版本号，版本变化时前端刷新对应的列表
+MONITOR_EVENT_DOMAINS = (TOPOLOGY_CACHE_DOMAIN, HEALTH_CACHE_DOMAIN, ALERT_CACHE_DOMAIN)
+
+NODE_STATUS_EVENT = 'node_status'
+BASE_INFO_STATUS_EVENT = 'base_info_status'
+ALERT_OPENED_EVENT = 'alert_opened'
+ALERT_CLOSED_EVENT = 'alert_closed'
+ALERT_SILENCED_EVENT = 'alert_silenced'
+
+# 告警状态 -> 事件类型
+ALERT_STATUS_EVENTS = {
+    'OPEN': ALERT_OPENED_EVENT,
+    'CLOSED': ALERT_CLOSED_EVENT,
+    'SILENCED': ALERT_SILENCED_EVENT,
+}
+
+
+def get_event_poll_config():
+    """获取事件轮询配置"""
+    poll_config = config_data.get('MONITOR_EVENT_POLL', {}) or {}
+    return {
+        'poll_interval': poll_config.get('POLL_INTERVAL', 5000),
+        'max_events': poll_config.get('MAX_EVENTS', 1000),
+        'batch_size': poll_config.get('BATCH_SIZE', 200),
+    }
+
+
+def publish_monitor_event(link_uuid, event_type, data):
+    """发布监控事件（事务提交后执行，回滚的状态变化不会发布）"""
+    if not link_uuid:
+        return
+
+    message = json.dumps({
+        'type': event_type,
+        'link_uuid': str(link_uuid),
+        'data': data,
+        'time': timezone.now(),
+    }, cls=DateTimeEncoder)
+    fields = {'link_uuid': str(link_uuid), 'event': message}
+
+    def _publish():
+        try:
+            get_redis_connection(MONITOR_EVENT_REDIS_DB).xadd(
+                MONITOR_EVENT_STREAM_KEY, fields,
+                maxlen=get_event_poll_config()['max_events'], approximate=True
+            )
+        except Exception as e:
+            color_logger.error(f"发布监控事件失败: {event_type}, {e}")
+
+    transaction.on_commit(_publish)
+
+
+def get_node_link_uuid(node_id):
+    """根据告警中保存的节点ID获取链路ID"""
+    from .models import Node
+
+    try:
+        node_uuid = uuid.UUID(str(node_id))
+    except (TypeError, ValueError):
+        return None
+    return Node.all_objects.filter(uuid=node_uuid).values_list('link_id', flat=True).first()
+
+
+def publish_alert_event(alert, event_type):
+    """发布告警事件"""
+    link_uuid = get_node_link_uuid(alert.node_id)
+    publish_monitor_event(link_uuid, event_type, {
+        'uuid': str(alert.uuid),
+        'node_id': alert.node_id,
+        'alert_type': alert.alert_type,
+        'alert_subtype': alert.alert_subtype,
+        'title': alert.title,
+        'severity': alert.severity,
+        'status': alert.status,
+    })
+
+
+def _parse_event_id(event_id):
+    """Stream 事件ID（毫秒时间戳-序号）转为可比较的元组，格式不正确时抛出 ValueError"""
+    milliseconds, _, sequence = str(event_id).partition('-')
+    return int(milliseconds), int(sequence or 0)
+
+
+def _decode(value):
+    return value.decode('utf-8') if isinstance(value, bytes) else value
+
+
+def get_monitor_events(link_uuid=None, last_event_id=None):
+    """
+    获取上次轮询之后的监控事件（一次 Redis 往返）
+
+    :param link_uuid: 只返回该链路的事件，为空时返回所有链路的事件
+    :param last_event_id: 上次返回的 last_event_id，为空时不返回事件，只返回当前位置
+    :return: {
+        'events': [事件, ...],
+        'last_event_id': 下次轮询携带的事件ID,
+        'reset': 上次之后的事件已被裁剪（或超出单次数量），前端需全量刷新,
+        'versions': {数据域: 版本号},
+        'poll_interval': 建议的轮询间隔（毫秒）
+    }
+    """
+    poll_config = get_event_poll_config()
+    redis_conn = get_redis_connection(MONITOR_EVENT_REDIS_DB)
+    pipeline = redis_conn.pipeline(transaction=False)
+    pipeline.xrevrange(MONITOR_EVENT_STREAM_KEY, count=1)
+    pipeline.xrange(MONITOR_EVENT_STREAM_KEY, count=1)
+    if last_event_id is not None:
+        last_position = _parse_event_id(last_event_id)
+        # 包含 last_event_id 本身（若未被裁剪），多取一条用于判断是否超出单次数量
+        pipeline.xrange(MONITOR_EVENT_STREAM_KEY, min=last_event_id, count=poll_config['batch_size'] + 2)
+    results = pipeline.execute()
+    latest, oldest = results[0], results[1]
+    latest_id = _decode(latest[0][0]) if latest else '0-0'
+
+    result = {
+        'events': [],
+        'last_event_id': latest_id,
+        'reset': False,
+        'versions': get_cache_versions(MONITOR_EVENT_DOMAINS),
+        'poll_interval': poll_config['poll_interval'],
+    }
+    if last_event_id is None:
+        return result
+
+    # 上次位置之后的事件已被裁剪，或 Stream 被清空重建（上次位置比最新事件还新）
+    if (oldest and _parse_event_id(_decode(oldest[0][0])) > last_position and last_position != (0, 0)) \
+            or _parse_event_id(latest_id) < last_position:
+        result['reset'] = True
+        return result
+
+    entries = [
+        (_decode(entry_id), fields) for entry_id, fields in results[2]
+        if _parse_event_id(_decode(entry_id)) > last_position
+    ]
+    if len(entries) > poll_config['batch_size']:
+        # 积压过多时不逐条返回，由前端全量刷新
+        result['reset'] = True
+        return result
+
+    for entry_id, fields in entries:
+        fields = {_decode(key): _decode(value) for key, value in fields.items()}
+        if link_uuid is not None and fields.get('link_uuid') != link_uuid:
+            continue
+        event = json.loads(fields['event'])
+        event['id'] = entry_id
+        result['events'].append(event)
+    return result
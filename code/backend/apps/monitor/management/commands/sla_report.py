@@ -0,0 +1,83 @@
+import json
+from datetime import datetime
+
+from django.core.management.base import BaseCommand, CommandError
+from django.core.serializers.json import DjangoJSONEncoder
+from django.utils import timezone
+
+from apps.monitor.sla import SLA_PERIOD_DAYS, SLA_TARGET_TYPES, compute_sla, get_sla_range
+
+
+def parse_time(value):
+    if not value:
+        return None
+    value = datetime.fromisoformat(value)
+    return timezone.make_aware(value) if timezone.is_naive(value) else value
+
+
+def format_duration(seconds):
+    if seconds is None:
+        return '-'
+    hours, remainder = divmod(int(seconds), 3600)
+    minutes, _ = divmod(remainder, 60)
+    return f'{hours}h{minutes:02d}m'
+
+
+class Command(BaseCommand):
+    help = 'Report availability (uptime %, MTTR, MTBF, incidents) from health rollups'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--target-type',
+            choices=SLA_TARGET_TYPES,
+            default='node',
+            help='Report per node, link or base info',
+        )
+        parser.add_argument('--uuid', help='Only report the given target')
+        parser.add_argument(
+            '--period',
+            choices=list(SLA_PERIOD_DAYS.keys()),
+            default='month',
+            help='Time range ending now, ignored when --start is given',
+        )
+        parser.add_argument('--start', help='Start time (ISO format, local time zone if naive)')
+        parser.add_argument('--end', help='End time (ISO format, defaults to now)')
+        parser.add_argument(
+            '--granularity',
+            choices=['hour', 'day'],
+            help='Rollup granularity, chosen from the start time by default',
+        )
+        parser.add_argument(
+            '--json',
+            action='store_true',
+            help='Output the report as JSON',
+        )
+
+    def handle(self, *args, **options):
+        try:
+            start_time, end_time = get_sla_range(
+                options['period'], parse_time(options['start']), parse_time(options['end'])
+            )
+            report = compute_sla(
+                options['target_type'], start_time, end_time, options['uuid'], options['granularity']
+            )
+        except (AssertionError, ValueError) as e:
+            raise CommandError(str(e))
+
+        if options['json']:
+            self.stdout.write(json.dumps(report, cls=DjangoJSONEncoder, ensure_ascii=False, indent=2))
+            return
+
+        self.stdout.write(
+            f"{report['target_type']} availability, {report['granularity']} rollups, "
+            f"{timezone.localtime(report['start_time'])} ~ {timezone.localtime(report['covered_until'])}"
+        )
+        self.stdout.write(f"{'name':<40} {'uptime %':>10} {'incidents':>10} {'MTTR':>10} {'MTBF':>10} {'downtime':>10}")
+        for item in report['items']:
+            uptime = '-' if item['uptime_percent'] is None else f"{item['uptime_percent']:.3f}"
+            self.stdout.write(
+                f"{str(item.get('name') or item['uuid'])[:40]:<40} {uptime:>10} {item['incidents']:>10} "
+                f"{format_duration(item['mttr_seconds']):>10} {format_duration(item['mtbf_seconds']):>10} "
+                f"{format_duration(item['downtime_seconds']):>10}"
+            )
+        self.stdout.write(self.style.SUCCESS(f"{len(report['items'])} targets"))
@@ -0,0 +1,40 @@
+# Generated by Django 5.2.18 on 2026-10-19 15:27
+
+import django.db.models.deletion
+import uuid
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('monitor', '0023_nodehealthrollup'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='BaseInfoHealthRollup',
+            fields=[
+                ('uuid', models.UUIDField(auto_created=True, default=uuid.uuid4, editable=False, primary_key=True, serialize=False)),
+                ('is_del', models.BooleanField(default=False, verbose_name='是否删除')),
+                ('create_time', models.DateTimeField(auto_now_add=True, verbose_name='创建时间')),
+                ('update_time', models.DateTimeField(auto_now=True, verbose_name='更新时间')),
+                ('granularity', models.CharField(choices=[('hour', '小时'), ('day', '天')], max_length=10, verbose_name='汇总粒度')),
+                ('bucket_start', models.DateTimeField(verbose_name='时间桶开始时间')),
+                ('worst_status', models.CharField(choices=[('unknown', '未知'), ('green', '健康'), ('yellow', '部分异常'), ('red', '严重异常')], default='unknown', max_length=20, verbose_name='最差健康状态')),
+                ('total_checks', models.IntegerField(default=0, verbose_name='检查次数')),
+                ('healthy_checks', models.IntegerField(default=0, verbose_name='健康次数')),
+                ('failed_checks', models.IntegerField(default=0, verbose_name='异常次数')),
+                ('availability', models.FloatField(blank=True, null=True, verbose_name='可用率(%)')),
+                ('avg_response_time', models.FloatField(blank=True, null=True, verbose_name='平均响应时间(ms)')),
+                ('p95_response_time', models.FloatField(blank=True, null=True, verbose_name='P95响应时间(ms)')),
+                ('base_info', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='health_rollups', to='monitor.baseinfo', verbose_name='基础信息')),
+            ],
+            options={
+                'verbose_name': '基础信息健康状态汇总',
+                'verbose_name_plural': '基础信息健康状态汇总',
+                'indexes': [models.Index(fields=['granularity', 'bucket_start'], name='monitor_bas_granula_8150d4_idx')],
+                'unique_together': {('base_info', 'granularity', 'bucket_start')},
+            },
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.18 on 2026-10-19 15:39
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('monitor', '0024_baseinfohealthrollup'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='baseinfo',
+            name='extra_probes',
+            field=models.JSONField(blank=True, default=list, verbose_name='附加探测'),
+        ),
+    ]
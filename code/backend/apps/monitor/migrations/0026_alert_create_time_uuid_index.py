@@ -0,0 +1,18 @@
+# Generated by Django 5.2.18 on 2026-10-19 16:05
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('monitor', '0025_baseinfo_extra_probes'),
+        ('user', '0005_alter_user_email'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='alert',
+            index=models.Index(fields=['-create_time', '-uuid'], name='alert_create__191be3_idx'),
+        ),
+    ]
@@ -80,6 +80,10 @@ class Alert(BaseModel):
                 name='unique_silenced_alert'
             ),
         ]
+        indexes = [
+            # 游标分页按 (create_time, uuid) 倒序查找
+            models.Index(fields=['-create_time', '-uuid']),
+        ]
         ordering = ['-first_occurred']
 
     def __str__(self):
@@ -165,6 +169,8 @@ class BaseInfo(BaseModel):
     # 新增字段：健康状态
     is_healthy = models.BooleanField(null=True, blank=True, verbose_name='健康状态')
     remarks = models.TextField(blank=True, null=True, verbose_name='备注')
+    # 附加探测（ping/端口之外），如 [{"type": "http", "path": "/health", "expected_codes": [200]}]，见 probes.factory
+    extra_probes = models.JSONField(default=list, blank=True, verbose_name='附加探测')
 
     class Meta:
         verbose_name = '基础服务信息'
@@ -278,6 +284,80 @@ class NodeHealth(BaseModel):
         return f"{self.node.name} - {self.healthy_status}"
 
 
+class HealthRollupBase(BaseModel):
+    """
+    健康状态汇总基类 - 按小时/天预聚合的健康记录，用于长周期趋势和 SLA 统计
+    """
+    GRANULARITY_CHOICES = [
+        ('hour', '小时'),
+        ('day', '天'),
+    ]
+
+    granularity = models.CharField(max_length=10, choices=GRANULARITY_CHOICES, verbose_name='汇总粒度')
+    bucket_start = models.DateTimeField(verbose_name='时间桶开始时间')
+    worst_status = models.CharField(
+        max_length=20,
+        choices=NODE_HEALTH_STATUS_CHOICES,
+        default='unknown',
+        verbose_name='最差健康状态'
+    )
+    total_checks = models.IntegerField(default=0, verbose_name='检查次数')
+    healthy_checks = models.IntegerField(default=0, verbose_name='健康次数')
+    failed_checks = models.IntegerField(default=0, verbose_name='异常次数')  # red + yellow
+    availability = models.FloatField(null=True, blank=True, verbose_name='可用率(%)')
+    avg_response_time = models.FloatField(null=True, blank=True, verbose_name='平均响应时间(ms)')
+    p95_response_time = models.FloatField(null=True, blank=True, verbose_name='P95响应时间(ms)')
+
+    class Meta:
+        abstract = True
+
+
+class NodeHealthRollup(HealthRollupBase):
+    """
+    节点健康状态汇总
+    """
+    node = models.ForeignKey(
+        Node,
+        on_delete=models.CASCADE,
+        related_name='health_rollups',
+        verbose_name='节点'
+    )
+
+    class Meta:
+        verbose_name = '节点健康状态汇总'
+        verbose_name_plural = verbose_name
+        unique_together = ('node', 'granularity', 'bucket_start')
+        indexes = [
+            models.Index(fields=['granularity', 'bucket_start']),
+        ]
+
+    def __str__(self):
+        return f"{self.node.name} - {self.granularity} - {self.bucket_start}"
+
+
+class BaseInfoHealthRollup(HealthRollupBase):
+    """
+    基础信息健康状态汇总
+    """
+    base_info = models.ForeignKey(
+        BaseInfo,
+        on_delete=models.CASCADE,
+        related_name='health_rollups',
+        verbose_name='基础信息'
+    )
+
+    class Meta:
+        verbose_name = '基础信息健康状态汇总'
+        verbose_name_plural = verbose_name
+        unique_together = ('base_info', 'granularity', 'bucket_start')
+        indexes = [
+            models.Index(fields=['granularity', 'bucket_start']),
+        ]
+
+    def __str__(self):
+        return f"{self.base_info.host}:{self.base_info.port} - {self.granularity} - {self.bucket_start}"
+
+
 class AppSetting(BaseModel):
     """
     应用程序设置模型 - 存储监控相关全局配置
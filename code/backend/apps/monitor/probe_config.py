@@ -1,5 +1,69 @@
+"""
+探活配置
+
+AppSetting 在进程内缓存为只读快照（MappingProxyType），读取配置不访问数据库：
+- AppSetting 保存/删除后（signals）递增 Redis 中的 app_setting 版本号，并通过 pub/sub 剔除各进程的快照
+- 快照过期或被剔除后先比较版本号，未变化时继续使用原快照，变化时重新加载全部配置
+- 通过 QuerySet.update 等不触发信号的方式修改时，需调用 invalidate_app_settings
+"""
+from types import MappingProxyType
+
+from django.db import transaction
+
+from lib.local_cache_tool import get_local_cache, invalidate_local_cache
+from lib.log import color_logger
+from .cache_utils import APP_SETTING_CACHE_DOMAIN, bump_cache_version, get_cache_version
 from .models import AppSetting
 
+APP_SETTING_LOCAL_CACHE = 'app_setting'
+APP_SETTING_SNAPSHOT_KEY = 'snapshot'
+# 快照的本地有效期（秒），到期后只需一次 Redis 读取确认版本号
+APP_SETTING_SNAPSHOT_TTL = 60
+
+# 最近加载的快照 (版本号, 快照)
+_last_snapshot = (None, None)
+# 最近一次转换的探活配置 (快照, 探活配置)
+_last_probe_settings = (None, None)
+
+
+def get_app_setting_snapshot():
+    """获取 AppSetting 的只读快照 {key: value}"""
+    global _last_snapshot
+
+    local_cache = get_local_cache(APP_SETTING_LOCAL_CACHE, ttl=APP_SETTING_SNAPSHOT_TTL)
+    snapshot = local_cache.get(APP_SETTING_SNAPSHOT_KEY)
+    if snapshot is not None:
+        return snapshot
+
+    # 先读版本号再加载，加载期间的修改会使版本号变化，下次读取时重新加载
+    try:
+        version = get_cache_version(APP_SETTING_CACHE_DOMAIN)
+    except Exception as e:
+        color_logger.error(f"获取应用设置版本号失败，直接读取数据库: {e}")
+        version = None
+
+    last_version, last_snapshot = _last_snapshot
+    if version is not None and last_version == version:
+        snapshot = last_snapshot
+    else:
+        snapshot = MappingProxyType(dict(AppSetting.objects.values_list('key', 'value')))
+        _last_snapshot = (version, snapshot)
+
+    local_cache.set(APP_SETTING_SNAPSHOT_KEY, snapshot)
+    return snapshot
+
+
+def invalidate_app_settings():
+    """事务提交后递增版本号并通知所有进程剔除快照"""
+    def _invalidate():
+        try:
+            bump_cache_version(APP_SETTING_CACHE_DOMAIN)
+        except Exception as e:
+            color_logger.error(f"更新应用设置版本号失败: {e}")
+        invalidate_local_cache(APP_SETTING_LOCAL_CACHE, APP_SETTING_SNAPSHOT_KEY)
+
+    transaction.on_commit(_invalidate)
+
 
 class ProbeConfig:
     """
@@ -8,18 +72,14 @@ class ProbeConfig:
     @staticmethod
     def get_config(key, default=None):
         """
-        获取探活配置
+        获取探活配置（读取进程内快照）
         """
-        try:
-            setting = AppSetting.objects.get(key=key)
-            return setting.value
-        except AppSetting.DoesNotExist:
-            return default
+        return get_app_setting_snapshot().get(key, default)
     
     @staticmethod
     def set_config(key, value, description=""):
         """
-        设置探活配置
+        设置探活配置（保存后由信号通知各进程刷新快照）
         """
         AppSetting.objects.update_or_create(
             key=key,
@@ -42,4 +102,34 @@ class ProbeConfig:
             'max_concurrent_probes': 10, # 最大并发探活数
             'retry_count': 2,            # 重试次数
             'retry_delay': 1,            # 重试间隔（秒）
-        }
\ No newline at end of file
+            'sample_count': 3,           # 每次探测的采样次数
+            'loss_threshold': 50,        # 丢包率阈值（%），超过时判定为不健康
+        }
+
+    @classmethod
+    def get_probe_settings(cls):
+        """
+        获取探活引擎使用的配置（默认配置 + AppSetting 中的覆盖值，转换为数值）
+        返回只读映射，快照未变化时复用同一份转换结果
+        """
+        global _last_probe_settings
+
+        snapshot = get_app_setting_snapshot()
+        last_snapshot, last_settings = _last_probe_settings
+        if last_snapshot is snapshot:
+            return last_settings
+
+        settings = cls.get_default_configs()
+        for key in settings:
+            value = snapshot.get(key)
+            if value is None:
+                continue
+            try:
+                number = float(value)
+                settings[key] = int(number) if number.is_integer() else number
+            except (TypeError, ValueError):
+                color_logger.warning(f"探活配置 {key} 的值无效: {value}，使用默认值 {settings[key]}")
+
+        settings = MappingProxyType(settings)
+        _last_probe_settings = (snapshot, settings)
+        return settings
\ No newline at end of file
@@ -0,0 +1,195 @@
+"""
+探活运行时
+
+每个 worker 进程持有一个常驻的事件循环（后台线程），探活任务把一批探测协程提交到该循环执行：
+- 事件循环和其上的状态（如 DNS 缓存）在任务之间复用，不再每次新建/关闭事件循环
+- 通过信号量限制单进程内同时进行的探测数
+- 事件循环在首次使用时创建；进程 fork 后在子进程中重新创建（Celery prefork）
+
+批量分发：
+- check_all_nodes 将节点按批次分发给 check_nodes_health_batch，一个任务内并发探测整批节点
+- 配置了多个探活队列时，按节点ID一致性哈希分配队列，各队列由独立的 worker 消费，
+  增减队列只会迁移少量节点
+"""
+import asyncio
+import atexit
+import bisect
+import hashlib
+import os
+import threading
+import weakref
+
+from backend.settings import config_data
+from lib.log import color_logger
+
+
+def get_probe_runtime_config():
+    """获取探活运行时配置"""
+    probe_config = config_data.get('PROBE', {}) or {}
+    return {
+        'max_concurrency': probe_config.get('MAX_CONCURRENCY', 200),
+        'batch_size': probe_config.get('BATCH_SIZE', 50),
+        'batch_timeout': probe_config.get('BATCH_TIMEOUT', 120),
+        'queues': probe_config.get('QUEUES') or [],
+        'virtual_nodes': probe_config.get('VIRTUAL_NODES', 100),
+        'max_subprocesses': probe_config.get('MAX_SUBPROCESSES', 32),
+    }
+
+
+# 每个事件循环的子进程信号量 {loop: Semaphore}
+_subprocess_semaphores = weakref.WeakKeyDictionary()
+
+
+def get_subprocess_semaphore():
+    """
+    当前事件循环的子进程信号量
+
+    ping、自定义脚本等子进程以及 SSH 认证等线程池中的阻塞操作共用，
+    限制单进程内同时存在的子进程/阻塞线程数
+    """
+    loop = asyncio.get_running_loop()
+    semaphore = _subprocess_semaphores.get(loop)
+    if semaphore is None:
+        semaphore = _subprocess_semaphores[loop] = asyncio.Semaphore(get_probe_runtime_config()['max_subprocesses'])
+    return semaphore
+
+
+class ProbeRuntime:
+    """常驻事件循环，在后台线程中运行"""
+
+    def __init__(self, max_concurrency=200):
+        self.max_concurrency = max_concurrency
+        self.pid = os.getpid()
+        self.loop = asyncio.new_event_loop()
+        self._semaphore = None
+        self._ready = threading.Event()
+        self._thread = threading.Thread(target=self._run, name='probe-runtime', daemon=True)
+        self._thread.start()
+        self._ready.wait()
+
+    def _run(self):
+        asyncio.set_event_loop(self.loop)
+        # 信号量需在事件循环所在线程中创建
+        self._semaphore = asyncio.Semaphore(self.max_concurrency)
+        self.loop.call_soon(self._ready.set)
+        self.loop.run_forever()
+
+    @property
+    def is_alive(self):
+        return self.pid == os.getpid() and self._thread.is_alive() and not self.loop.is_closed()
+
+    async def _run_limited(self, coroutine):
+        async with self._semaphore:
+            return await coroutine
+
+    async def _gather(self, coroutines):
+        return await asyncio.gather(
+            *[self._run_limited(coroutine) for coroutine in coroutines],
+            return_exceptions=True
+        )
+
+    def run_batch(self, coroutines, timeout=None):
+        """
+        在常驻事件循环中并发执行一批协程（阻塞等待全部完成）
+        :return: 与输入顺序一致的结果列表，执行异常的位置为异常对象
+        """
+        coroutines = list(coroutines)
+        if not coroutines:
+            return []
+        future = asyncio.run_coroutine_threadsafe(self._gather(coroutines), self.loop)
+        try:
+            return future.result(timeout)
+        except Exception:
+            future.cancel()
+            raise
+
+    def run(self, coroutine, timeout=None):
+        """在常驻事件循环中执行单个协程"""
+        return asyncio.run_coroutine_threadsafe(coroutine, self.loop).result(timeout)
+
+    def stop(self):
+        if self.pid != os.getpid() or self.loop.is_closed():
+            return
+        self.loop.call_soon_threadsafe(self.loop.stop)
+        self._thread.join(timeout=5)
+        if not self._thread.is_alive():
+            self.loop.close()
+
+
+_runtime = None
+_runtime_lock = threading.Lock()
+
+
+def get_probe_runtime():
+    """获取当前进程的探活运行时（fork 后的子进程会重新创建）"""
+    global _runtime
+    runtime = _runtime
+    if runtime is not None and runtime.is_alive:
+        return runtime
+
+    with _runtime_lock:
+        if _runtime is None or not _runtime.is_alive:
+            _runtime = ProbeRuntime(get_probe_runtime_config()['max_concurrency'])
+            color_logger.debug(f"探活运行时已启动: pid={_runtime.pid}, 并发上限 {_runtime.max_concurrency}")
+        return _runtime
+
+
+def _reset_runtime_after_fork():
+    # 子进程中父进程的事件循环线程不存在，丢弃引用后按需重建
+    global _runtime, _runtime_lock
+    _runtime = None
+    _runtime_lock = threading.Lock()
+
+
+def _stop_runtime():
+    if _runtime is not None:
+        _runtime.stop()
+
+
+os.register_at_fork(after_in_child=_reset_runtime_after_fork)
+atexit.register(_stop_runtime)
+
+
+class ConsistentHashRing:
+    """一致性哈希环（虚拟节点），用于将探活目标分配到队列"""
+
+    def __init__(self, members, virtual_nodes=100):
+        self.members = list(members)
+        self._ring = sorted(
+            (self._hash(f'{member}#{index}'), member)
+            for member in self.members
+            for index in range(virtual_nodes)
+        )
+        self._keys = [key for key, _ in self._ring]
+
+    @staticmethod
+    def _hash(value):
+        return int.from_bytes(hashlib.md5(str(value).encode('utf-8')).digest()[:8], 'big')
+
+    def get(self, key):
+        """获取 key 所属的成员，环为空时返回 None"""
+        if not self._ring:
+            return None
+        index = bisect.bisect(self._keys, self._hash(key)) % len(self._ring)
+        return self._ring[index][1]
+
+
+def shard_probe_targets(target_ids, batch_size=None, queues=None):
+    """
+    按队列分片并切分批次
+    :return: [(队列名, [目标ID, ...]), ...]，未配置队列时队列名为 None（默认队列）
+    """
+    runtime_config = get_probe_runtime_config()
+    batch_size = batch_size or runtime_config['batch_size']
+    queues = runtime_config['queues'] if queues is None else queues
+
+    ring = ConsistentHashRing(queues, runtime_config['virtual_nodes'])
+    shards = {}
+    for target_id in target_ids:
+        shards.setdefault(ring.get(target_id), []).append(target_id)
+
+    batches = []
+    for queue, shard_ids in shards.items():
+        for index in range(0, len(shard_ids), batch_size):
+            batches.append((queue, shard_ids[index:index + batch_size]))
+    return batches
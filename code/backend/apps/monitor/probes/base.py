@@ -1,3 +1,5 @@
+import asyncio
+import time
 from abc import ABC, abstractmethod
 from typing import Dict, Any
 
@@ -20,4 +22,87 @@ class BaseProbe(ABC):
             'details': dict          # 详细结果
         }
         """
-        pass
\ No newline at end of file
+        pass
+
+    @abstractmethod
+    async def check_async(self, host: str, port: int = None) -> Dict[str, Any]:
+        """
+        在探活运行时的事件循环中检查指定主机（BaseInfo 的附加探测）
+        返回: {
+            'probe_type': str,
+            'host': str,
+            'port': int,
+            'is_healthy': bool,
+            'response_time': float,  # 响应时间（毫秒）
+            'error_type': str,       # 失败类型 dns / connect / timeout / 各探测方式自定义
+            'error_message': str
+        }
+        """
+        pass
+
+
+class AsyncBaseProbe(BaseProbe):
+    """
+    异步探活基类：实现 check_async，同步的 check 在探活运行时的事件循环中执行
+    """
+    DEFAULT_TIMEOUT = 5
+
+    @property
+    def timeout(self):
+        return self.params.get('timeout') or self.DEFAULT_TIMEOUT
+
+    def check(self, node):
+        from apps.monitor.models import BaseInfo
+        from apps.monitor.probe_runtime import get_probe_runtime
+
+        base_info = BaseInfo.objects.filter(node_associations__node=node).first()
+        if not base_info:
+            return {
+                'is_healthy': False,
+                'response_time': 0,
+                'error_message': 'No host specified in BaseInfo',
+                'details': {}
+            }
+        result = get_probe_runtime().run(self.check_async(base_info.host, base_info.port))
+        return {
+            'is_healthy': result['is_healthy'],
+            'response_time': result['response_time'],
+            'error_message': result['error_message'],
+            'details': result
+        }
+
+    def build_result(self, host, port, **fields) -> Dict[str, Any]:
+        """check_async 返回结果的公共字段"""
+        result = {
+            'probe_type': self.PROBE_TYPE,
+            'host': host,
+            'port': port,
+            'is_healthy': False,
+            'response_time': None,
+            'error_type': None,
+            'error_message': None
+        }
+        result.update(fields)
+        return result
+
+
+async def open_tcp_connection(host: str, port: int, timeout: float):
+    """
+    通过共享的 DNS 缓存解析后建立 TCP 连接
+    :return: (reader, writer, 连接耗时(毫秒))
+    :raises DnsResolutionError / asyncio.TimeoutError / OSError
+    """
+    from apps.monitor.dns_resolver import get_dns_resolver
+
+    addresses, _ = await asyncio.wait_for(get_dns_resolver().resolve(host), timeout=timeout)
+    start_time = time.perf_counter()
+    reader, writer = await asyncio.wait_for(asyncio.open_connection(addresses[0], port), timeout=timeout)
+    return reader, writer, (time.perf_counter() - start_time) * 1000
+
+
+async def close_writer(writer):
+    writer.close()
+    try:
+        await writer.wait_closed()
+    except Exception:
+        pass
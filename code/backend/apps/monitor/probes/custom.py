@@ -1,66 +1,96 @@
+import asyncio
+import os
+import shlex
 import time
-import subprocess
-from .base import BaseProbe
 
+from backend.settings import config_data
+from apps.monitor.probe_runtime import get_subprocess_semaphore
+from .base import AsyncBaseProbe
 
-class CustomProbe(BaseProbe):
+# 输出保留的最大长度
+MAX_OUTPUT_LENGTH = 4096
+
+
+def get_custom_script_dir():
+    """自定义探测脚本目录，未配置时不允许执行自定义脚本"""
+    script_dir = (config_data.get('PROBE', {}) or {}).get('CUSTOM_SCRIPT_DIR')
+    return os.path.realpath(script_dir) if script_dir else None
+
+
+def resolve_custom_script(script):
+    """
+    解析自定义脚本命令
+    :param script: 脚本命令，如 "check_redis.sh {host} {port}"，脚本路径相对于 PROBE.CUSTOM_SCRIPT_DIR
+    :return: (脚本绝对路径, 参数列表)
+    :raises ValueError: 未配置脚本目录、命令不合法或脚本不在脚本目录内
+    """
+    script_dir = get_custom_script_dir()
+    if not script_dir:
+        raise ValueError('Custom scripts are disabled, PROBE.CUSTOM_SCRIPT_DIR is not configured')
+    args = shlex.split(script or '')
+    if not args:
+        raise ValueError('No script specified')
+    executable = os.path.realpath(os.path.join(script_dir, args[0]))
+    if os.path.commonpath([script_dir, executable]) != script_dir:
+        raise ValueError(f'Script must be inside {script_dir}')
+    return executable, args[1:]
+
+
+class CustomProbe(AsyncBaseProbe):
     """
     自定义探活实现
+
+    不经过 shell，直接执行脚本目录内的脚本，参数中的 {host}/{port} 替换为探测目标
+    params: {
+        'script': 脚本命令，如 "check_redis.sh {host} {port}",
+        'expected_returncode': 期望的返回码，默认 0,
+        'timeout': 超时时间（秒），默认 10
+    }
     """
-    def check(self, node):
+    PROBE_TYPE = 'custom'
+    DEFAULT_TIMEOUT = 10
+
+    async def check_async(self, host, port=None):
+        port = self.params.get('port') or port
+        result = self.build_result(host, port, returncode=None, stdout=None, stderr=None)
+        start_time = time.perf_counter()
+        try:
+            executable, args = resolve_custom_script(self.params.get('script'))
+        except ValueError as e:
+            result.update(error_type='config', error_message=str(e), response_time=0)
+            return result
+
+        args = [arg.replace('{host}', host or '').replace('{port}', str(port or '')) for arg in args]
+        expected_returncode = self.params.get('expected_returncode', 0)
         try:
-            start_time = time.time()
-            
-            script = self.params.get('script')
-            if not script:
-                return {
-                    'is_healthy': False,
-                    'response_time': 0,
-                    'error_message': 'No script specified',
-                    'details': {}
-                }
-            
-            # 替换脚本中的占位符
-            script = script.replace('{host}', node.host or '')
-            script = script.replace('{ip}', node.ip_address or '')
-            script = script.replace('{port}', str(node.port or ''))
-            
-            # 执行脚本
-            result = subprocess.run(
-                script,
-                shell=True,
-                capture_output=True,
-                text=True,
-                timeout=self.params.get('timeout', 10)
+            async with get_subprocess_semaphore():
+                # 等待信号量的时间不计入超时
+                start_time = time.perf_counter()
+                process = await asyncio.create_subprocess_exec(
+                    executable, *args,
+                    stdin=asyncio.subprocess.DEVNULL,
+                    stdout=asyncio.subprocess.PIPE,
+                    stderr=asyncio.subprocess.PIPE,
+                )
+                try:
+                    stdout, stderr = await asyncio.wait_for(process.communicate(), timeout=self.timeout)
+                except asyncio.TimeoutError:
+                    process.kill()
+                    await process.wait()
+                    raise
+        except asyncio.TimeoutError:
+            result.update(error_type='timeout', error_message=f'Script timeout after {self.timeout}s')
+        except OSError as e:
+            result.update(error_type='script', error_message=str(e))
+        else:
+            result.update(
+                returncode=process.returncode,
+                stdout=stdout[:MAX_OUTPUT_LENGTH].decode(errors='ignore'),
+                stderr=stderr[:MAX_OUTPUT_LENGTH].decode(errors='ignore'),
             )
-            
-            response_time = (time.time() - start_time) * 1000  # 转换为毫秒
-            
-            # 通常认为返回码为0表示成功
-            is_healthy = result.returncode == 0
-            
-            return {
-                'is_healthy': is_healthy,
-                'response_time': response_time,
-                'error_message': None if is_healthy else f'Script failed with return code: {result.returncode}',
-                'details': {
-                    'stdout': result.stdout,
-                    'stderr': result.stderr,
-                    'returncode': result.returncode
-                }
-            }
-            
-        except subprocess.TimeoutExpired:
-            return {
-                'is_healthy': False,
-                'response_time': (time.time() - start_time) * 1000,
-                'error_message': 'Script execution timeout',
-                'details': {}
-            }
-        except Exception as e:
-            return {
-                'is_healthy': False,
-                'response_time': (time.time() - start_time) * 1000,
-                'error_message': str(e),
-                'details': {}
-            }
\ No newline at end of file
+            if process.returncode == expected_returncode:
+                result['is_healthy'] = True
+            else:
+                result.update(error_type='returncode', error_message=f'Script failed with return code: {process.returncode}')
+        result['response_time'] = (time.perf_counter() - start_time) * 1000
+        return result
@@ -1,6 +1,13 @@
 from .base import BaseProbe
+from .custom import CustomProbe, resolve_custom_script
+from .http import HTTP_METHODS, HttpProbe
 from .ping import PingProbe
 from .port import PortProbe
+from .ssh import SSH_CREDENTIAL_FIELDS, SshProbe, get_ssh_credential
+from .telnet import TelnetProbe
+
+# 可作为 BaseInfo 附加探测（extra_probes）的探活方式
+EXTRA_PROBE_TYPES = ('http', 'ssh', 'telnet', 'custom')
 
 
 def get_probe_instance(probe_method, params):
@@ -10,10 +17,78 @@ def get_probe_instance(probe_method, params):
     probe_mapping = {
         'ping': PingProbe,
         'port': PortProbe,
+        'http': HttpProbe,
+        'ssh': SshProbe,
+        'telnet': TelnetProbe,
+        'custom': CustomProbe,
     }
     
     probe_class = probe_mapping.get(probe_method)
     if not probe_class:
         raise ValueError(f"Unsupported probe method: {probe_method}")
     
-    return probe_class(params)
\ No newline at end of file
+    return probe_class(params)
+
+
+def _validate_http_probe(probe):
+    assert probe.get('scheme', 'http') in ('http', 'https'), 'scheme 只能为 http 或 https'
+    assert str(probe.get('path', '/')).startswith('/'), 'path 需以 / 开头'
+    assert str(probe.get('method', 'GET')).upper() in HTTP_METHODS, f"method 只能为 {'/'.join(HTTP_METHODS)}"
+    expected_codes = probe.get('expected_codes', [200])
+    assert isinstance(expected_codes, list) and all(isinstance(code, int) for code in expected_codes), \
+        'expected_codes 需为状态码列表'
+    assert isinstance(probe.get('headers', {}), dict), 'headers 需为对象'
+
+
+def _validate_ssh_probe(probe):
+    assert isinstance(probe.get('expected_banner') or '', str), 'expected_banner 需为字符串'
+    # 登录凭据不保存在附加探测中（接口返回、审计日志可见），只能引用服务端配置的凭据名称
+    for field in SSH_CREDENTIAL_FIELDS:
+        assert field not in probe, f'不支持 {field}，请通过 credential 引用 PROBE.SSH_CREDENTIALS 中的凭据'
+    credential = probe.get('credential')
+    if credential is not None:
+        assert isinstance(credential, str) and get_ssh_credential(credential), \
+            'credential 需为 PROBE.SSH_CREDENTIALS 中已配置的凭据名称'
+
+
+def _validate_telnet_probe(probe):
+    assert isinstance(probe.get('expected_banner') or '', str), 'expected_banner 需为字符串'
+    banner_timeout = probe.get('banner_timeout')
+    assert banner_timeout is None or (isinstance(banner_timeout, (int, float)) and banner_timeout > 0), \
+        'banner_timeout 需为正数'
+
+
+def _validate_custom_probe(probe):
+    script = probe.get('script')
+    assert isinstance(script, str) and script.strip(), 'script 不能为空'
+    expected_returncode = probe.get('expected_returncode', 0)
+    assert isinstance(expected_returncode, int), 'expected_returncode 需为整数'
+    try:
+        resolve_custom_script(script)
+    except ValueError as e:
+        raise AssertionError(f'script 不合法: {e}')
+
+
+_PROBE_VALIDATORS = {
+    'http': _validate_http_probe,
+    'ssh': _validate_ssh_probe,
+    'telnet': _validate_telnet_probe,
+    'custom': _validate_custom_probe,
+}
+
+
+def validate_extra_probes(extra_probes):
+    """
+    校验 BaseInfo 的附加探测配置，不合法时抛出 AssertionError
+    :param extra_probes: [{'type': 探活方式, ...探活参数}, ...]
+    """
+    assert isinstance(extra_probes, list), 'extra_probes 需为列表'
+    for probe in extra_probes:
+        assert isinstance(probe, dict), '附加探测需为对象'
+        assert probe.get('type') in EXTRA_PROBE_TYPES, f"附加探测 type 只能为 {'/'.join(EXTRA_PROBE_TYPES)}"
+        port = probe.get('port')
+        assert port is None or (isinstance(port, int) and 0 < port < 65536), '附加探测 port 不合法'
+        timeout = probe.get('timeout')
+        assert timeout is None or (isinstance(timeout, (int, float)) and timeout > 0), '附加探测 timeout 需为正数'
+        _PROBE_VALIDATORS[probe['type']](probe)
+    return extra_probes
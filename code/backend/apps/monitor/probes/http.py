@@ -1,93 +1,148 @@
+import asyncio
+import socket
 import time
-import requests
-from .base import BaseProbe
+import weakref
 
+import httpx
 
-class HttpProbe(BaseProbe):
+from backend.settings import config_data
+from .base import AsyncBaseProbe
+
+HTTP_METHODS = ('GET', 'HEAD', 'POST', 'PUT', 'OPTIONS')
+# 匹配响应内容时最多读取的字节数
+MAX_CONTENT_BYTES = 64 * 1024
+
+# 每个事件循环的连接池客户端 {loop: {verify_ssl: AsyncClient}}
+_clients = weakref.WeakKeyDictionary()
+
+
+def get_http_client(verify_ssl=True):
+    """获取当前事件循环中复用连接的 HTTP 客户端"""
+    loop = asyncio.get_running_loop()
+    loop_clients = _clients.setdefault(loop, {})
+    client = loop_clients.get(verify_ssl)
+    if client is None:
+        probe_config = config_data.get('PROBE', {}) or {}
+        client = loop_clients[verify_ssl] = httpx.AsyncClient(
+            verify=verify_ssl,
+            limits=httpx.Limits(
+                max_connections=probe_config.get('HTTP_MAX_CONNECTIONS', 100),
+                max_keepalive_connections=probe_config.get('HTTP_MAX_KEEPALIVE_CONNECTIONS', 20),
+            ),
+        )
+    return client
+
+
+def _format_host(host):
+    return f'[{host}]' if ':' in host else host
+
+
+class HttpProbe(AsyncBaseProbe):
     """
-    HTTP探活实现
+    HTTP(S)探活实现
+
+    params: {
+        'scheme': 'http' / 'https'，默认端口为 443 时 https，否则 http,
+        'port': 端口，默认使用 BaseInfo 的端口,
+        'path': 请求路径，默认 '/',
+        'method': 请求方法，默认 GET,
+        'headers': 请求头,
+        'expected_codes': 视为健康的状态码，默认 [200],
+        'expected_content': 响应内容需包含的文本,
+        'verify_ssl': 是否校验证书，默认 True,
+        'follow_redirects': 是否跟随重定向，默认 False,
+        'timeout': 超时时间（秒），默认 5
+    }
     """
-    def check(self, node):
+    PROBE_TYPE = 'http'
+
+    def build_url(self, host, port=None):
+        port = self.params.get('port') or port
+        scheme = self.params.get('scheme') or ('https' if port == 443 else 'http')
+        path = self.params.get('path') or '/'
+        default_port = 443 if scheme == 'https' else 80
+        netloc = _format_host(host) if not port or int(port) == default_port else f'{_format_host(host)}:{port}'
+        return f'{scheme}://{netloc}{path}', port or default_port
+
+    async def check_async(self, host, port=None):
+        url, port = self.build_url(host, port)
+        timeout = self.timeout
+        timings = {}
+
+        # httpcore 的 trace 事件：连接建立、TLS 握手、发送请求、收到响应头
+        async def trace(event_name, info):
+            timings[event_name.split('.', 1)[-1]] = time.perf_counter()
+
+        result = self.build_result(
+            host, port,
+            url=url,
+            status_code=None,
+            connect_time=None,
+            tls_time=None,
+            ttfb=None,
+            total_time=None,
+            connection_reused=None,
+            content_length=None
+        )
+        async def _request():
+            async with client.stream(
+                self.params.get('method', 'GET').upper(),
+                url,
+                headers=self.params.get('headers'),
+                follow_redirects=self.params.get('follow_redirects', False),
+                timeout=timeout,
+                extensions={'trace': trace},
+            ) as response:
+                headers_time = time.perf_counter()
+                content = b''
+                if 'expected_content' in self.params:
+                    async for chunk in response.aiter_bytes():
+                        content += chunk
+                        if len(content) >= MAX_CONTENT_BYTES:
+                            break
+                else:
+                    content = await response.aread()
+                return response, headers_time, content, time.perf_counter()
+
+        start_time = time.perf_counter()
         try:
-            start_time = time.time()
-            
-            # 构建URL
-            protocol = self.params.get('protocol', 'http')
-            path = self.params.get('path', '/')
-            port = node.port or self.params.get('port', 80 if protocol == 'http' else 443)
-            
-            if node.ip_address:
-                url = f"{protocol}://{node.ip_address}:{port}{path}"
-            elif node.host:
-                url = f"{protocol}://{node.host}:{port}{path}"
-            else:
-                return {
-                    'is_healthy': False,
-                    'response_time': 0,
-                    'error_message': 'No IP address or host specified'
-                }
-            
-            # 准备请求参数
-            timeout = self.params.get('timeout', 5)
-            method = self.params.get('method', 'GET').upper()
-            
-            req_kwargs = {
-                'timeout': timeout,
-                'verify': self.params.get('verify_ssl', True),
-            }
-            
-            if self.params.get('headers'):
-                req_kwargs['headers'] = self.params['headers']
-            
-            if self.params.get('auth'):
-                req_kwargs['auth'] = tuple(self.params['auth'])
-            
-            # 发送请求
-            response = requests.request(method, url, **req_kwargs)
-            response_time = (time.time() - start_time) * 1000  # 转换为毫秒
-            
-            # 检查状态码
-            expected_codes = self.params.get('expected_codes', [200])
-            is_healthy = response.status_code in expected_codes
-            
-            # 检查响应内容
-            if is_healthy and 'expected_content' in self.params:
-                expected = self.params['expected_content']
-                if expected not in response.text:
-                    is_healthy = False
-                    response_time = (time.time() - start_time) * 1000
-            
-            error_message = None if is_healthy else f"HTTP {response.status_code}"
-            
-            return {
-                'is_healthy': is_healthy,
-                'response_time': response_time,
-                'error_message': error_message,
-                'details': {
-                    'status_code': response.status_code,
-                    'headers': dict(response.headers),
-                    'content_length': len(response.text)
-                }
-            }
-            
-        except requests.exceptions.Timeout:
-            return {
-                'is_healthy': False,
-                'response_time': (time.time() - start_time) * 1000,
-                'error_message': 'HTTP request timeout',
-                'details': {}
-            }
-        except requests.exceptions.RequestException as e:
-            return {
-                'is_healthy': False,
-                'response_time': (time.time() - start_time) * 1000,
-                'error_message': str(e),
-                'details': {}
-            }
+            client = get_http_client(self.params.get('verify_ssl', True))
+            # 整个请求（含读取响应内容）的总超时
+            response, headers_time, content, end_time = await asyncio.wait_for(_request(), timeout=timeout)
+        except (asyncio.TimeoutError, httpx.TimeoutException):
+            result.update(error_type='timeout', error_message=f'HTTP request timeout after {timeout}s')
+            return result
+        except httpx.ConnectError as e:
+            is_dns_error = isinstance(e.__cause__, socket.gaierror) or 'Name or service not known' in str(e)
+            result.update(error_type='dns' if is_dns_error else 'connect', error_message=str(e) or type(e).__name__)
+            return result
         except Exception as e:
-            return {
-                'is_healthy': False,
-                'response_time': 0,
-                'error_message': str(e),
-                'details': {}
-            }
\ No newline at end of file
+            result.update(error_type='connect', error_message=str(e) or type(e).__name__)
+            return result
+
+        def _duration(start_event, end_event):
+            if start_event in timings and end_event in timings:
+                return (timings[end_event] - timings[start_event]) * 1000
+            return None
+
+        total_time = (end_time - start_time) * 1000
+        result.update(
+            status_code=response.status_code,
+            connect_time=_duration('connect_tcp.started', 'connect_tcp.complete'),
+            tls_time=_duration('start_tls.started', 'start_tls.complete'),
+            ttfb=(timings.get('receive_response_headers.complete', headers_time) - start_time) * 1000,
+            total_time=total_time,
+            response_time=total_time,
+            # 复用连接池中的连接时没有建立连接事件
+            connection_reused='connect_tcp.started' not in timings,
+            content_length=len(content),
+        )
+
+        expected_codes = self.params.get('expected_codes') or [200]
+        if response.status_code not in expected_codes:
+            result.update(error_type='status', error_message=f'HTTP {response.status_code}')
+        elif 'expected_content' in self.params and self.params['expected_content'] not in content.decode(errors='ignore'):
+            result.update(error_type='content', error_message='Expected content not found')
+        else:
+            result['is_healthy'] = True
+        return result
@@ -1,5 +1,6 @@
 import time
 import subprocess
+from apps.monitor.async_probes import AsyncProbeManager
 from .base import BaseProbe
 
 
@@ -7,6 +8,12 @@ class PingProbe(BaseProbe):
     """
     Ping探活实现
     """
+    PROBE_TYPE = 'ping'
+
+    async def check_async(self, host, port=None):
+        result = await AsyncProbeManager(timeout=self.params.get('timeout', 3)).ping_async(host)
+        return {'probe_type': self.PROBE_TYPE, 'port': None, **result}
+
     def check(self, node):
         # 使用 BaseInfo 模型
         from apps.monitor.models import BaseInfo
@@ -1,5 +1,6 @@
 import time
 import socket
+from apps.monitor.async_probes import AsyncProbeManager
 from .base import BaseProbe
 
 
@@ -7,6 +8,18 @@ class PortProbe(BaseProbe):
     """
     端口探活实现
     """
+    PROBE_TYPE = 'port'
+
+    async def check_async(self, host, port=None):
+        port = self.params.get('port') or port
+        if not port:
+            return {
+                'probe_type': self.PROBE_TYPE, 'host': host, 'port': None, 'is_healthy': False,
+                'response_time': None, 'error_type': 'connect', 'error_message': 'No port specified'
+            }
+        result = await AsyncProbeManager(timeout=self.params.get('timeout', 3)).port_check_async(host, int(port))
+        return {'probe_type': self.PROBE_TYPE, **result}
+
     def check(self, node):
         # 使用 BaseInfo 模型
         from apps.monitor.models import BaseInfo
@@ -1,79 +1,136 @@
+import asyncio
 import time
-import paramiko
-from .base import BaseProbe
 
+from backend.settings import config_data
+from apps.monitor.dns_resolver import DnsResolutionError
+from apps.monitor.probe_runtime import get_subprocess_semaphore
+from .base import AsyncBaseProbe, close_writer, open_tcp_connection
 
-class SshProbe(BaseProbe):
+try:
+    import asyncssh
+except ImportError:  # 可选依赖，未安装时使用 paramiko（线程池）
+    asyncssh = None
+
+try:
+    import paramiko
+except ImportError:
+    paramiko = None
+
+# 附加探测中不允许出现的登录凭据字段（凭据只保存在服务端配置中）
+SSH_CREDENTIAL_FIELDS = ('username', 'password', 'key_file')
+
+
+def get_ssh_credential(name):
+    """
+    按名称获取服务端配置的 SSH 登录凭据（PROBE.SSH_CREDENTIALS）
+    :return: {'username': ..., 'password': ..., 'key_file': ...}，不存在时返回 None
+    """
+    credentials = (config_data.get('PROBE', {}) or {}).get('SSH_CREDENTIALS', {}) or {}
+    credential = credentials.get(name) if name else None
+    if not isinstance(credential, dict):
+        return None
+    return {field: credential.get(field) for field in SSH_CREDENTIAL_FIELDS}
+
+
+class SshProbe(AsyncBaseProbe):
     """
     SSH探活实现
+
+    默认只读取 SSH 版本标识（banner），指定了登录凭据时额外验证登录
+    params: {
+        'port': 端口，默认 22,
+        'expected_banner': banner 需包含的文本（如 OpenSSH）,
+        'credential': 登录凭据名称，对应 PROBE.SSH_CREDENTIALS 中的配置（用户名和密码/私钥文件路径）,
+        'timeout': 超时时间（秒），默认 5
+    }
     """
-    def check(self, node):
-        if not node.ip_address and not node.host:
-            return {
-                'is_healthy': False,
-                'response_time': 0,
-                'error_message': 'No IP address or host specified',
-                'details': {}
-            }
-        
+    PROBE_TYPE = 'ssh'
+
+    async def check_async(self, host, port=None):
+        port = self.params.get('port') or 22
+        result = self.build_result(host, port, banner=None, connect_time=None, auth_checked=False)
+        start_time = time.perf_counter()
         try:
-            start_time = time.time()
-            
-            hostname = node.ip_address or node.host
-            port = node.port or 22
-            username = self.params.get('username', 'root')
-            password = self.params.get('password')
-            key_file = self.params.get('key_file')
-            
-            ssh = paramiko.SSHClient()
-            ssh.set_missing_host_key_policy(paramiko.AutoAddPolicy())
-            
-            if key_file:
-                ssh.connect(
-                    hostname=hostname,
-                    port=port,
-                    username=username,
-                    key_filename=key_file,
-                    timeout=self.params.get('timeout', 5)
-                )
-            else:
-                ssh.connect(
-                    hostname=hostname,
-                    port=port,
-                    username=username,
-                    password=password,
-                    timeout=self.params.get('timeout', 5)
-                )
-            
-            response_time = (time.time() - start_time) * 1000  # 转换为毫秒
-            
-            ssh.close()
-            
-            return {
-                'is_healthy': True,
-                'response_time': response_time,
-                'error_message': None,
-                'details': {}
-            }
-            
-        except paramiko.AuthenticationException:
-            return {
-                'is_healthy': False,
-                'response_time': (time.time() - start_time) * 1000,
-                'error_message': 'SSH authentication failed',
-                'details': {}
-            }
-        except paramiko.SSHException as e:
-            return {
-                'is_healthy': False,
-                'response_time': (time.time() - start_time) * 1000,
-                'error_message': f'SSH connection error: {str(e)}',
-                'details': {}
-            }
+            await asyncio.wait_for(self._check(host, port, result), timeout=self.timeout)
+        except DnsResolutionError as e:
+            result.update(error_type='dns', error_message=str(e))
+        except asyncio.TimeoutError:
+            result.update(error_type='timeout', error_message=f'SSH timeout after {self.timeout}s')
         except Exception as e:
-            return {
-                'is_healthy': False,
-                'response_time': (time.time() - start_time) * 1000,
-                'error_message': str(e),
-                'details': {}
-            }
\ No newline at end of file
+            result.update(error_type=result['error_type'] or 'connect', error_message=str(e) or type(e).__name__)
+        else:
+            result['is_healthy'] = result['error_type'] is None
+        result['response_time'] = (time.perf_counter() - start_time) * 1000
+        return result
+
+    async def _check(self, host, port, result):
+        reader, writer, result['connect_time'] = await open_tcp_connection(host, port, self.timeout)
+        try:
+            banner = (await reader.readline()).decode(errors='ignore').strip()
+        finally:
+            await close_writer(writer)
+
+        result['banner'] = banner
+        if not banner.startswith('SSH-'):
+            result.update(error_type='banner', error_message=f'Invalid SSH banner: {banner[:100]}')
+            return
+        expected_banner = self.params.get('expected_banner')
+        if expected_banner and expected_banner not in banner:
+            result.update(error_type='banner', error_message=f'Expected banner not found: {expected_banner}')
+            return
+
+        credential_name = self.params.get('credential')
+        if not credential_name:
+            return
+        credential = get_ssh_credential(credential_name)
+        if not credential or not credential['username'] or not (credential['password'] or credential['key_file']):
+            result.update(error_type='auth', error_message=f'SSH credential not configured: {credential_name}')
+            return
+        result['auth_checked'] = True
+        error_message = await self._check_auth(host, port, credential)
+        if error_message:
+            result.update(error_type='auth', error_message=error_message)
+
+    async def _check_auth(self, host, port, credential):
+        """验证登录，成功返回 None，失败返回错误信息"""
+        username = credential['username']
+        password = credential['password']
+        key_file = credential['key_file']
+
+        if asyncssh is not None:
+            try:
+                async with asyncssh.connect(
+                    host, port=port, username=username, password=password,
+                    client_keys=[key_file] if key_file else None,
+                    known_hosts=None, connect_timeout=self.timeout
+                ):
+                    return None
+            except asyncssh.PermissionDenied:
+                return 'SSH authentication failed'
+
+        if paramiko is not None:
+            def _connect():
+                ssh = paramiko.SSHClient()
+                ssh.set_missing_host_key_policy(paramiko.AutoAddPolicy())
+                try:
+                    ssh.connect(
+                        hostname=host, port=port, username=username, password=password,
+                        key_filename=key_file, timeout=self.timeout,
+                        allow_agent=False, look_for_keys=False
+                    )
+                except paramiko.AuthenticationException:
+                    return 'SSH authentication failed'
+                finally:
+                    ssh.close()
+                return None
+
+            # 阻塞的 paramiko 在线程池中执行，与子进程共用并发限制。
+            # 超时取消只能取消等待，线程仍会运行到 paramiko 自身超时，
+            # 因此名额在线程结束时（done 回调）才释放
+            semaphore = get_subprocess_semaphore()
+            await semaphore.acquire()
+            future = asyncio.ensure_future(asyncio.to_thread(_connect))
+            future.add_done_callback(lambda _: semaphore.release())
+            return await asyncio.shield(future)
+
+        return 'SSH authentication check requires asyncssh or paramiko'
@@ -1,51 +1,93 @@
+import asyncio
 import time
-import telnetlib
-from .base import BaseProbe
 
+from apps.monitor.dns_resolver import DnsResolutionError
+from .base import AsyncBaseProbe, close_writer, open_tcp_connection
 
-class TelnetProbe(BaseProbe):
+IAC = 0xff
+# WILL / WONT / DO / DONT 后跟一个选项字节
+IAC_OPTION_COMMANDS = (0xfb, 0xfc, 0xfd, 0xfe)
+MAX_BANNER_BYTES = 4096
+
+
+def strip_telnet_commands(data: bytes) -> bytes:
+    """去除 telnet 协商命令（IAC 序列）"""
+    output = bytearray()
+    index = 0
+    while index < len(data):
+        byte = data[index]
+        if byte != IAC:
+            output.append(byte)
+            index += 1
+            continue
+        command = data[index + 1] if index + 1 < len(data) else None
+        if command == IAC:
+            output.append(IAC)
+            index += 2
+        elif command in IAC_OPTION_COMMANDS:
+            index += 3
+        else:
+            index += 2
+    return bytes(output)
+
+
+class TelnetProbe(AsyncBaseProbe):
     """
     Telnet探活实现
+
+    建立连接后在 banner_timeout 内读取欢迎信息，配置了 expected_banner 时需包含该文本
+    params: {
+        'port': 端口，默认使用 BaseInfo 的端口，都没有时为 23,
+        'expected_banner': banner 需包含的文本,
+        'banner_timeout': 等待 banner 的时间（秒），默认 1,
+        'timeout': 超时时间（秒），默认 5
+    }
     """
-    def check(self, node):
-        if not node.ip_address and not node.host:
-            return {
-                'is_healthy': False,
-                'response_time': 0,
-                'error_message': 'No IP address or host specified',
-                'details': {}
-            }
-        
-        if not node.port:
-            return {
-                'is_healthy': False,
-                'response_time': 0,
-                'error_message': 'No port specified',
-                'details': {}
-            }
-        
+    PROBE_TYPE = 'telnet'
+
+    async def check_async(self, host, port=None):
+        port = self.params.get('port') or port or 23
+        result = self.build_result(host, port, banner=None, connect_time=None)
+        expected_banner = self.params.get('expected_banner')
+        start_time = time.perf_counter()
         try:
-            start_time = time.time()
-            
-            hostname = node.ip_address or node.host
-            port = node.port
-            
-            tn = telnetlib.Telnet(hostname, port, timeout=self.params.get('timeout', 5))
-            response_time = (time.time() - start_time) * 1000  # 转换为毫秒
-            
-            tn.close()
-            
-            return {
-                'is_healthy': True,
-                'response_time': response_time,
-                'error_message': None,
-                'details': {}
-            }
-            
+            reader, writer, result['connect_time'] = await open_tcp_connection(host, port, self.timeout)
+            try:
+                banner = await self._read_banner(reader, expected_banner, start_time)
+            finally:
+                await close_writer(writer)
+        except DnsResolutionError as e:
+            result.update(error_type='dns', error_message=str(e))
+        except asyncio.TimeoutError:
+            result.update(error_type='timeout', error_message=f'Telnet timeout after {self.timeout}s')
         except Exception as e:
-            return {
-                'is_healthy': False,
-                'response_time': (time.time() - start_time) * 1000,
-                'error_message': str(e),
-                'details': {}
-            }
\ No newline at end of file
+            result.update(error_type='connect', error_message=str(e) or type(e).__name__)
+        else:
+            result['banner'] = banner
+            if expected_banner and expected_banner not in banner:
+                result.update(error_type='banner', error_message=f'Expected banner not found: {expected_banner}')
+            else:
+                result['is_healthy'] = True
+        result['response_time'] = (time.perf_counter() - start_time) * 1000
+        return result
+
+    async def _read_banner(self, reader, expected_banner, start_time):
+        """读取 banner，直到包含期望文本、连接关闭或等待超时"""
+        banner_timeout = min(self.params.get('banner_timeout', 1), self.timeout)
+        deadline = start_time + (self.timeout if expected_banner else banner_timeout)
+        data = b''
+        while len(data) < MAX_BANNER_BYTES:
+            remaining = deadline - time.perf_counter()
+            if remaining <= 0:
+                break
+            try:
+                chunk = await asyncio.wait_for(reader.read(1024), timeout=remaining)
+            except asyncio.TimeoutError:
+                break
+            if not chunk:
+                break
+            data += chunk
+            banner = strip_telnet_commands(data).decode(errors='ignore')
+            if not expected_banner or expected_banner in banner:
+                break
+        return strip_telnet_commands(data).decode(errors='ignore').strip()
@@ -0,0 +1,114 @@
+"""
+监控接口 GET 响应缓存
+
+缓存 key 由以下部分组成，任一变化即视为新的缓存：
+- 视图名
+- 规范化后的请求参数（排序，忽略前端防缓存参数）
+- 请求体（pub_get_request_body 会合并 JSON/表单请求体中的参数）
+- 调用者的权限版本
+- 响应依赖的数据域版本号（见 cache_utils）
+
+同时支持 ETag / If-None-Match，数据未变化的轮询直接返回 304。
+"""
+import hashlib
+from functools import wraps
+
+from django.http import HttpResponse, HttpResponseNotModified
+from django_redis import get_redis_connection
+
+from lib.log import color_logger
+from .cache_utils import get_cache_versions
+
+RESPONSE_CACHE_REDIS_DB = 'default'
+RESPONSE_CACHE_KEY_PREFIX = 'monitor_response_cache'
+
+# 前端防缓存用的时间戳参数，不参与缓存 key
+IGNORED_CACHE_PARAMS = {'_', '_t', 'timestamp'}
+
+# 只缓存成功的响应（pub_success_response 输出以此开头）
+SUCCESS_RESPONSE_PREFIX = b'{"success": true'
+
+
+def _get_permission_version(request):
+    """调用者的权限版本（预编译接口权限的内容指纹，命中进程内缓存时无网络请求）"""
+    user_name = getattr(request, 'user_name', None)
+    if not user_name:
+        return ''
+    from apps.perm.utils import get_user_api_permission
+    return get_user_api_permission(user_name, is_user_name=True).version or ''
+
+
+def build_response_cache_key(view_name, request, domains):
+    """生成缓存 key"""
+    params = sorted(
+        (key, sorted(values))
+        for key, values in request.GET.lists()
+        if key not in IGNORED_CACHE_PARAMS
+    )
+    # 带请求体的 GET 按请求体原始内容区分（request.body 会缓存，视图中仍可读取）
+    body = request.body
+    body_digest = (request.headers.get('Content-Type', ''), hashlib.md5(body).hexdigest()) if body else None
+    versions = get_cache_versions(domains)
+    raw = repr((params, body_digest, _get_permission_version(request), sorted(versions.items())))
+    digest = hashlib.md5(raw.encode('utf-8')).hexdigest()
+    return f'{RESPONSE_CACHE_KEY_PREFIX}:{view_name}:{digest}'
+
+
+def _etag_matches(request, etag):
+    if_none_match = request.headers.get('If-None-Match')
+    if not if_none_match:
+        return False
+    return etag in [tag.strip() for tag in if_none_match.split(',')] or if_none_match.strip() == '*'
+
+
+def _build_response(request, content, etag):
+    if _etag_matches(request, etag):
+        response = HttpResponseNotModified()
+    else:
+        response = HttpResponse(content, content_type='application/json')
+    response['ETag'] = etag
+    # 浏览器每次都需向服务端确认，由 ETag 决定是否返回 304
+    response['Cache-Control'] = 'no-cache'
+    return response
+
+
+def monitor_response_cache(domains, timeout=60):
+    """
+    GET 响应缓存装饰器（用于类视图的 get 方法）
+
+    :param domains: 响应依赖的数据域，如 ('topology', 'health')
+    :param timeout: 缓存过期时间（秒），兜底时间相关的数据（如趋势图）
+    """
+    def decorator(view_method):
+        @wraps(view_method)
+        def wrapper(self, request, *args, **kwargs):
+            view_name = type(self).__name__
+            try:
+                cache_key = build_response_cache_key(view_name, request, domains)
+                redis_conn = get_redis_connection(RESPONSE_CACHE_REDIS_DB)
+                cached = redis_conn.hmget(cache_key, 'etag', 'content')
+            except Exception as e:
+                color_logger.error(f"读取接口响应缓存失败，直接查询: {view_name}, {e}")
+                return view_method(self, request, *args, **kwargs)
+
+            etag, content = cached
+            if etag and content is not None:
+                return _build_response(request, content, etag.decode('utf-8'))
+
+            response = view_method(self, request, *args, **kwargs)
+            if response.status_code != 200 or not response.content.startswith(SUCCESS_RESPONSE_PREFIX):
+                return response
+
+            content = response.content
+            etag = f'"{hashlib.md5(content).hexdigest()}"'
+            try:
+                pipeline = redis_conn.pipeline()
+                pipeline.hset(cache_key, mapping={'etag': etag, 'content': content})
+                pipeline.expire(cache_key, timeout)
+                pipeline.execute()
+            except Exception as e:
+                color_logger.error(f"写入接口响应缓存失败: {view_name}, {e}")
+
+            return _build_response(request, content, etag)
+        return wrapper
+    return decorator
@@ -0,0 +1,291 @@
+"""
+节点/基础信息健康状态汇总（小时/天）
+
+定时任务从原始健康记录增量生成已结束时间桶的汇总数据：
+- 数据源默认为 InfluxDB（探活任务的完整时序记录），配置为 mysql 时读取 NodeHealth（仅节点）
+- 每个粒度在 SystemHealthStats 中保存水位线（已汇总到的时间桶结束时间）
+- 每次只处理水位线之后已结束的时间桶，重复执行幂等（先删后写）
+- 天粒度按本地时区的自然日划分
+
+长周期趋势和 SLA 统计读取汇总表，水位线之后（尚未汇总）的部分再读取原始记录。
+"""
+import math
+import uuid
+from datetime import datetime, timedelta
+
+from django.db import transaction
+from django.utils import timezone
+
+from backend.settings import config_data
+from lib.influxdb_tool import InfluxDBManager
+from lib.log import color_logger
+from .models import BaseInfo, BaseInfoHealthRollup, Node, NodeHealth, NodeHealthRollup, SystemHealthStats
+
+ROLLUP_GRANULARITIES = ('hour', 'day')
+
+# 汇总对象：汇总模型、目标模型、外键字段、InfluxDB measurement 和 tag
+ROLLUP_TARGETS = {
+    'node': {
+        'model': NodeHealthRollup,
+        'target_model': Node,
+        'field': 'node_id',
+        'measurement': 'node_health',
+        'tag': 'node_id',
+    },
+    'base_info': {
+        'model': BaseInfoHealthRollup,
+        'target_model': BaseInfo,
+        'field': 'base_info_id',
+        'measurement': 'base_info_health',
+        'tag': 'base_info_id',
+    },
+}
+ROLLUP_WATERMARK_KEY_PREFIX = 'node_health_rollup_watermark'
+# 汇总结果分批写入的条数
+ROLLUP_WRITE_BATCH_SIZE = 1000
+
+# 状态严重程度，时间桶内取最差状态
+STATUS_PRIORITY = {'green': 0, 'unknown': 1, 'yellow': 2, 'red': 3}
+FAILED_STATUSES = ('yellow', 'red')
+
+
+def get_rollup_config():
+    """获取汇总配置"""
+    rollup_config = config_data.get('HEALTH_ROLLUP', {}) or {}
+    return {
+        'max_catchup_hours': rollup_config.get('MAX_CATCHUP_HOURS', 24),
+        'hour_retention_days': rollup_config.get('HOUR_RETENTION_DAYS', 90),
+        'day_retention_days': rollup_config.get('DAY_RETENTION_DAYS', 730),
+        'source': rollup_config.get('SOURCE', 'influxdb'),
+    }
+
+
+def truncate_to_bucket(value, granularity):
+    """将时间截断到所在时间桶的开始时间（本地时区）"""
+    value = timezone.localtime(value)
+    if granularity == 'hour':
+        return value.replace(minute=0, second=0, microsecond=0)
+    return timezone.make_aware(datetime.combine(value.date(), datetime.min.time()))
+
+
+def next_bucket(bucket_start, granularity):
+    """下一个时间桶的开始时间"""
+    if granularity == 'hour':
+        return bucket_start + timedelta(hours=1)
+    next_day = timezone.localtime(bucket_start).date() + timedelta(days=1)
+    return timezone.make_aware(datetime.combine(next_day, datetime.min.time()))
+
+
+def _get_watermark_key(granularity):
+    return f'{ROLLUP_WATERMARK_KEY_PREFIX}_{granularity}'
+
+
+def get_rollup_watermark(granularity):
+    """获取汇总水位线，水位线之前的时间桶均已汇总"""
+    value = SystemHealthStats.objects.filter(key=_get_watermark_key(granularity)).values_list('value', flat=True).first()
+    if not value:
+        return None
+    try:
+        return datetime.fromisoformat(value)
+    except ValueError:
+        return None
+
+
+def set_rollup_watermark(granularity, watermark):
+    SystemHealthStats.objects.update_or_create(
+        key=_get_watermark_key(granularity),
+        defaults={
+            'value': watermark.isoformat(),
+            'meta_info': {'granularity': granularity, 'updated_at': timezone.now().isoformat()}
+        }
+    )
+
+
+def percentile(sorted_values, percent):
+    """最近秩法计算百分位数"""
+    if not sorted_values:
+        return None
+    rank = max(math.ceil(percent / 100 * len(sorted_values)), 1)
+    return sorted_values[rank - 1]
+
+
+def summarize_health_records(records):
+    """
+    汇总一组健康记录
+    :param records: [(healthy_status, response_time), ...]
+    """
+    total_checks = 0
+    healthy_checks = 0
+    failed_checks = 0
+    worst_status = None
+    response_times = []
+    for healthy_status, response_time in records:
+        total_checks += 1
+        if healthy_status == 'green':
+            healthy_checks += 1
+        elif healthy_status in FAILED_STATUSES:
+            failed_checks += 1
+        if worst_status is None or STATUS_PRIORITY.get(healthy_status, 1) > STATUS_PRIORITY.get(worst_status, 1):
+            worst_status = healthy_status
+        if response_time is not None:
+            response_times.append(response_time)
+
+    # 可用率只统计有明确结果的检查，未知状态不计入
+    checked = healthy_checks + failed_checks
+    response_times.sort()
+    return {
+        'worst_status': worst_status or 'unknown',
+        'total_checks': total_checks,
+        'healthy_checks': healthy_checks,
+        'failed_checks': failed_checks,
+        'availability': round(healthy_checks / checked * 100, 4) if checked else None,
+        'avg_response_time': sum(response_times) / len(response_times) if response_times else None,
+        'p95_response_time': percentile(response_times, 95),
+    }
+
+
+def iter_health_records(target_type, range_start, range_end, source):
+    """
+    读取原始健康记录（按目标、时间排序，同一目标的记录连续）
+    :return: 生成器，元素为 (目标ID, 时间, 健康状态, 响应时间)
+    """
+    if source == 'mysql':
+        # NodeHealth 只有节点记录
+        if target_type != 'node':
+            return iter(())
+        return NodeHealth.objects.filter(
+            create_time__gte=range_start,
+            create_time__lt=range_end
+        ).order_by('node_id', 'create_time').values_list('node_id', 'create_time', 'healthy_status', 'response_time').iterator(chunk_size=5000)
+
+    target = ROLLUP_TARGETS[target_type]
+    return InfluxDBManager().iter_health_records(target['measurement'], target['tag'], range_start, range_end)
+
+
+def iter_bucket_records(target_type, granularity, range_start, range_end, source):
+    """
+    按 (目标ID, 时间桶) 流式分组原始记录，同一时间只在内存中保留一个时间桶的记录
+    :return: 生成器，元素为 ((目标ID, 时间桶开始时间), [(健康状态, 响应时间), ...])
+    """
+    current_key = None
+    items = []
+    # 已输出的分组，用于发现数据源未按目标、时间排序的情况
+    emitted_keys = set()
+    for target_id, record_time, healthy_status, response_time in iter_health_records(target_type, range_start, range_end, source):
+        try:
+            target_id = uuid.UUID(str(target_id))
+        except (TypeError, ValueError):
+            continue
+        key = (target_id, truncate_to_bucket(record_time, granularity))
+        if key != current_key:
+            if current_key is not None:
+                yield current_key, items
+            if key in emitted_keys:
+                # 抛出异常，水位线不前进，避免写入拆分的汇总
+                raise ValueError(f'健康记录未按目标和时间排序: {target_type}, {key}')
+            emitted_keys.add(key)
+            current_key = key
+            items = []
+        items.append((healthy_status or 'unknown', response_time))
+    if current_key is not None:
+        yield current_key, items
+
+
+def build_health_rollups(target_type, granularity, range_start, range_end, source=None):
+    """
+    从原始记录生成 [range_start, range_end) 内各时间桶的汇总（覆盖已有数据）
+
+    原始记录流式读取、汇总结果分批写入，追赶窗口较长时内存占用不随记录数增长。
+    :return: 写入的汇总条数
+    """
+    target = ROLLUP_TARGETS[target_type]
+    source = source or get_rollup_config()['source']
+    rollup_model = target['model']
+    target_model = target['target_model']
+
+    # 目标是否存在 {目标ID: bool}，忽略已被物理删除的对象
+    existing_ids = {}
+    pending = []
+    count = 0
+
+    def _flush():
+        nonlocal count
+        unknown_ids = {rollup_target_id for rollup_target_id, _ in pending if rollup_target_id not in existing_ids}
+        if unknown_ids:
+            found_ids = set(target_model.all_objects.filter(uuid__in=unknown_ids).values_list('uuid', flat=True))
+            existing_ids.update({target_id: target_id in found_ids for target_id in unknown_ids})
+        rollups = [rollup for rollup_target_id, rollup in pending if existing_ids[rollup_target_id]]
+        rollup_model.objects.bulk_create(rollups, batch_size=ROLLUP_WRITE_BATCH_SIZE)
+        count += len(rollups)
+        pending.clear()
+
+    with transaction.atomic():
+        rollup_model.all_objects.filter(
+            granularity=granularity,
+            bucket_start__gte=range_start,
+            bucket_start__lt=range_end
+        ).delete()
+        for (target_id, bucket_start), items in iter_bucket_records(target_type, granularity, range_start, range_end, source):
+            pending.append((target_id, rollup_model(
+                granularity=granularity,
+                bucket_start=bucket_start,
+                **{target['field']: target_id},
+                **summarize_health_records(items)
+            )))
+            if len(pending) >= ROLLUP_WRITE_BATCH_SIZE:
+                _flush()
+        if pending:
+            _flush()
+    return count
+
+
+def rollup_node_health(granularity, now=None):
+    """
+    增量汇总水位线之后已结束的时间桶
+    :return: (处理的时间范围开始, 结束, 写入的汇总条数)，没有需要处理的时间桶时返回 None
+    """
+    now = now or timezone.now()
+    rollup_config = get_rollup_config()
+    current_bucket = truncate_to_bucket(now, granularity)
+
+    range_start = get_rollup_watermark(granularity)
+    if range_start is None:
+        # 首次执行从原始记录的保留期开始（MySQL 保留 30 天）
+        range_start = truncate_to_bucket(now - timedelta(days=30), granularity)
+
+    # 单次最多追赶 max_catchup_hours，剩余部分由下次执行继续
+    range_end = current_bucket
+    catchup_end = range_start + timedelta(hours=rollup_config['max_catchup_hours'])
+    if catchup_end < range_end:
+        range_end = truncate_to_bucket(catchup_end, granularity)
+        if range_end <= range_start:
+            range_end = next_bucket(range_start, granularity)
+    if range_end <= range_start:
+        return None
+
+    # 数据源读取失败时抛出异常，水位线不前进，下次执行重试
+    count = 0
+    for target_type in ROLLUP_TARGETS:
+        count += build_health_rollups(target_type, granularity, range_start, range_end, rollup_config['source'])
+    set_rollup_watermark(granularity, range_end)
+    color_logger.debug(f"健康状态汇总完成: {granularity}, {range_start} ~ {range_end}, {count} 条")
+    return range_start, range_end, count
+
+
+def cleanup_node_health_rollups(now=None):
+    """按粒度清理过期的汇总数据"""
+    now = now or timezone.now()
+    rollup_config = get_rollup_config()
+    retention_days = {
+        'hour': rollup_config['hour_retention_days'],
+        'day': rollup_config['day_retention_days'],
+    }
+    deleted = {}
+    for granularity, days in retention_days.items():
+        deleted[granularity] = 0
+        for target in ROLLUP_TARGETS.values():
+            deleted[granularity] += target['model'].all_objects.filter(
+                granularity=granularity,
+                bucket_start__lt=now - timedelta(days=days)
+            ).delete()[0]
+    return deleted
@@ -0,0 +1,79 @@
+from django.db.models.signals import post_init, post_save, post_delete
+from django.dispatch import receiver
+
+from .cache_utils import ALERT_CACHE_DOMAIN, TOPOLOGY_CACHE_DOMAIN, bump_cache_version_on_commit
+from .dashboard_summary import invalidate_summary_counters
+from .events import ALERT_STATUS_EVENTS, publish_alert_event
+from .models import Alert, AppSetting, BaseInfo, Link, Node, NodeBaseInfo, NodeConnection
+from .probe_config import invalidate_app_settings
+
+# 探活任务只更新这些健康状态字段，不影响架构图结构
+HEALTH_ONLY_UPDATE_FIELDS = {
+    Node: {'healthy_status', 'last_check_time'},
+    BaseInfo: {'is_healthy'},
+}
+
+TOPOLOGY_MODELS = (Link, Node, NodeConnection, NodeBaseInfo, BaseInfo)
+# 影响仪表板概要统计的模型
+SUMMARY_MODELS = (Link, Node)
+
+
+def is_health_only_update(sender, update_fields):
+    """是否只更新了健康状态字段"""
+    health_fields = HEALTH_ONLY_UPDATE_FIELDS.get(sender)
+    return bool(health_fields and update_fields and set(update_fields) <= health_fields)
+
+
+def bump_topology_version():
+    """事务提交后递增架构图版本号"""
+    bump_cache_version_on_commit(TOPOLOGY_CACHE_DOMAIN)
+
+
+@receiver(post_save)
+def topology_post_save(sender, instance, update_fields=None, **kwargs):
+    if sender not in TOPOLOGY_MODELS:
+        return
+    if is_health_only_update(sender, update_fields):
+        return
+    bump_topology_version()
+    if sender in SUMMARY_MODELS:
+        invalidate_summary_counters()
+
+
+@receiver(post_delete)
+def topology_post_delete(sender, instance, **kwargs):
+    if sender not in TOPOLOGY_MODELS:
+        return
+    bump_topology_version()
+    if sender in SUMMARY_MODELS:
+        invalidate_summary_counters()
+
+
+@receiver(post_save, sender=Alert)
+@receiver(post_delete, sender=Alert)
+def alert_changed(sender, instance, **kwargs):
+    bump_cache_version_on_commit(ALERT_CACHE_DOMAIN)
+
+
+@receiver(post_save, sender=AppSetting)
+@receiver(post_delete, sender=AppSetting)
+def app_setting_changed(sender, instance, **kwargs):
+    invalidate_app_settings()
+
+
+@receiver(post_init, sender=Alert)
+def alert_post_init(sender, instance, **kwargs):
+    # 记录加载时的状态，保存时据此判断告警是否发生了打开/关闭/静默
+    instance._event_status = instance.__dict__.get('status')
+
+
+@receiver(post_save, sender=Alert)
+def alert_status_event(sender, instance, created=False, **kwargs):
+    previous_status = None if created else getattr(instance, '_event_status', None)
+    if instance.status == previous_status:
+        return
+    instance._event_status = instance.status
+
+    event_type = ALERT_STATUS_EVENTS.get(instance.status)
+    if event_type:
+        publish_alert_event(instance, event_type)
@@ -0,0 +1,288 @@
+"""
+可用性 / SLA 统计
+
+基于健康状态汇总（小时/天）按时间顺序流式计算，不加载原始记录：
+- 每个时间桶的异常比例 = 异常次数 / (健康次数 + 异常次数)，停机时长 = 时间桶时长 × 异常比例
+- 异常比例达到故障阈值（SLA.INCIDENT_THRESHOLD，百分比）的时间桶属于故障（incident），
+  连续的故障时间桶视为一次故障，低于阈值的时间桶视为恢复；
+  低于阈值的零星异常只计入停机时长，不产生故障（避免天粒度下一次抖动变成一整天的故障）
+- 没有有效检查（无数据或全部未知）的时间桶不计入观测时长，也不改变故障状态
+- 链路的异常比例由同一时间桶内各节点的异常比例按规则（SLA.LINK_DOWN_RULE）得出：
+  - any（默认）：链路上的节点串联，任一节点不可用即链路不可用，取节点异常比例的最大值
+  - all：节点互为冗余，全部节点不可用才算链路不可用，取节点异常比例的最小值
+  链路的检查次数仍为各节点之和，只用于展示
+
+指标：
+- uptime_percent  可用率 = (观测时长 - 停机时长) / 观测时长
+- mttr_seconds    平均修复时间 = 已恢复故障的停机时长 / 已恢复故障数
+- mtbf_seconds    平均故障间隔 = 正常运行时长 / 故障数
+
+汇总粒度决定故障的时间精度：小时汇总精确到小时，超出小时汇总保留期的范围使用天汇总。
+"""
+from datetime import timedelta
+
+from django.utils import timezone
+
+from backend.settings import config_data
+from .models import BaseInfo, BaseInfoHealthRollup, Link, Node, NodeHealthRollup
+from .rollup import get_rollup_config, get_rollup_watermark, next_bucket, truncate_to_bucket
+
+SLA_TARGET_TYPES = ('node', 'link', 'base_info')
+BUCKET_SECONDS = {
+    'hour': 3600,
+    'day': 86400,
+}
+SLA_PERIOD_DAYS = {
+    'day': 1,
+    'week': 7,
+    'month': 30,
+    'quarter': 90,
+    'year': 365,
+}
+LINK_DOWN_RULES = ('any', 'all')
+
+
+def get_sla_config():
+    """获取 SLA 统计配置"""
+    sla_config = config_data.get('SLA', {}) or {}
+    link_down_rule = sla_config.get('LINK_DOWN_RULE', 'any')
+    return {
+        'incident_threshold': float(sla_config.get('INCIDENT_THRESHOLD', 10)) / 100,
+        'link_down_rule': link_down_rule if link_down_rule in LINK_DOWN_RULES else 'any',
+    }
+
+
+class SlaAccumulator:
+    """单个对象的 SLA 流式累加器，需按时间顺序输入时间桶"""
+
+    __slots__ = (
+        'incident_threshold',
+        'total_checks', 'healthy_checks', 'failed_checks', 'observed_seconds', 'downtime_seconds',
+        'incidents', 'resolved_incidents', 'repair_seconds', 'longest_incident_seconds',
+        'in_incident', 'incident_seconds', 'last_incident_start',
+    )
+
+    def __init__(self, incident_threshold=0.1):
+        # 异常比例达到该值的时间桶属于故障
+        self.incident_threshold = incident_threshold
+        self.total_checks = 0
+        self.healthy_checks = 0
+        self.failed_checks = 0
+        self.observed_seconds = 0.0
+        self.downtime_seconds = 0.0
+        self.incidents = 0
+        self.resolved_incidents = 0
+        self.repair_seconds = 0.0
+        self.longest_incident_seconds = 0.0
+        self.in_incident = False
+        self.incident_seconds = 0.0
+        self.last_incident_start = None
+
+    def add_bucket(self, bucket_start, bucket_seconds, healthy_checks, failed_checks, total_checks, failed_ratio=None):
+        """
+        输入一个时间桶
+        :param failed_ratio: 异常比例，为空时按检查次数计算（链路由节点状态得出）
+        """
+        self.total_checks += total_checks
+        self.healthy_checks += healthy_checks
+        self.failed_checks += failed_checks
+
+        checked = healthy_checks + failed_checks
+        if checked == 0:
+            return
+        self.observed_seconds += bucket_seconds
+        if failed_ratio is None:
+            failed_ratio = failed_checks / checked
+
+        downtime = bucket_seconds * failed_ratio
+        self.downtime_seconds += downtime
+        if failed_ratio > 0 and failed_ratio >= self.incident_threshold:
+            if not self.in_incident:
+                self.in_incident = True
+                self.incidents += 1
+                self.incident_seconds = 0.0
+                self.last_incident_start = bucket_start
+            self.incident_seconds += downtime
+        elif self.in_incident:
+            self._close_incident()
+
+    def _close_incident(self):
+        self.in_incident = False
+        self.resolved_incidents += 1
+        self.repair_seconds += self.incident_seconds
+        self.longest_incident_seconds = max(self.longest_incident_seconds, self.incident_seconds)
+
+    def result(self):
+        uptime_seconds = self.observed_seconds - self.downtime_seconds
+        longest_incident_seconds = max(
+            self.longest_incident_seconds, self.incident_seconds if self.in_incident else 0.0
+        )
+        checked = self.healthy_checks + self.failed_checks
+        return {
+            'uptime_percent': round(uptime_seconds / self.observed_seconds * 100, 4) if self.observed_seconds else None,
+            'check_availability_percent': round(self.healthy_checks / checked * 100, 4) if checked else None,
+            'observed_seconds': round(self.observed_seconds),
+            'downtime_seconds': round(self.downtime_seconds),
+            'incidents': self.incidents,
+            'ongoing_incident': self.in_incident,
+            'last_incident_start': self.last_incident_start,
+            'mttr_seconds': round(self.repair_seconds / self.resolved_incidents) if self.resolved_incidents else None,
+            'mtbf_seconds': round(uptime_seconds / self.incidents) if self.incidents else None,
+            'longest_incident_seconds': round(longest_incident_seconds),
+            'total_checks': self.total_checks,
+            'healthy_checks': self.healthy_checks,
+            'failed_checks': self.failed_checks,
+        }
+
+
+def get_sla_range(period='month', start_time=None, end_time=None):
+    """获取统计时间范围，未指定开始/结束时间时按周期向前推算"""
+    end_time = end_time or timezone.now()
+    if start_time is None:
+        start_time = end_time - timedelta(days=SLA_PERIOD_DAYS.get(period, SLA_PERIOD_DAYS['month']))
+    return start_time, end_time
+
+
+def choose_sla_granularity(start_time, now=None):
+    """开始时间仍在小时汇总保留期内时使用小时汇总，否则使用天汇总"""
+    now = now or timezone.now()
+    hour_retention_days = get_rollup_config()['hour_retention_days']
+    return 'hour' if start_time >= now - timedelta(days=hour_retention_days) else 'day'
+
+
+def _iter_rollup_rows(target_type, granularity, range_start, range_end, target_uuid=None, link_down_rule='any'):
+    """
+    按 (对象, 时间桶) 顺序流式读取汇总
+    :return: 生成器，元素为 (对象ID, 时间桶开始时间, 健康次数, 异常次数, 检查次数, 异常比例)，
+             异常比例为 None 时按检查次数计算
+    """
+    fields = ('bucket_start', 'healthy_checks', 'failed_checks', 'total_checks')
+    if target_type == 'base_info':
+        queryset = BaseInfoHealthRollup.objects.filter(
+            granularity=granularity, bucket_start__gte=range_start, bucket_start__lt=range_end
+        )
+        if target_uuid:
+            queryset = queryset.filter(base_info_id=target_uuid)
+        rows = queryset.order_by('base_info_id', 'bucket_start').values_list('base_info_id', *fields).iterator(chunk_size=5000)
+        return (row + (None,) for row in rows)
+
+    queryset = NodeHealthRollup.objects.filter(
+        granularity=granularity, bucket_start__gte=range_start, bucket_start__lt=range_end
+    )
+    if target_type == 'node':
+        if target_uuid:
+            queryset = queryset.filter(node_id=target_uuid)
+        rows = queryset.order_by('node_id', 'bucket_start').values_list('node_id', *fields).iterator(chunk_size=5000)
+        return (row + (None,) for row in rows)
+
+    # 链路：逐个节点读取，同一时间桶内按规则由节点状态得出链路状态
+    if target_uuid:
+        queryset = queryset.filter(node__link_id=target_uuid)
+    rows = queryset.order_by('node__link_id', 'bucket_start').values_list(
+        'node__link_id', *fields
+    ).iterator(chunk_size=5000)
+    return _iter_link_buckets(rows, link_down_rule)
+
+
+def _iter_link_buckets(node_rows, link_down_rule):
+    """将按 (链路, 时间桶) 排序的节点汇总合并为链路的时间桶"""
+    combine = max if link_down_rule == 'any' else min
+    current_key = None
+    healthy_sum = failed_sum = total_sum = 0
+    node_ratios = []
+    for link_id, bucket_start, healthy_checks, failed_checks, total_checks in node_rows:
+        healthy_checks, failed_checks, total_checks = healthy_checks or 0, failed_checks or 0, total_checks or 0
+        key = (link_id, bucket_start)
+        if key != current_key:
+            if current_key is not None:
+                yield current_key + (healthy_sum, failed_sum, total_sum, combine(node_ratios) if node_ratios else None)
+            current_key = key
+            healthy_sum = failed_sum = total_sum = 0
+            node_ratios = []
+        healthy_sum += healthy_checks
+        failed_sum += failed_checks
+        total_sum += total_checks
+        checked = healthy_checks + failed_checks
+        # 没有有效检查的节点不参与链路状态判断
+        if checked:
+            node_ratios.append(failed_checks / checked)
+    if current_key is not None:
+        yield current_key + (healthy_sum, failed_sum, total_sum, combine(node_ratios) if node_ratios else None)
+
+
+def _get_target_info(target_type, target_ids):
+    """批量获取对象名称等展示信息"""
+    if target_type == 'node':
+        return {
+            node.uuid: {'name': node.name, 'link': {'uuid': str(node.link_id), 'name': node.link.name}}
+            for node in Node.all_objects.filter(uuid__in=target_ids).select_related('link')
+        }
+    if target_type == 'link':
+        return {
+            link_uuid: {'name': name}
+            for link_uuid, name in Link.all_objects.filter(uuid__in=target_ids).values_list('uuid', 'name')
+        }
+    return {
+        base_info_uuid: {'name': f'{host}:{port}' if port else host, 'host': host, 'port': port}
+        for base_info_uuid, host, port in BaseInfo.all_objects.filter(uuid__in=target_ids).values_list('uuid', 'host', 'port')
+    }
+
+
+def compute_sla(target_type, start_time, end_time, target_uuid=None, granularity=None):
+    """
+    计算 SLA 报告
+    :param target_type: node / link / base_info
+    :param target_uuid: 只统计指定对象，为空时统计所有有数据的对象
+    :param granularity: hour / day，为空时根据开始时间自动选择
+    """
+    assert target_type in SLA_TARGET_TYPES, f'不支持的统计对象: {target_type}'
+    granularity = granularity or choose_sla_granularity(start_time)
+    assert granularity in BUCKET_SECONDS, f'不支持的汇总粒度: {granularity}'
+
+    # 统计范围对齐到时间桶，且不超过已汇总的水位线
+    range_start = truncate_to_bucket(start_time, granularity)
+    range_end = truncate_to_bucket(end_time, granularity)
+    if range_end < end_time:
+        range_end = next_bucket(range_end, granularity)
+    watermark = get_rollup_watermark(granularity)
+    covered_until = min(max(watermark, range_start), range_end) if watermark else range_start
+
+    sla_config = get_sla_config()
+    bucket_seconds = BUCKET_SECONDS[granularity]
+    results = {}
+    current_id = None
+    accumulator = None
+    if covered_until > range_start:
+        for target_id, bucket_start, healthy_checks, failed_checks, total_checks, failed_ratio in _iter_rollup_rows(
+            target_type, granularity, range_start, covered_until, target_uuid, sla_config['link_down_rule']
+        ):
+            if target_id != current_id:
+                if accumulator is not None:
+                    results[current_id] = accumulator.result()
+                current_id = target_id
+                accumulator = SlaAccumulator(sla_config['incident_threshold'])
+            accumulator.add_bucket(
+                bucket_start, bucket_seconds, healthy_checks or 0, failed_checks or 0, total_checks or 0, failed_ratio
+            )
+        if accumulator is not None:
+            results[current_id] = accumulator.result()
+
+    target_info = _get_target_info(target_type, list(results.keys())) if results else {}
+    items = []
+    for target_id, result in results.items():
+        items.append({
+            'uuid': str(target_id),
+            **target_info.get(target_id, {'name': None}),
+            **result,
+        })
+    # 可用率低的排在前面
+    items.sort(key=lambda item: (item['uptime_percent'] is None, item['uptime_percent'] or 0))
+
+    return {
+        'target_type': target_type,
+        'granularity': granularity,
+        'start_time': range_start,
+        'end_time': range_end,
+        'covered_until': covered_until,
+        'items': items,
+    }
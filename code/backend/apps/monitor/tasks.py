@@ -1,18 +1,27 @@
+import json
 import uuid
 from celery import shared_task
+from celery.signals import worker_process_init
 from django.utils import timezone
 from django.db import transaction
 
 from lib.time_tools import utc_obj_to_time_zone_str
-from lib.redis_tool import get_redis_value, set_redis_value, delete_redis_value
+from lib.redis_tool import RedisLock, get_redis_value, mget_values, set_redis_value, delete_redis_value
+from .dashboard_summary import rebuild_summary_counters, record_node_status_transition
+from .cache_utils import HEALTH_CACHE_DOMAIN, bump_cache_version, bump_cache_version_on_commit
+from .events import BASE_INFO_STATUS_EVENT, NODE_STATUS_EVENT, publish_monitor_event
 from django_redis import get_redis_connection
 from .models import Node, NodeHealth, Alert, SystemHealthStats
+from .rollup import ROLLUP_GRANULARITIES, cleanup_node_health_rollups, rollup_node_health
 from .probes.factory import get_probe_instance
+from .probe_runtime import get_probe_runtime, get_probe_runtime_config, shard_probe_targets
+from .probe_config import ProbeConfig
 from lib.log import color_logger
 from lib.influxdb_tool import InfluxDBManager
 from .alert_config_parser import alert_config_parser, AlertRule
 import operator
-from datetime import timedelta
+from datetime import datetime, timedelta
+from types import SimpleNamespace
 
 def deduplicate_basic_info_list(basic_info_list):
     """
@@ -45,6 +54,51 @@ def deduplicate_basic_info_list(basic_info_list):
     return unique_list
 
 
+# 探活任务（一轮 check_all_nodes）相关的 Redis 键
+CHECK_ALL_NODES_LOCK_KEY = 'ops_arch_dashboard_check_all_nodes_lock'
+CHECK_ALL_NODES_TASK_INDEX_KEY = 'check_all_nodes_tasks'
+CHECK_ALL_NODES_TASK_INDEX_SIZE = 100
+# 任务完成后保留任务信息的时间（秒）
+CHECK_ALL_NODES_TASK_HISTORY_EXPIRE = 3600
+# 节点完成时锁的剩余时间不足该值则续租（秒）
+CHECK_ALL_NODES_LOCK_LEASE = 600
+
+# 节点完成：从待检查集合移除（去重），更新计数；全部完成时结束任务并释放属于本任务的锁，否则按需续租
+# 返回剩余待检查节点数，节点已处理过或任务不存在时返回 -1
+_CHECK_NODE_COMPLETE_SCRIPT = """
+if redis.call('SREM', KEYS[2], ARGV[1]) == 0 then
+    return -1
+end
+redis.call('HINCRBY', KEYS[1], ARGV[2], 1)
+redis.call('HSET', KEYS[1], 'end_time', ARGV[3])
+local remaining = redis.call('HINCRBY', KEYS[1], 'pending', -1)
+if remaining <= 0 then
+    redis.call('HSET', KEYS[1], 'final_end_time', ARGV[3], 'status', 'completed')
+    redis.call('EXPIRE', KEYS[1], ARGV[5])
+    redis.call('DEL', KEYS[2])
+    if redis.call('GET', KEYS[3]) == ARGV[4] then
+        redis.call('DEL', KEYS[3])
+    end
+    return 0
+end
+-- 仍有节点在检查且锁属于本任务时续租，避免长时间的探活被其他任务抢占
+if redis.call('GET', KEYS[3]) == ARGV[4] and redis.call('PTTL', KEYS[3]) < tonumber(ARGV[6]) then
+    redis.call('PEXPIRE', KEYS[3], ARGV[6])
+    redis.call('PEXPIRE', KEYS[1], ARGV[6])
+    redis.call('PEXPIRE', KEYS[2], ARGV[6])
+end
+return remaining
+"""
+
+
+def get_check_all_nodes_task_key(task_uuid):
+    return f"check_all_nodes_task:{task_uuid}"
+
+
+def get_check_all_nodes_pending_key(task_uuid):
+    return f"check_all_nodes_task:{task_uuid}:pending"
+
+
 def _record_node_health_check_duration(node_uuid, start_time, check_duration=None):
     node_uuid = str(node_uuid)
     if check_duration is None:
@@ -64,13 +118,288 @@ def _record_node_health_check_duration(node_uuid, start_time, check_duration=Non
         }
     )
 
+# 节点最近一次检查结果（供告警规则使用，常规检查路径不写 NodeHealth）
+NODE_LATEST_CHECK_KEY_PREFIX = 'node_latest_check'
+NODE_LATEST_CHECK_EXPIRE = 3600
+
+
+def get_node_latest_check_key(node_uuid):
+    return f"{NODE_LATEST_CHECK_KEY_PREFIX}:{node_uuid}"
+
+
+def _record_node_latest_check(node_uuid, healthy_status, response_time, probe_result, error_message):
+    """记录节点本次检查结果（含 probe_details），告警检查以此作为规则上下文"""
+    try:
+        set_redis_value('default', get_node_latest_check_key(node_uuid), {
+            'healthy_status': healthy_status,
+            'response_time': response_time,
+            'probe_result': probe_result,
+            'error_message': error_message,
+            'create_time': timezone.now().isoformat(),
+        }, set_expire=NODE_LATEST_CHECK_EXPIRE)
+    except Exception as e:
+        color_logger.error(f"Failed to record latest check for node {node_uuid}: {str(e)}", exc_info=True)
+
+
+def get_nodes_latest_check(node_uuids):
+    """
+    批量获取节点最近一次检查结果
+    :return: {节点UUID字符串: 与 NodeHealth 字段一致的记录对象}
+    """
+    node_uuids = [str(node_uuid) for node_uuid in node_uuids]
+    try:
+        values = mget_values('default', [get_node_latest_check_key(node_uuid) for node_uuid in node_uuids])
+    except Exception as e:
+        color_logger.error(f"Failed to get latest node checks: {str(e)}", exc_info=True)
+        return {}
+    latest_checks = {}
+    for node_uuid in node_uuids:
+        value = values.get(get_node_latest_check_key(node_uuid))
+        if not value:
+            continue
+        try:
+            create_time = datetime.fromisoformat(value['create_time'])
+        except (KeyError, TypeError, ValueError):
+            continue
+        latest_checks[node_uuid] = SimpleNamespace(
+            healthy_status=value.get('healthy_status'),
+            response_time=value.get('response_time'),
+            probe_result=value.get('probe_result') or {},
+            error_message=value.get('error_message'),
+            create_time=create_time,
+        )
+    return latest_checks
+
+
+def _update_node_healthy_status(node, healthy_status):
+    """更新节点健康状态，状态变化时同步仪表板概要统计计数器和健康缓存版本"""
+    previous_status = node.healthy_status
+    node.healthy_status = healthy_status
+    node.last_check_time = timezone.now()
+    node.save(update_fields=['healthy_status', 'last_check_time'])
+
+    if previous_status != healthy_status:
+        record_node_status_transition(node, previous_status, healthy_status)
+        bump_cache_version_on_commit(HEALTH_CACHE_DOMAIN)
+        publish_monitor_event(node.link_id, NODE_STATUS_EVENT, {
+            'uuid': str(node.uuid),
+            'healthy_status': healthy_status,
+            'previous_status': previous_status,
+            'last_check_time': node.last_check_time,
+        })
+
+
+def _update_base_info_healthy(base_info, is_healthy, link_uuid=None):
+    """更新基础信息健康状态，未变化时不写库；link_uuid 为触发检查的节点所在链路"""
+    if base_info.is_healthy == is_healthy:
+        return
+    previous_healthy = base_info.is_healthy
+    base_info.is_healthy = is_healthy
+    base_info.save(update_fields=['is_healthy'])
+    bump_cache_version_on_commit(HEALTH_CACHE_DOMAIN)
+    publish_monitor_event(link_uuid, BASE_INFO_STATUS_EVENT, {
+        'uuid': str(base_info.uuid),
+        'host': base_info.host,
+        'port': base_info.port,
+        'is_healthy': is_healthy,
+        'previous_healthy': previous_healthy,
+    })
+
+@worker_process_init.connect
+def warm_up_probe_settings(**kwargs):
+    """worker 进程启动时加载配置快照，探活任务读取配置时不再访问数据库"""
+    try:
+        ProbeConfig.get_probe_settings()
+    except Exception as e:
+        color_logger.warning(f"预加载探活配置失败，首次探活时加载: {e}")
+
+
+def _get_probe_key(host, port=None):
+    return f"{host}:{port}" if port is not None else host
+
+
+def get_extra_probe_key(host, port, probe):
+    """附加探测结果的 key（主机、端口和探测配置相同的只探测一次）"""
+    return ('extra', host, port, json.dumps(probe, sort_keys=True))
+
+
+def _run_probes(hosts_to_ping, host_port_pairs, probe_cache=None, extra_probes=()):
+    """
+    并发执行 ping、端口检测和附加探测
+    :param probe_cache: 已有的检测结果 {('ping', host) / ('port', host, port) / get_extra_probe_key(): 结果}，命中的目标不再检测
+    :param extra_probes: BaseInfo 的附加探测 [(host, port, 探测配置), ...]
+    :return: (ping 结果 {host: 结果}, 端口结果 {"host:port": 结果}, 附加探测结果 {get_extra_probe_key(): 结果})
+    """
+    from .async_probes import AsyncProbeManager
+
+    probe_cache = probe_cache if probe_cache is not None else {}
+    jobs = []
+    for host in dict.fromkeys(hosts_to_ping):
+        if ('ping', host) not in probe_cache:
+            jobs.append((('ping', host), host, None, None))
+    for host, port in dict.fromkeys(host_port_pairs):
+        if ('port', host, port) not in probe_cache:
+            jobs.append((('port', host, port), host, port, None))
+    # 同一批次中重复的附加探测只执行一次（结果返回后才写入 probe_cache，执行失败时不留下占位）
+    extra_jobs = {}
+    for host, port, probe in extra_probes:
+        key = get_extra_probe_key(host, port, probe)
+        if key not in probe_cache and key not in extra_jobs:
+            extra_jobs[key] = (key, host, port, probe)
+    jobs.extend(extra_jobs.values())
+
+    if jobs:
+        probe_settings = ProbeConfig.get_probe_settings()
+        probe_manager = AsyncProbeManager.from_probe_settings(probe_settings)
+        coroutines = []
+        for key, host, port, probe in jobs:
+            if key[0] == 'ping':
+                coroutines.append(probe_manager.ping_async(host))
+            elif key[0] == 'port':
+                coroutines.append(probe_manager.port_check_async(host, port))
+            else:
+                # HTTP 默认使用 AppSetting 中的超时，其他探测方式使用各自的默认超时
+                params = {'timeout': probe_settings['http_timeout'], **probe} if probe['type'] == 'http' else probe
+                coroutines.append(get_probe_instance(probe['type'], params).check_async(host, port))
+        results = get_probe_runtime().run_batch(coroutines, timeout=get_probe_runtime_config()['batch_timeout'])
+        for (key, host, port, probe), result in zip(jobs, results):
+            if isinstance(result, Exception):
+                result = {
+                    'host': host,
+                    'is_healthy': False,
+                    'response_time': None,
+                    'dns_time': None,
+                    'error_type': None,
+                    'error_message': str(result)
+                }
+                if port is not None:
+                    result['port'] = port
+                if probe is not None:
+                    result['probe_type'] = probe['type']
+            probe_cache[key] = result
+
+    ping_result_map = {host: probe_cache[('ping', host)] for host in hosts_to_ping}
+    port_result_map = {
+        _get_probe_key(host, port): probe_cache[('port', host, port)]
+        for host, port in host_port_pairs
+    }
+    extra_result_map = {
+        get_extra_probe_key(host, port, probe): probe_cache[get_extra_probe_key(host, port, probe)]
+        for host, port, probe in extra_probes
+    }
+    return ping_result_map, port_result_map, extra_result_map
+
+
+# 记录到 probe_result['details'] 中的检测结果字段
+PROBE_DETAIL_FIELDS = ('port', 'url', 'is_healthy', 'response_time', 'error_type', 'error_message', 'status_code', 'returncode')
+
+
+def _append_probe_detail(probe_details, base_info_detail, probe_type, probe_result):
+    """记录单项检测的结果（告警规则上下文中的 probe_type、error_type、status_code 来源于此）"""
+    if not probe_result:
+        return
+    detail = {
+        'base_info_uuid': base_info_detail['uuid'],
+        'probe_type': probe_type,
+        'host': base_info_detail['host'],
+    }
+    detail.update({field: probe_result[field] for field in PROBE_DETAIL_FIELDS if field in probe_result})
+    probe_details.append(detail)
+
+
+# 记录到 base_info_details 中的采样统计字段
+PROBE_STATS_FIELDS = ('min_rtt', 'avg_rtt', 'max_rtt', 'jitter', 'loss_percent', 'samples', 'attempts')
+
+
+def _merge_probe_result(base_info_detail, probe_type, probe_result):
+    """记录探测的采样统计、解析耗时和（首个）失败类型"""
+    if not probe_result:
+        return
+    base_info_detail['probe_stats'][probe_type] = {
+        field: probe_result.get(field) for field in PROBE_STATS_FIELDS
+    }
+    if probe_result.get('dns_time') is not None and base_info_detail['dns_time'] is None:
+        base_info_detail['dns_time'] = probe_result['dns_time']
+    if not probe_result['is_healthy'] and base_info_detail['error_type'] is None:
+        base_info_detail['error_type'] = probe_result.get('error_type')
+
+
+def _is_stale_fence_token(parent_task_lock_key, fence_token):
+    """fence_token 小于锁当前的 fencing token 时，说明本轮任务的锁已过期且新一轮已开始"""
+    if fence_token is None or not parent_task_lock_key:
+        return False
+    try:
+        current_fence_token = RedisLock.get_current_fence_token('default', parent_task_lock_key)
+    except Exception as e:
+        color_logger.error(f"Error getting fence token for {parent_task_lock_key}: {str(e)}")
+        return False
+    return current_fence_token > fence_token
+
+
 @shared_task
-def check_node_health(node_uuid, parent_task_lock_key=None, task_uuid=None):
+def check_node_health(node_uuid, parent_task_lock_key=None, task_uuid=None, fence_token=None):
     """
     检查单个节点健康状态（异步优化版）
+    fence_token 小于锁当前的 fencing token 时，说明本轮任务的锁已过期且新一轮已开始，跳过检查
+    """
+    _check_node_health(node_uuid, parent_task_lock_key, task_uuid, fence_token)
+
+
+@shared_task
+def check_nodes_health_batch(node_uuids, parent_task_lock_key=None, task_uuid=None, fence_token=None):
+    """
+    批量检查节点健康状态
+
+    先在常驻事件循环中并发探测整批节点的所有目标（多个节点共享的目标只探测一次），
+    再逐个节点汇总结果、更新状态
+    """
+    if _is_stale_fence_token(parent_task_lock_key, fence_token):
+        color_logger.info(f"Skip stale health check batch of {len(node_uuids)} nodes: fence token {fence_token}")
+        if task_uuid:
+            for node_uuid in node_uuids:
+                _check_and_release_parent_lock(parent_task_lock_key, node_uuid, False, task_uuid, skipped=True)
+        return
+
+    from .models import NodeBaseInfo
+
+    probe_cache = {}
+    try:
+        hosts_to_ping = []
+        host_port_pairs = []
+        extra_probes = []
+        for host, port, is_ping_disabled, base_info_extra_probes in NodeBaseInfo.objects.filter(
+            node_id__in=node_uuids, node__is_active=True
+        ).values_list('base_info__host', 'base_info__port', 'base_info__is_ping_disabled', 'base_info__extra_probes'):
+            if not host:
+                continue
+            if not is_ping_disabled:
+                hosts_to_ping.append(host)
+            if port:
+                host_port_pairs.append((host, port))
+            extra_probes.extend((host, port, probe) for probe in base_info_extra_probes or [])
+        _run_probes(hosts_to_ping, host_port_pairs, probe_cache, extra_probes)
+    except Exception as e:
+        # 预先探测失败时由各节点自行探测
+        probe_cache.clear()
+        color_logger.error(f"Error probing health check batch: {str(e)}", exc_info=True)
+
+    for node_uuid in node_uuids:
+        _check_node_health(node_uuid, parent_task_lock_key, task_uuid, None, probe_cache)
+
+
+def _check_node_health(node_uuid, parent_task_lock_key=None, task_uuid=None, fence_token=None, probe_cache=None):
+    """
+    检查单个节点健康状态
+    :param probe_cache: 批量任务预先探测的结果，见 _run_probes
     """
     start_time = timezone.now()
     success = False
+
+    if _is_stale_fence_token(parent_task_lock_key, fence_token):
+        color_logger.info(f"Skip stale health check for node {node_uuid}: fence token {fence_token}")
+        if task_uuid:
+            _check_and_release_parent_lock(parent_task_lock_key, node_uuid, False, task_uuid, skipped=True)
+        return
     
     try:
         color_logger.info(f"Start checking node health: {node_uuid}")
@@ -90,6 +419,7 @@ def check_node_health(node_uuid, parent_task_lock_key=None, task_uuid=None):
                     self.host = base_info.host
                     self.port = base_info.port
                     self.is_ping_disabled = base_info.is_ping_disabled  # 使用服务级配置
+                    self.extra_probes = base_info.extra_probes or []  # 附加探测（如 HTTP）
                     self.base_info = base_info  # 保存对基础信息的引用
                     self.node_base_info = node_base_info  # 保存对节点关联信息的引用
             
@@ -130,16 +460,13 @@ def check_node_health(node_uuid, parent_task_lock_key=None, task_uuid=None):
                 )
                 
                 # 更新节点状态
-                node.healthy_status = healthy_status
-                node.last_check_time = timezone.now()
-                node.save(update_fields=['healthy_status', 'last_check_time'])
+                _update_node_healthy_status(node, healthy_status)
                 
                 # 同步更新 BaseInfo 的健康状态（对于没有基础信息的情况，将所有相关基础信息设置为健康状态未知）
                 from .models import NodeBaseInfo
                 node_base_info_items = NodeBaseInfo.objects.filter(node=node).select_related('base_info')
                 for node_base_info in node_base_info_items:
-                    node_base_info.base_info.is_healthy = None  # 未知状态
-                    node_base_info.base_info.save(update_fields=['is_healthy'])
+                    _update_base_info_healthy(node_base_info.base_info, None, node.link_id)  # 未知状态
                 
                 # 将健康记录写入InfluxDB（时序数据库）
                 try:
@@ -156,6 +483,10 @@ def check_node_health(node_uuid, parent_task_lock_key=None, task_uuid=None):
                     color_logger.error(f"Failed to write to InfluxDB: {str(e)}", exc_info=True)
                     # 即使InfluxDB写入失败，也不影响主流程
 
+                _record_node_latest_check(
+                    node.uuid, healthy_status, None, probe_result_with_single_point,
+                    'No base info to check for single point detection'
+                )
                 _record_node_health_check_duration(node_uuid, start_time)
                 color_logger.info(f"Node {node.name} health check completed: {healthy_status} (single point detection data updated)")
                 success = True
@@ -163,16 +494,13 @@ def check_node_health(node_uuid, parent_task_lock_key=None, task_uuid=None):
             else:
                 # 没有基本信息且不需要检测单点，状态为未知
                 color_logger.info(f"Node {node.name} has no base info but not checking single point, setting to unknown")
-                node.healthy_status = 'unknown'
-                node.last_check_time = timezone.now()
-                node.save(update_fields=['healthy_status', 'last_check_time'])
+                _update_node_healthy_status(node, 'unknown')
                 
                 # 同步更新 BaseInfo 的健康状态（对于没有基础信息的情况，将所有相关基础信息设置为健康状态未知）
                 from .models import NodeBaseInfo
                 node_base_info_items = NodeBaseInfo.objects.filter(node=node).select_related('base_info')
                 for node_base_info in node_base_info_items:
-                    node_base_info.base_info.is_healthy = None  # 未知状态
-                    node_base_info.base_info.save(update_fields=['is_healthy'])
+                    _update_base_info_healthy(node_base_info.base_info, None, node.link_id)  # 未知状态
                 
                 # 创建健康记录
                 probe_result = {
@@ -187,6 +515,19 @@ def check_node_health(node_uuid, parent_task_lock_key=None, task_uuid=None):
                     error_message='No base info to check'
                 )
                 
+                # 同步写入InfluxDB，保证时序数据（健康状态汇总的数据源）完整
+                try:
+                    influxdb_manager = InfluxDBManager()
+                    influxdb_manager.write_node_health_data(
+                        node_uuid=str(node.uuid),
+                        healthy_status='unknown',
+                        probe_result=probe_result,
+                        error_message='No base info to check'
+                    )
+                except Exception as e:
+                    color_logger.error(f"Failed to write to InfluxDB: {str(e)}", exc_info=True)
+                
+                _record_node_latest_check(node.uuid, 'unknown', None, probe_result, 'No base info to check')
                 _record_node_health_check_duration(node_uuid, start_time)
                 color_logger.info(f"Node {node.name} health check completed: unknown (no base info)")
                 success = True
@@ -194,78 +535,31 @@ def check_node_health(node_uuid, parent_task_lock_key=None, task_uuid=None):
         else:
             color_logger.info(f"Node {node.name} has {total_count} BaseInfo items, proceeding with normal check")
         
-        # 使用异步探针管理器
-        from .async_probes import AsyncProbeManager
-        probe_manager = AsyncProbeManager(timeout=3)
-        
         # 提取需要检测的主机和端口
         hosts_to_ping = []
         host_port_pairs = []
         
+        extra_probes = []
+        
         for base_info_wrapper in base_info_items:
             # 检查是否禁ping
             if not base_info_wrapper.is_ping_disabled and base_info_wrapper.host:
-                hosts_to_ping.append((base_info_wrapper.host, str(base_info_wrapper.uuid)))  # 使用base_info的uuid作为唯一标识
+                hosts_to_ping.append(base_info_wrapper.host)
             
             if base_info_wrapper.host and base_info_wrapper.port:
-                host_port_pairs.append((base_info_wrapper.host, base_info_wrapper.port, str(base_info_wrapper.uuid)))
-        
-        # 并发执行检测任务
-        import asyncio
-        loop = asyncio.new_event_loop()
-        asyncio.set_event_loop(loop)
-        
-        try:
-            # 并发执行ping检测
-            ping_tasks = []
-            for host, base_info_uuid in hosts_to_ping:
-                ping_tasks.append(probe_manager.ping_async(host))
-            
-            ping_results = loop.run_until_complete(
-                asyncio.gather(*ping_tasks, return_exceptions=True)
-            )
-            
-            # 并发执行端口检测
-            port_tasks = []
-            for host, port, base_info_uuid in host_port_pairs:
-                port_tasks.append(probe_manager.port_check_async(host, port))
+                host_port_pairs.append((base_info_wrapper.host, base_info_wrapper.port))
             
-            port_results = loop.run_until_complete(
-                asyncio.gather(*port_tasks, return_exceptions=True)
-            )
-        finally:
-            loop.close()
-        
-        # 构建检测结果映射
-        ping_result_map = {}
-        for i, result in enumerate(ping_results):
-            if not isinstance(result, Exception):
-                ping_result_map[result['host']] = result
-            else:
-                host = hosts_to_ping[i][0]
-                ping_result_map[host] = {
-                    'host': host,
-                    'is_healthy': False,
-                    'response_time': None,
-                    'error_message': str(result)
-                }
+            if base_info_wrapper.host:
+                extra_probes.extend((base_info_wrapper.host, base_info_wrapper.port, probe) for probe in base_info_wrapper.extra_probes)
         
-        port_result_map = {}
-        for i, result in enumerate(port_results):
-            if not isinstance(result, Exception):
-                port_result_map[f"{result['host']}:{result['port']}"] = result
-            else:
-                host, port = host_port_pairs[i][:2]
-                port_result_map[f"{result['host']}:{result['port']}"] = {
-                    'host': host,
-                    'port': port,
-                    'is_healthy': False,
-                    'response_time': None,
-                    'error_message': str(result)
-                }
+        # 在常驻事件循环中并发执行检测（批量任务已预先探测的目标直接使用结果）
+        ping_result_map, port_result_map, extra_result_map = _run_probes(
+            hosts_to_ping, host_port_pairs, probe_cache, extra_probes
+        )
         
         # 构建新的 base_info_details
         base_info_details = []        # 新的数据结构，包含BaseInfo的所有信息
+        probe_details = []            # 每一项检测的结果，供告警规则使用（probe_type、error_type、status_code 等）
         healthy_count = 0
         total_response_time = 0
         probe_count = 0
@@ -277,12 +571,17 @@ def check_node_health(node_uuid, parent_task_lock_key=None, task_uuid=None):
                 'host': base_info_wrapper.host,
                 'port': base_info_wrapper.port,
                 'is_ping_disabled': base_info_wrapper.is_ping_disabled,
-                'is_healthy': True  # 假设初始健康
+                'is_healthy': True,  # 假设初始健康
+                'dns_time': None,    # 域名解析耗时（毫秒），与连接耗时分开记录
+                'error_type': None,  # 失败类型：dns / connect / timeout
+                'probe_stats': {}    # 各探测方式的采样统计：min/avg/max_rtt、jitter、loss_percent
             }
             
             # 检查ping结果
             if not base_info_wrapper.is_ping_disabled and base_info_wrapper.host:
                 ping_result = ping_result_map.get(base_info_wrapper.host)
+                _merge_probe_result(base_info_detail, 'ping', ping_result)
+                _append_probe_detail(probe_details, base_info_detail, 'ping', ping_result)
                 if ping_result and not ping_result['is_healthy']:
                     base_info_detail['is_healthy'] = False
                 if ping_result and ping_result.get('response_time'):
@@ -293,12 +592,39 @@ def check_node_health(node_uuid, parent_task_lock_key=None, task_uuid=None):
             if base_info_wrapper.host and base_info_wrapper.port:
                 port_key = f"{base_info_wrapper.host}:{base_info_wrapper.port}"
                 port_result = port_result_map.get(port_key)
+                _merge_probe_result(base_info_detail, 'port', port_result)
+                _append_probe_detail(probe_details, base_info_detail, 'port', port_result)
                 if port_result and not port_result['is_healthy']:
                     base_info_detail['is_healthy'] = False
                 if port_result and port_result.get('response_time'):
                     total_response_time += port_result['response_time']
                     probe_count += 1
             
+            # 检查附加探测结果（不计入平均响应时间）
+            if base_info_wrapper.host and base_info_wrapper.extra_probes:
+                base_info_detail['extra_probes'] = []
+                for probe in base_info_wrapper.extra_probes:
+                    extra_result = extra_result_map.get(get_extra_probe_key(base_info_wrapper.host, base_info_wrapper.port, probe))
+                    if not extra_result:
+                        # 探测未返回结果（如本批次执行失败）视为不健康
+                        extra_result = {
+                            'host': base_info_wrapper.host,
+                            'port': base_info_wrapper.port,
+                            'probe_type': probe['type'],
+                            'is_healthy': False,
+                            'response_time': None,
+                            'error_type': 'no_result',
+                            'error_message': 'No probe result',
+                        }
+                    if not extra_result['is_healthy']:
+                        base_info_detail['is_healthy'] = False
+                        if base_info_detail['error_type'] is None:
+                            base_info_detail['error_type'] = extra_result.get('error_type')
+                    base_info_detail['extra_probes'].append(
+                        {key: value for key, value in extra_result.items() if key != 'host'}
+                    )
+                    _append_probe_detail(probe_details, base_info_detail, probe['type'], extra_result)
+            
             # 如果base_info_detail健康，则影响总体健康计数
             if base_info_detail['is_healthy']:
                 healthy_count += 1
@@ -309,7 +635,7 @@ def check_node_health(node_uuid, parent_task_lock_key=None, task_uuid=None):
         
         # 确定整体健康状态
         # 使用total_count（BaseInfo的数量）来计算总体健康状态
-        total_checkable = len([bi for bi in base_info_details if bi['is_ping_disabled'] == False or bi['port'] is not None])
+        total_checkable = len([bi for bi in base_info_details if bi['is_ping_disabled'] == False or bi['port'] is not None or bi.get('extra_probes')])
         if total_checkable > 0:
             healthy_percentage = healthy_count / total_checkable
             if healthy_percentage == 1.0:
@@ -334,9 +660,7 @@ def check_node_health(node_uuid, parent_task_lock_key=None, task_uuid=None):
 
         # 更新节点
         with transaction.atomic():
-            node.healthy_status = healthy_status
-            node.last_check_time = timezone.now()
-            node.save(update_fields=['healthy_status', 'last_check_time'])
+            _update_node_healthy_status(node, healthy_status)
             
             # 同步更新 BaseInfo 的健康状态（全局基础信息）
             from .models import BaseInfo
@@ -345,8 +669,7 @@ def check_node_health(node_uuid, parent_task_lock_key=None, task_uuid=None):
                 base_info_detail = next((detail for detail in base_info_details if detail['uuid'] == str(base_info_wrapper.uuid)), None)
                 if base_info_detail:
                     # 更新共享的基础信息服务信息的健康状态
-                    base_info_wrapper.base_info.is_healthy = base_info_detail['is_healthy']
-                    base_info_wrapper.base_info.save(update_fields=['is_healthy'])
+                    _update_base_info_healthy(base_info_wrapper.base_info, base_info_detail['is_healthy'], node.link_id)
 
         # 在probe_result中添加单点检测状态信息，供check_all_alerts使用
         single_point_status = 'normal'
@@ -359,7 +682,7 @@ def check_node_health(node_uuid, parent_task_lock_key=None, task_uuid=None):
                 single_point_status = 'normal'
 
         probe_result_with_single_point = {
-            'details': [],  # 不再使用basic_info_list
+            'details': probe_details,
             'base_info_details': base_info_details,
             'single_point_status': single_point_status, 
             'single_point_count': total_count
@@ -375,11 +698,16 @@ def check_node_health(node_uuid, parent_task_lock_key=None, task_uuid=None):
                 probe_result=probe_result_with_single_point,
                 error_message=None if healthy_status == 'green' else 'One or more checks failed'
             )
+            influxdb_manager.write_base_info_health_data(base_info_details)
             color_logger.info(f"Wrote node health data to InfluxDB for node {node.name}")
         except Exception as e:
             color_logger.error(f"Failed to write to InfluxDB: {str(e)}", exc_info=True)
             # 即使InfluxDB写入失败，也不影响主流程
 
+        _record_node_latest_check(
+            node.uuid, healthy_status, avg_response_time, probe_result_with_single_point,
+            None if healthy_status == 'green' else 'One or more checks failed'
+        )
         _record_node_health_check_duration(node_uuid, start_time)
         
         color_logger.info(f"Node {node.name} health check completed: {healthy_status}")
@@ -392,26 +720,16 @@ def check_node_health(node_uuid, parent_task_lock_key=None, task_uuid=None):
         _record_node_health_check_duration(node_uuid, start_time, -2)
         color_logger.error(f"Error checking node health {node_uuid}: {str(e)}", exc_info=True)
     finally:
-        # 如果有任务UUID，更新Redis中对应任务的结束时间
-        if task_uuid:
-            try:
-                redis_conn = get_redis_connection("default")
-                task_redis_key = f"check_all_nodes_task:{task_uuid}"
-                
-                # 设置当前时间作为最新的更新时间
-                redis_conn.hset(task_redis_key, 'end_time', timezone.now().isoformat())
-            except Exception as redis_error:
-                color_logger.error(f"Error updating task end time for task_uuid {task_uuid}: {str(redis_error)}", exc_info=True)
-        
-        if parent_task_lock_key:
-            _check_and_release_parent_lock(parent_task_lock_key, node_uuid, success)
+        # 记录本轮探活任务的进度（同时更新任务最新的结束时间），全部完成时释放锁
+        if task_uuid and parent_task_lock_key:
+            _check_and_release_parent_lock(parent_task_lock_key, node_uuid, success, task_uuid)
 
 def get_check_all_nodes_task_info(task_uuid):
     """
     获取指定任务UUID的详细信息
     """
     redis_conn = get_redis_connection("default")
-    task_redis_key = f"check_all_nodes_task:{task_uuid}"
+    task_redis_key = get_check_all_nodes_task_key(task_uuid)
     
     # 获取Redis哈希中的所有字段
     task_info = redis_conn.hgetall(task_redis_key)
@@ -469,96 +787,59 @@ def get_check_all_nodes_task_info(task_uuid):
 
 def get_recent_check_all_nodes_tasks(limit=10):
     """
-    获取最近的check_all_nodes任务列表
+    获取最近的check_all_nodes任务列表（按开始时间倒序，读取有序集合索引）
     """
     redis_conn = get_redis_connection("default")
-    
-    # 查找所有check_all_nodes任务键
-    task_keys = redis_conn.keys("check_all_nodes_task:*")
-    
-    # 提取任务UUID并获取任务信息
+    task_uuids = [
+        task_uuid.decode('utf-8') if isinstance(task_uuid, bytes) else task_uuid
+        for task_uuid in redis_conn.zrevrange(CHECK_ALL_NODES_TASK_INDEX_KEY, 0, limit - 1)
+    ]
+
     tasks_info = []
-    for task_key in task_keys:
-        if isinstance(task_key, bytes):
-            task_key = task_key.decode('utf-8')
-        
-        task_uuid = task_key.replace("check_all_nodes_task:", "")
+    expired_task_uuids = []
+    for task_uuid in task_uuids:
         task_info = get_check_all_nodes_task_info(task_uuid)
-        
-        if task_info:  # 只添加存在的任务
+        if task_info:
             task_info['task_uuid'] = task_uuid
             tasks_info.append(task_info)
-    
-    # 按开始时间排序，返回最新的limit个任务
-    tasks_info.sort(key=lambda x: x.get('start_time', ''), reverse=True)
-    return tasks_info[:limit]
+        else:
+            expired_task_uuids.append(task_uuid)
+
+    # 任务信息已过期的从索引中移除
+    if expired_task_uuids:
+        redis_conn.zrem(CHECK_ALL_NODES_TASK_INDEX_KEY, *expired_task_uuids)
+    return tasks_info
 
 
-def _check_and_release_parent_lock(parent_task_lock_key, node_uuid, success=True):
+def _check_and_release_parent_lock(parent_task_lock_key, node_uuid, success=True, task_uuid=None, skipped=False):
     """
-    检查父任务是否完成，如果完成则释放锁
-    使用 Redis 集合来管理待处理的节点，每个节点完成时从集合中移除自己
+    记录节点检查完成，本轮所有节点完成时结束任务并释放锁
+
+    通过 Lua 脚本原子地从本轮的待检查集合中移除节点并更新任务 hash 中的计数，
+    同一节点重复完成（如任务重试）只计一次；锁的值为 task_uuid，只释放属于本轮任务的锁
     """
     try:
-        # 获取Redis实例
         redis_conn = get_redis_connection("default")
-        
-        # 获取待处理节点集合的键名
-        pending_nodes_key = f"{parent_task_lock_key}_pending_nodes"
-        
-        # 从待处理集合中移除当前完成的节点
-        redis_conn.srem(pending_nodes_key, node_uuid)
-        
-        # 检查是否还有待处理的节点
-        remaining_count = redis_conn.scard(pending_nodes_key)
-        
+        remaining_count = redis_conn.eval(
+            _CHECK_NODE_COMPLETE_SCRIPT, 3,
+            get_check_all_nodes_task_key(task_uuid),
+            get_check_all_nodes_pending_key(task_uuid),
+            parent_task_lock_key,
+            str(node_uuid),
+            'skipped' if skipped else ('completed' if success else 'failed'),
+            timezone.now().isoformat(),
+            task_uuid,
+            CHECK_ALL_NODES_TASK_HISTORY_EXPIRE,
+            CHECK_ALL_NODES_LOCK_LEASE * 1000
+        )
+
         if remaining_count == 0:
-            # 所有节点都已完成
-            # 查找与这个锁关联的任务UUID
-            # 从Redis hash中获取任务信息，其中可能包含task_uuid
-            # 从锁键名中提取任务UUID
-            # 锁键的格式是 "ops_arch_dashboard_check_all_nodes_lock"
-            # 相应的Redis hash键格式是 "check_all_nodes_task:{task_uuid}"
-            
-            # 遍历所有可能的任务键，找到与当前锁相关的任务
-            # 为了更精确地处理这个逻辑，我们采用另一种方法：
-            # 从锁数据中解析出任务UUID，如果有的话
-            # 或者在锁数据中存储任务UUID信息
-            lock_data = get_redis_value('default', parent_task_lock_key)
-            if lock_data:
-                try:
-                    # 锁数据格式为 "node_count:start_time"，但实际已存储在Redis hash中
-                    # 我们需要通过某种方式找到相关的任务键
-                    # 简单的方法是通过Redis键模式查找
-                    task_keys = redis_conn.keys("check_all_nodes_task:*")
-                    if task_keys:
-                        # 找到最近的活动任务，通常是最相关的
-                        for task_key in task_keys:
-                            # 检查该任务键是否已经设置了结束时间
-                            if not redis_conn.hexists(task_key, 'final_end_time'):
-                                # 设置最终结束时间
-                                redis_conn.hset(task_key, 'final_end_time', timezone.now().isoformat())
-                                redis_conn.hset(task_key, 'status', 'completed')
-                                # 保留这个键一段时间用于历史记录，不立即删除
-                                redis_conn.expire(task_key, 3600)  # 1小时后过期
-                                color_logger.info(f"Task {task_key} completed and final end time recorded")
-                                break
-            
-                except Exception as task_error:
-                    color_logger.error(f"Error updating final task end time: {str(task_error)}", exc_info=True)
-            
-            # 删除主锁和待处理集合
-            redis_conn.delete(parent_task_lock_key)
-            redis_conn.delete(pending_nodes_key)
-            color_logger.info(f"All node health checks completed, lock {parent_task_lock_key} released")
-        else:
+            # 一轮探活完成，刷新依赖检查时间等健康数据的缓存
+            bump_cache_version(HEALTH_CACHE_DOMAIN)
+            color_logger.info(f"All node health checks completed for task {task_uuid}, lock {parent_task_lock_key} released")
+        elif remaining_count > 0:
             status_msg = "successfully" if success else "with failure"
-            color_logger.debug(f"Node {node_uuid} completed {status_msg}, {remaining_count} nodes remaining")
-            
-        # 如果需要排错，可以查看还有哪些节点未完成
-        if remaining_count > 0 and remaining_count < 10:  # 只在节点数不多时显示，避免日志过多
-            remaining_nodes = redis_conn.smembers(pending_nodes_key)
-            color_logger.info(f"Remaining nodes to check: {remaining_nodes}")
+            color_logger.debug(f"Node {node_uuid} completed {status_msg}, {remaining_count} nodes remaining in task {task_uuid}")
     except Exception as e:
         color_logger.error(f"Error checking and releasing parent lock: {str(e)}")
 
@@ -571,14 +852,15 @@ def check_all_nodes():
     
     # 生成一个唯一任务ID
     task_uuid = str(uuid.uuid4())
-    task_redis_key = f"check_all_nodes_task:{task_uuid}"
+    task_redis_key = get_check_all_nodes_task_key(task_uuid)
+    pending_nodes_key = get_check_all_nodes_pending_key(task_uuid)
     
     # 使用 Redis 锁来防止重复运行
-    redis_key = 'ops_arch_dashboard_check_all_nodes_lock'
+    redis_key = CHECK_ALL_NODES_LOCK_KEY
+    redis_conn = get_redis_connection("default")
     
-    # 尝试获取锁，如果锁已存在则直接返回
-    existing_lock = get_redis_value('default', redis_key)
-    if existing_lock:
+    # 快速判断锁是否已存在，避免无意义地查询节点
+    if redis_conn.exists(redis_key):
         color_logger.info("check_all_nodes task is already running, skipping this execution")
         return "Task already running, skipped"
     
@@ -591,52 +873,56 @@ def check_all_nodes():
         color_logger.info("No active nodes to check, skipping task")
         return "No active nodes to check"
     
+    # 动态设置过期时间：基础30分钟 + 每个节点估算1分钟，最多2小时
+    estimated_duration = min(7200, 1800 + node_count * 60)  # 30分钟基础 + 每个节点1分钟，上限2小时
+    # 锁的持有者令牌为任务UUID，完成时只释放属于本轮任务的锁
+    sweep_lock = RedisLock('default', redis_key, ttl=estimated_duration, token=task_uuid)
+    if not sweep_lock.acquire():
+        color_logger.info("check_all_nodes task is already running, skipping this execution")
+        return "Task already running, skipped"
+    
     try:
-        # 设置锁，包含节点数量和开始时间
-        lock_data = f"{node_count}:{start_time.isoformat()}"
-        # 动态设置过期时间：基础30分钟 + 每个节点估算1分钟，最多2小时
-        estimated_duration = min(7200, 1800 + node_count * 60)  # 30分钟基础 + 每个节点1分钟，上限2小时
-        set_redis_value('default', redis_key, lock_data, set_expire=estimated_duration)
-        
-        # 使用 Redis 记录任务的开始时间
-        redis_conn = get_redis_connection("default")
+        # 任务 hash 记录开始时间和进度计数，待检查集合用于节点完成时去重
         task_info = {
             'start_time': start_time.isoformat(),
             'node_count': node_count,
             'estimated_duration': estimated_duration,
-            'task_uuid': task_uuid
+            'task_uuid': task_uuid,
+            'status': 'running',
+            'pending': node_count,
+            'completed': 0,
+            'failed': 0,
+            'skipped': 0,
+            'fence_token': sweep_lock.fence_token
         }
-        redis_conn.hset(task_redis_key, mapping=task_info)
-        # 设置过期时间，与主锁相同的过期时间
-        redis_conn.expire(task_redis_key, estimated_duration)
-        
-        # 使用 Redis 集合来管理待处理的节点 UUID
-        pending_nodes_key = f"{redis_key}_pending_nodes"
-        # 先删除可能存在的旧集合
-        redis_conn.delete(pending_nodes_key)
-        
-        # 将所有待处理节点的 UUID 添加到集合中
-        if active_nodes:
-            node_uuids = [str(node.uuid) for node in active_nodes]
-            redis_conn.sadd(pending_nodes_key, *node_uuids)
-            # 设置过期时间，与锁相同的过期时间
-            redis_conn.expire(pending_nodes_key, estimated_duration)
-        
-        # 限制并发任务数以防止资源耗尽
-        max_concurrent_checks = getattr(settings, 'MAX_CONCURRENT_HEALTH_CHECKS', 10)  # 默认为10
+        pipeline = redis_conn.pipeline()
+        pipeline.hset(task_redis_key, mapping=task_info)
+        pipeline.expire(task_redis_key, estimated_duration)
+        pipeline.sadd(pending_nodes_key, *[str(node.uuid) for node in active_nodes])
+        pipeline.expire(pending_nodes_key, estimated_duration)
+        # 最近任务索引（按开始时间排序），只保留最近的任务
+        pipeline.zadd(CHECK_ALL_NODES_TASK_INDEX_KEY, {task_uuid: start_time.timestamp()})
+        pipeline.zremrangebyrank(CHECK_ALL_NODES_TASK_INDEX_KEY, 0, -CHECK_ALL_NODES_TASK_INDEX_SIZE - 1)
+        pipeline.execute()
         
+        # 传递锁键名、任务UUID和 fencing token 到子任务
+        subtask_kwargs = {'parent_task_lock_key': redis_key, 'task_uuid': task_uuid, 'fence_token': sweep_lock.fence_token}
         scheduled_count = 0
-        for index, node in enumerate(active_nodes):
-            # 在分派任务之间添加小延迟，防止系统过载
-            # 每处理 max_concurrent_checks 个任务后延迟1秒
-            countdown = (index // max_concurrent_checks) * 1  # 每10个任务延迟1秒
-            check_node_health.apply_async(
-                args=[str(node.uuid)], 
-                countdown=countdown,
-                # 传递锁键名和任务UUID到子任务
-                kwargs={'parent_task_lock_key': redis_key, 'task_uuid': task_uuid}
-            )
-            scheduled_count += 1
+        if get_probe_runtime_config()['batch_size'] > 0:
+            # 按队列（一致性哈希）分片后批量分发，每个批次在 worker 的常驻事件循环中并发探测
+            for queue, batch_node_uuids in shard_probe_targets([str(node.uuid) for node in active_nodes]):
+                options = {'queue': queue} if queue else {}
+                check_nodes_health_batch.apply_async(args=[batch_node_uuids], kwargs=subtask_kwargs, **options)
+                scheduled_count += len(batch_node_uuids)
+        else:
+            # 限制并发任务数以防止资源耗尽
+            max_concurrent_checks = getattr(settings, 'MAX_CONCURRENT_HEALTH_CHECKS', 10)  # 默认为10
+            for index, node in enumerate(active_nodes):
+                # 在分派任务之间添加小延迟，防止系统过载
+                # 每处理 max_concurrent_checks 个任务后延迟1秒
+                countdown = (index // max_concurrent_checks) * 1  # 每10个任务延迟1秒
+                check_node_health.apply_async(args=[str(node.uuid)], countdown=countdown, kwargs=subtask_kwargs)
+                scheduled_count += 1
         
         # 记录检查开始时间到一个全局位置
         SystemHealthStats.objects.update_or_create(
@@ -653,19 +939,16 @@ def check_all_nodes():
             }
         )
         
-        color_logger.info(f"Started checking {node_count} nodes health, scheduled {scheduled_count} subtasks with lock {redis_key} and pending nodes set {pending_nodes_key}, estimated duration: {estimated_duration}s, task_uuid: {task_uuid}")
+        color_logger.info(f"Started checking {node_count} nodes health, scheduled {scheduled_count} subtasks with lock {redis_key}, estimated duration: {estimated_duration}s, task_uuid: {task_uuid}")
         
         return f"Scheduled {scheduled_count} node health checks with task_uuid {task_uuid}"
     
     except Exception as e:
         # 如果出错，清理 Redis 键，确保不会永久锁定
         try:
-            redis_conn = get_redis_connection("default")
-            redis_conn.delete(redis_key)
-            pending_nodes_key = f"{redis_key}_pending_nodes"
-            redis_conn.delete(pending_nodes_key)
-            # 清理任务相关键
-            redis_conn.delete(task_redis_key)
+            sweep_lock.release()
+            redis_conn.delete(pending_nodes_key, task_redis_key)
+            redis_conn.zrem(CHECK_ALL_NODES_TASK_INDEX_KEY, task_uuid)
             color_logger.error(f"Error in check_all_nodes, cleaned up locks: {str(e)}")
         except:
             pass  # 如果清理也失败，就不处理了
@@ -683,6 +966,31 @@ def cleanup_health_records():
     
     color_logger.info(f"Cleaned up {deleted_count[0]} old health records")
 
+    # 清理过期的健康状态汇总
+    deleted_rollups = cleanup_node_health_rollups()
+    color_logger.info(f"Cleaned up old health rollups: {deleted_rollups}")
+
+
+@shared_task
+def rollup_node_health_records():
+    """
+    增量汇总节点健康记录（小时/天）
+    """
+    for granularity in ROLLUP_GRANULARITIES:
+        result = rollup_node_health(granularity)
+        if result:
+            range_start, range_end, count = result
+            color_logger.info(f"Rolled up {count} {granularity} node health buckets: {range_start} ~ {range_end}")
+
+
+@shared_task
+def reconcile_dashboard_summary():
+    """
+    定时重建仪表板概要统计计数器，修正增量更新产生的偏差
+    """
+    counters = rebuild_summary_counters()
+    color_logger.info(f"Reconciled dashboard summary counters: total_nodes={counters['total_nodes']}, healthy_links={counters['healthy_links']}")
+
 
 def create_or_update_alert(node, alert_type, alert_subtype, title, description, severity='MEDIUM'):
     """
@@ -1082,23 +1390,29 @@ def check_alert_conditions(node, health_record, rule: AlertRule):
             
             # 提取probe相关的数据供条件判断使用
             for detail in details:
-                # 根据探活类型设置probe_type
+                # 提取错误类型和状态码，只取失败的检测（同类多项失败时以最后一项为准）
+                if detail.get('is_healthy', True):
+                    continue
+
+                # 根据探活类型设置probe_type（旧记录没有 probe_type 字段时按主机/端口推断）
                 host = detail.get('host')
                 port = detail.get('port')
                 
-                if host and not port:
+                if detail.get('probe_type'):
+                    context['probe_type'] = detail['probe_type']
+                elif detail.get('url'):
+                    context['probe_type'] = 'http'
+                elif host and not port:
                     context['probe_type'] = 'ping'
                 elif host and port:
                     context['probe_type'] = 'port'
-                elif detail.get('url'):
-                    context['probe_type'] = 'http'
                 
-                # 提取错误类型和状态码
-                if not detail.get('is_healthy'):
-                    if 'timeout' in (detail.get('error_message', '') or '').lower():
-                        context['error_type'] = 'timeout'
-                    if 'status_code' in detail:
-                        context['status_code'] = detail['status_code']
+                if detail.get('error_type'):
+                    context['error_type'] = detail['error_type']
+                elif 'timeout' in (detail.get('error_message', '') or '').lower():
+                    context['error_type'] = 'timeout'
+                if detail.get('status_code') is not None:
+                    context['status_code'] = detail['status_code']
         
         # 为健康状态检查提供额外上下文
         context['healthy_status'] = health_record.healthy_status if health_record else node.healthy_status
@@ -1111,11 +1425,12 @@ def check_alert_conditions(node, health_record, rule: AlertRule):
             # 尝试使用聚合值，如果不可用则使用当前值
             avg_time_value = aggregated_value if aggregated_value is not None else (health_record.response_time if health_record else 0)
             
-            alert_description = rule.message.format(
-                node_name=node.name,
-                avg_response_time=avg_time_value,
-                threshold=threshold_value  # 使用从条件中提取的阈值
-            )
+            alert_description = rule.message.format(**{
+                **context,  # 规则消息可引用上下文字段，如 {status_code}
+                'node_name': node.name,
+                'avg_response_time': avg_time_value,
+                'threshold': threshold_value  # 使用从条件中提取的阈值
+            })
             
             alert_subtype = rule.name.replace('_', ' ').title().replace(' ', '')
             
@@ -1205,10 +1520,15 @@ def check_all_alerts():
     
     # 获取所有活跃节点
     active_nodes = Node.objects.filter(is_active=True).prefetch_related('health_records')
+    # 常规检查路径只写 InfluxDB，规则上下文优先使用本次检查结果（含 probe_details）
+    latest_checks = get_nodes_latest_check(node.uuid for node in active_nodes)
     
     for node in active_nodes:
-        # 获取最近的健康记录
+        # 获取最近的健康记录（本次检查结果与 NodeHealth 中较新的一条）
         recent_health = node.health_records.first()
+        latest_check = latest_checks.get(str(node.uuid))
+        if latest_check and (recent_health is None or latest_check.create_time >= recent_health.create_time):
+            recent_health = latest_check
         
         # 对每个启用的规则进行检查
         for rule in enabled_rules:
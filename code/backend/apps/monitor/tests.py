@@ -1,3 +1,120 @@
-from django.test import TestCase
+import json
+from datetime import datetime, timedelta
+from unittest import mock
 
-# Create your tests here.
+from django.db import connection
+from django.test import RequestFactory, TestCase
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+
+from .models import BaseInfo, Link, Node, NodeBaseInfo, NodeHealth, NodeHealthRollup, SystemHealthStats
+from .rollup import set_rollup_watermark
+from .views import MonitorDashboardView, NodeView
+
+
+class NodeViewQueryCountTest(TestCase):
+    """节点列表的查询次数不随节点数量增长"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.links = {}
+        for node_count in (1, 50):
+            link = Link.objects.create(name=f'link-{node_count}')
+            cls.links[node_count] = link
+            for index in range(node_count):
+                node = Node.objects.create(name=f'node-{node_count}-{index}', link=link)
+                for port in (80, 443):
+                    base_info = BaseInfo.objects.create(host=f'10.{node_count}.0.{index}', port=port)
+                    NodeBaseInfo.objects.create(node=node, base_info=base_info)
+                SystemHealthStats.objects.create(key=f'node_check_duration_{node.uuid}', value='12.5')
+
+    def _get_node_list(self, node_count):
+        request = RequestFactory().get('/api/v1/monitor/nodes/', {
+            'link_id': str(self.links[node_count].uuid),
+            'page_size': 50,
+        })
+        # 绕过响应缓存，直接执行查询
+        with CaptureQueriesContext(connection) as queries:
+            response = NodeView.get.__wrapped__(NodeView(), request)
+        data = json.loads(response.content)
+        self.assertTrue(data['success'], data)
+        return data['data'], len(queries)
+
+    def test_query_count_is_constant(self):
+        result_1, queries_1 = self._get_node_list(1)
+        result_50, queries_50 = self._get_node_list(50)
+
+        self.assertEqual(len(result_1['data']), 1)
+        self.assertEqual(len(result_50['data']), 50)
+        self.assertTrue(all(len(node['base_info_list']) == 2 for node in result_50['data']))
+        self.assertTrue(all(node['check_duration_ms'] == 12.5 for node in result_50['data']))
+        self.assertEqual(queries_1, queries_50)
+        # 总数、当前页节点（含链路）、服务信息预取、检查耗时
+        self.assertEqual(queries_50, 4)
+
+
+class HealthTrendDataTest(TestCase):
+    """健康趋势图：水位线之前读取汇总表，之后读取原始记录"""
+
+    @classmethod
+    def setUpTestData(cls):
+        link = Link.objects.create(name='link')
+        cls.node_a = Node.objects.create(name='node-a', link=link, healthy_status='green')
+        cls.node_b = Node.objects.create(name='node-b', link=link, healthy_status='green')
+        cls.node_c = Node.objects.create(name='node-c', link=link, healthy_status='red')
+        cls.inactive_node = Node.objects.create(name='node-d', link=link, healthy_status='red', is_active=False)
+
+        cls.today = timezone.make_aware(datetime.combine(timezone.localdate(), datetime.min.time()))
+        cls.watermark = cls.today - timedelta(days=2)
+        set_rollup_watermark('day', cls.watermark)
+        for node, days_ago, worst_status in (
+            (cls.node_a, 4, 'red'),
+            (cls.node_b, 3, 'yellow'),
+            (cls.inactive_node, 3, 'green'),
+            # 水位线之后的汇总数据不读取
+            (cls.node_b, 1, 'red'),
+        ):
+            NodeHealthRollup.objects.create(
+                node=node, granularity='day', bucket_start=cls.today - timedelta(days=days_ago),
+                worst_status=worst_status
+            )
+
+    def _get_trend(self, raw_records):
+        with mock.patch('apps.monitor.views.iter_health_records', return_value=iter(raw_records)) as mock_iter:
+            with CaptureQueriesContext(connection) as queries:
+                result = MonitorDashboardView().get_health_trend_data('week')
+        if mock_iter.called:
+            self.assertEqual(mock_iter.call_args.args[1], self.watermark)
+        return {point['date']: point for point in result['data']}, len(queries)
+
+    def _counts(self, trend, days_ago):
+        point = trend[(self.today - timedelta(days=days_ago)).isoformat()]
+        return point['green_count'], point['yellow_count'], point['red_count'], point['unknown_count']
+
+    def test_rollup_and_raw_tail(self):
+        raw_records = [
+            (str(self.node_a.uuid), self.today + timedelta(minutes=5), 'yellow', 10),
+            (str(self.node_a.uuid), self.today + timedelta(minutes=10), 'green', 10),
+            (str(self.node_c.uuid), self.today - timedelta(days=1), 'green', 10),
+            (str(self.inactive_node.uuid), self.today, 'red', 10),
+        ]
+        trend, query_count = self._get_trend(raw_records)
+
+        self.assertEqual(len(trend), 8)
+        # 没有记录的时间桶按当前状态统计
+        self.assertEqual(self._counts(trend, 5), (2, 0, 1, 0))
+        self.assertEqual(self._counts(trend, 4), (1, 0, 2, 0))
+        self.assertEqual(self._counts(trend, 3), (1, 1, 1, 0))
+        self.assertEqual(self._counts(trend, 2), (2, 0, 1, 0))
+        self.assertEqual(self._counts(trend, 1), (3, 0, 0, 0))
+        # 时间桶内取最差状态
+        self.assertEqual(self._counts(trend, 0), (1, 1, 1, 0))
+        # 水位线、启用节点状态、汇总表
+        self.assertEqual(query_count, 3)
+
+    def test_mysql_tail_when_influxdb_fails(self):
+        NodeHealth.objects.create(node=self.node_b, healthy_status='red')
+        with mock.patch('apps.monitor.views.iter_health_records', side_effect=RuntimeError('influxdb down')):
+            result = MonitorDashboardView().get_health_trend_data('week')
+        trend = {point['date']: point for point in result['data']}
+        self.assertEqual(self._counts(trend, 0), (1, 0, 2, 0))
@@ -32,9 +32,15 @@ urlpatterns = [
     # 监控仪表板统计接口
     path('dashboard/', views.MonitorDashboardView.as_view(), name='monitor-dashboard'),
     
+    # 监控事件接口（短轮询）
+    path('events/', views.MonitorEventView.as_view(), name='monitor-events'),
+    
     # 系统健康统计接口
     path('system_health_stats/', views.SystemHealthStatsView.as_view(), name='system-health-stats'),
     
+    # 可用性 / SLA 统计接口
+    path('sla/', views.SlaReportView.as_view(), name='sla-report'),
+    
     # 时序监控数据接口
     path('ts-data/node-health/', views.NodeHealthTSView.as_view(), name='node-health-ts'),
 ]
\ No newline at end of file
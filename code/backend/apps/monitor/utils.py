@@ -1,4 +1,6 @@
-from apps.monitor.models import Link, Node
+import uuid
+
+from apps.monitor.models import BaseInfo, Link, Node
 
 def format_link_data(link: Link):
     """格式化链路数据"""
@@ -23,4 +25,50 @@ def format_node_data(node: Node):
     if node.is_del:
         res['name'] = node.name + '[已删除]'
 
-    return res
\ No newline at end of file
+    return res
+
+def format_base_info_data(base_info: BaseInfo):
+    """格式化基础信息数据"""
+    return {
+        'uuid': str(base_info.uuid),
+        'host': base_info.host,
+        'port': base_info.port,
+        'is_ping_disabled': base_info.is_ping_disabled,  # 使用服务级配置
+        'extra_probes': base_info.extra_probes,  # 附加探测
+        'is_healthy': base_info.is_healthy,  # 使用全局健康状态
+        'remarks': base_info.remarks
+    }
+
+def get_node_map_by_ids(node_ids):
+    """
+    批量获取节点 {node_id: node}（含 link），用于告警等只保存了节点ID的数据
+
+    node_id 为自由文本，非法的 UUID 直接忽略
+    """
+    valid_node_ids = set()
+    for node_id in node_ids:
+        try:
+            valid_node_ids.add(uuid.UUID(str(node_id)))
+        except (TypeError, ValueError):
+            continue
+
+    if not valid_node_ids:
+        return {}
+
+    node_map = {}
+    for node in Node.objects.filter(uuid__in=valid_node_ids).select_related('link'):
+        node_map[str(node.uuid)] = node
+        node_map[node.uuid.hex] = node
+    return node_map
+
+def get_alert_node(node_map, node_id):
+    """从 get_node_map_by_ids 的结果中获取告警对应的节点"""
+    if not node_id:
+        return None
+    node = node_map.get(node_id)
+    if node is None:
+        try:
+            node = node_map.get(str(uuid.UUID(str(node_id))))
+        except (TypeError, ValueError):
+            return None
+    return node
@@ -1,17 +1,27 @@
 from django.views import View
 from apps.monitor.tasks import check_node_health, trigger_alert_notification
-from apps.monitor.utils import format_node_data
+from apps.monitor.utils import format_base_info_data, format_node_data, get_alert_node, get_node_map_by_ids
+from apps.monitor.cache_utils import ALERT_CACHE_DOMAIN, HEALTH_CACHE_DOMAIN, TOPOLOGY_CACHE_DOMAIN, get_cache_version
+from apps.monitor.response_cache import monitor_response_cache
+from apps.monitor.dashboard_summary import get_dashboard_summary
+from apps.monitor.events import get_monitor_events
+from apps.monitor.rollup import STATUS_PRIORITY, get_rollup_config, get_rollup_watermark, iter_health_records
+from apps.monitor.sla import compute_sla, get_sla_range
+from apps.monitor.probes.factory import validate_extra_probes
 from lib.time_tools import utc_obj_to_time_zone_str
 from lib.request_tool import pub_bool_check, pub_get_request_body, pub_success_response, pub_error_response, get_request_param
-from lib.paginator_tool import pub_paging_tool
-from .models import BaseInfo, Link, Node, NodeHealth, NodeConnection, Alert, SystemHealthStats, PushPlusConfig
+from lib.paginator_tool import is_cursor_paging, pub_cursor_paging_tool, pub_paging_tool
+from lib.redis_tool import get_redis_value, set_redis_value
+from .models import BaseInfo, Link, Node, NodeHealth, NodeHealthRollup, NodeConnection, Alert, SystemHealthStats, PushPlusConfig
 from lib.log import color_logger
 from apps.myAuth.token_utils import TokenManager
-from django.db.models import Q, Count, Case, When, IntegerField, Sum, F
-from django.db.models.functions import RowNumber
+from django.db.models import Q, Count, Case, When, IntegerField, Sum, F, Max, Prefetch
+from django.db.models.functions import RowNumber, Trunc
 from django.db.models.expressions import Window
 from django.utils import timezone
-from datetime import datetime, timedelta
+from datetime import datetime, timedelta, timezone as dt_timezone
+from collections import Counter
+from uuid import UUID
 from django.db.models.expressions import RawSQL
 from lib.influxdb_tool import InfluxDBManager
 
@@ -174,72 +184,114 @@ class LinkDetailView(View):
 
 class LinkTopologyView(View):
     """架构图拓扑接口"""
+
+    # 架构图结构快照缓存时间（秒），版本号变化后自动失效
+    TOPOLOGY_SNAPSHOT_EXPIRE = 3600
     
+    @monitor_response_cache((TOPOLOGY_CACHE_DOMAIN, HEALTH_CACHE_DOMAIN))
     def get(self, request):
         """获取架构图拓扑"""
         try:
             body = pub_get_request_body(request)
             link_uuid = body.get('uuid')
-            link = Link.objects.get(uuid=link_uuid)
-            nodes = Node.objects.filter(link=link, is_active=True)
-            connections = NodeConnection.objects.filter(link=link, is_active=True)
 
-            # 构建节点数据
-            from .models import BaseInfo, NodeBaseInfo
-            nodes_data = []
-            for node in nodes:
-                # 优先使用 BaseInfo 表中存储的健康状态（通过 NodeBaseInfo 关联）
-                node_base_info_items = NodeBaseInfo.objects.filter(node=node).select_related('base_info')
-                base_info_list = []
-                for node_base_info in node_base_info_items:
-                    base_info = node_base_info.base_info
-                    base_info_item = {
-                        'uuid': str(base_info.uuid), 
-                        'host': base_info.host, 
-                        'port': base_info.port, 
-                        'is_ping_disabled': base_info.is_ping_disabled,  # 使用服务级配置
-                        'is_healthy': base_info.is_healthy,  # 使用全局健康状态
-                        'remarks': base_info.remarks  # 新增备注字段
-                    }
-                    base_info_list.append(base_info_item)
-                
-                nodes_data.append({
-                    'uuid': str(node.uuid),
-                    'name': node.name,
-                    'base_info_list': base_info_list,    # 新格式数据
-                    'healthy_status': node.healthy_status,
-                    'position_x': node.position_x,
-                    'position_y': node.position_y,
-                    'create_time': node.create_time.isoformat() if node.create_time else None,
-                    'remarks': node.remarks
-                })
+            # 结构快照按架构图版本缓存，健康状态每次单独叠加
+            topology_version = get_cache_version(TOPOLOGY_CACHE_DOMAIN)
+            snapshot_key = f'link_topology_snapshot:{link_uuid}:{topology_version}'
+            topology = get_redis_value('default', snapshot_key)
+            if topology is None:
+                topology = self.build_topology_snapshot(link_uuid)
+                set_redis_value('default', snapshot_key, topology, set_expire=self.TOPOLOGY_SNAPSHOT_EXPIRE)
 
-            # 构建连接数据
-            connections_data = []
-            for conn in connections:
-                connections_data.append({
-                    'uuid': str(conn.uuid),
-                    'from_node': str(conn.from_node.uuid),
-                    'to_node': str(conn.to_node.uuid),
-                    'healthy_status': conn.from_node.healthy_status,
-                })
-
-            return pub_success_response({
-                'uuid': str(link.uuid),
-                'name': link.name,
-                'nodes': nodes_data,
-                'connections': connections_data
-            })
+            return pub_success_response(self.apply_health_overlay(topology))
         except Link.DoesNotExist:
             return pub_error_response("架构图不存在")
         except Exception as e:
             color_logger.error(f"获取架构图拓扑失败: {e.args}")
             return pub_error_response(f"获取架构图拓扑失败: {e.args}")
 
+    def build_topology_snapshot(self, link_uuid):
+        """构建架构图结构快照（不含健康状态）"""
+        from .models import NodeBaseInfo
+        link = Link.objects.get(uuid=link_uuid)
+        nodes = Node.objects.filter(link=link, is_active=True).prefetch_related(
+            Prefetch(
+                'node_base_info_items',
+                queryset=NodeBaseInfo.objects.select_related('base_info')
+            )
+        )
+        connections = NodeConnection.objects.filter(
+            link=link, is_active=True
+        ).only('uuid', 'from_node_id', 'to_node_id')
+
+        # 构建节点数据
+        nodes_data = []
+        for node in nodes:
+            nodes_data.append({
+                'uuid': str(node.uuid),
+                'name': node.name,
+                'base_info_list': [
+                    format_base_info_data(node_base_info.base_info)
+                    for node_base_info in node.node_base_info_items.all()
+                ],
+                'position_x': node.position_x,
+                'position_y': node.position_y,
+                'create_time': node.create_time.isoformat() if node.create_time else None,
+                'remarks': node.remarks
+            })
+
+        # 构建连接数据
+        connections_data = []
+        for conn in connections:
+            connections_data.append({
+                'uuid': str(conn.uuid),
+                'from_node': str(conn.from_node_id),
+                'to_node': str(conn.to_node_id),
+            })
+
+        return {
+            'uuid': str(link.uuid),
+            'name': link.name,
+            'nodes': nodes_data,
+            'connections': connections_data
+        }
+
+    def apply_health_overlay(self, topology):
+        """叠加节点和基础信息的实时健康状态"""
+        from .models import BaseInfo
+        node_status_map = {
+            str(node_uuid): healthy_status
+            for node_uuid, healthy_status in Node.objects.filter(
+                link_id=topology['uuid'], is_active=True
+            ).values_list('uuid', 'healthy_status')
+        }
+        base_info_uuids = {
+            base_info['uuid']
+            for node in topology['nodes']
+            for base_info in node['base_info_list']
+        }
+        base_info_health_map = {
+            str(base_info_uuid): is_healthy
+            for base_info_uuid, is_healthy in BaseInfo.all_objects.filter(
+                uuid__in=base_info_uuids
+            ).values_list('uuid', 'is_healthy')
+        } if base_info_uuids else {}
+
+        for node in topology['nodes']:
+            node['healthy_status'] = node_status_map.get(node['uuid'], 'unknown')
+            for base_info in node['base_info_list']:
+                base_info['is_healthy'] = base_info_health_map.get(base_info['uuid'], base_info['is_healthy'])
+
+        for conn in topology['connections']:
+            conn['healthy_status'] = node_status_map.get(conn['from_node'])
+
+        return topology
+
 
 class NodeView(View):
     """节点相关接口"""
     
+    @monitor_response_cache((TOPOLOGY_CACHE_DOMAIN, HEALTH_CACHE_DOMAIN))
     def get(self, request):
         """获取节点列表"""
 
@@ -252,7 +304,13 @@ class NodeView(View):
             link_id = body.get('link_id', '')
             healthy_status = body.get('healthy_status', '')
             
-            node_list = Node.objects.all()
+            from .models import NodeBaseInfo
+            node_list = Node.objects.select_related('link').prefetch_related(
+                Prefetch(
+                    'node_base_info_items',
+                    queryset=NodeBaseInfo.objects.select_related('base_info')
+                )
+            )
             
             # 添加搜索功能 - 按节点名称搜索
             # 注意：现在基本配置信息存储在BaseInfo模型中，需要通过关联查询来搜索
@@ -272,35 +330,23 @@ class NodeView(View):
             # 分页查询
             has_next, next_page, page_list, all_num, result = pub_paging_tool(page, node_list, page_size)
             
+            # 一次查询当前页所有节点的检查耗时统计
+            duration_map = dict(SystemHealthStats.objects.filter(
+                key__in=[f'node_check_duration_{node.uuid}' for node in result]
+            ).values_list('key', 'value'))
+
             # 格式化返回数据
             result_data = []
             for node in result:
-                # 获取此节点的检查耗时统计
-                from .models import SystemHealthStats
-                duration_stat = SystemHealthStats.objects.filter(
-                    key=f'node_check_duration_{node.uuid}'
-                ).first()
-                
-                # 优先使用 BaseInfo 表中存储的健康状态（通过 NodeBaseInfo 关联）
-                from .models import BaseInfo, NodeBaseInfo
-                node_base_info_items = NodeBaseInfo.objects.filter(node=node).select_related('base_info')
-                base_info_list = []
-                for node_base_info in node_base_info_items:
-                    base_info = node_base_info.base_info
-                    base_info_item = {
-                        'uuid': str(base_info.uuid), 
-                        'host': base_info.host, 
-                        'port': base_info.port, 
-                        'is_ping_disabled': base_info.is_ping_disabled,  # 使用服务级配置
-                        'is_healthy': base_info.is_healthy,  # 使用全局健康状态
-                        'remarks': base_info.remarks  # 新增备注字段
-                    }
-                    base_info_list.append(base_info_item)
-                
+                duration_value = duration_map.get(f'node_check_duration_{node.uuid}')
                 result_data.append({
                     'uuid': str(node.uuid),
                     'name': node.name,
-                    'base_info_list': base_info_list,    # 新格式数据
+                    # 优先使用 BaseInfo 表中存储的健康状态（通过 NodeBaseInfo 关联）
+                    'base_info_list': [
+                        format_base_info_data(node_base_info.base_info)
+                        for node_base_info in node.node_base_info_items.all()
+                    ],
                     'link': {
                         'uuid': str(node.link.uuid),
                         'name': node.link.name
@@ -313,7 +359,7 @@ class NodeView(View):
                     'create_time': utc_obj_to_time_zone_str(node.create_time),
                     'update_time': utc_obj_to_time_zone_str(node.update_time),
                     'last_check_time': utc_obj_to_time_zone_str(node.last_check_time) if node.last_check_time else None,
-                    'check_duration_ms': float(duration_stat.value) if duration_stat else None,
+                    'check_duration_ms': float(duration_value) if duration_value is not None else None,
                 })
             
             return pub_success_response({
@@ -785,6 +831,7 @@ class NodeHealthView(View):
 class AlertView(View):
     """告警相关接口"""
     
+    @monitor_response_cache((ALERT_CACHE_DOMAIN, TOPOLOGY_CACHE_DOMAIN))
     def get(self, request):
         """获取告警列表"""
         try:
@@ -798,7 +845,7 @@ class AlertView(View):
             node_id = body.get('node_id', '')
             alert_type = body.get('alert_type', '')
             
-            alert_list = Alert.objects.all()
+            alert_list = Alert.objects.select_related('created_by', 'silenced_by')
             
             # 添加搜索功能
             if search:
@@ -822,13 +869,24 @@ class AlertView(View):
             if alert_type:
                 alert_list = alert_list.filter(alert_type=alert_type)
             
-            # 分页查询
-            has_next, next_page, page_list, all_num, result = pub_paging_tool(page, alert_list, page_size)
+            # 分页查询：游标分页适用于大量告警的深度翻页
+            if is_cursor_paging(body):
+                has_next, next_cursor, prev_cursor, all_num, result = pub_cursor_paging_tool(
+                    alert_list, body.get('cursor'), page_size,
+                    with_count=pub_bool_check(body.get('with_count', False))
+                )
+                page_info = {'next_cursor': next_cursor, 'prev_cursor': prev_cursor}
+            else:
+                has_next, next_page, page_list, all_num, result = pub_paging_tool(page, alert_list, page_size)
+                page_info = {'next_page': next_page}
             
+            # 一次查询当前页告警关联的所有节点
+            node_map = get_node_map_by_ids([alert.node_id for alert in result])
+
             # 格式化返回数据
             result_data = []
             for alert in result:
-                node = Node.objects.filter(uuid=alert.node_id).first()
+                node = get_alert_node(node_map, alert.node_id)
                 result_data.append({
                     'uuid': str(alert.uuid),
                     'node_id': alert.node_id,
@@ -859,7 +917,7 @@ class AlertView(View):
             
             return pub_success_response({
                 'has_next': has_next,
-                'next_page': next_page,
+                **page_info,
                 'all_num': all_num,
                 'data': result_data
             })
@@ -1562,7 +1620,19 @@ class PushPlusTestView(View):
 
 class MonitorDashboardView(View):
     """监控仪表板统计信息接口"""
+
+    # 趋势图周期对应的时间桶粒度
+    TREND_BUCKET_KINDS = {
+        'day': 'hour',
+        'week': 'day',
+        'month': 'day',
+        'quarter': 'week',
+        'year': 'month',
+    }
+    # 时间桶内节点状态取最差值
+    TREND_STATUS_PRIORITY = STATUS_PRIORITY
     
+    @monitor_response_cache((TOPOLOGY_CACHE_DOMAIN, HEALTH_CACHE_DOMAIN, ALERT_CACHE_DOMAIN), timeout=30)
     def get(self, request):
         """获取监控仪表板统计信息"""
         try:
@@ -1592,36 +1662,17 @@ class MonitorDashboardView(View):
             return pub_error_response(f"获取监控仪表板数据失败: {e.args}")
     
     def get_summary_statistics(self):
-        """获取概要统计信息"""
-        # 链路统计
-        total_links = Link.objects.count()
-        # 假设健康链路是包含至少一个健康节点的链路
-        links_with_healthy_nodes = Link.objects.filter(
-            nodes__healthy_status='green',
-            nodes__is_active=True
-        ).distinct().count()
-        
-        # 节点统计
-        total_nodes = Node.objects.count()
-        healthy_nodes = Node.objects.filter(healthy_status='green', is_active=True).count()
-        yellow_nodes = Node.objects.filter(healthy_status='yellow', is_active=True).count()  # 部分异常
-        red_nodes = Node.objects.filter(healthy_status='red', is_active=True).count()  # 异常
-        unknown_nodes = Node.objects.filter(healthy_status='unknown', is_active=True).count()  # 未知
-        
-        return {
-            'total_links': total_links,
-            'healthy_links': links_with_healthy_nodes,
-            'total_nodes': total_nodes,
-            'healthy_nodes': healthy_nodes,
-            'yellow_nodes': yellow_nodes,  # 部分异常节点
-            'red_nodes': red_nodes,  # 异常节点
-            'unknown_nodes': unknown_nodes,  # 未知节点
-            'unhealthy_nodes': yellow_nodes + red_nodes  # 不健康节点（黄色+红色）
-        }
+        """获取概要统计信息（由 Redis 计数器提供，见 dashboard_summary）"""
+        return get_dashboard_summary()
     
     def get_health_trend_data(self, period='week', start_date=None, end_date=None):
-        """获取健康趋势数据（使用InfluxDB时序数据）"""
-        # 根据周期参数确定时间范围
+        """
+        获取健康趋势数据
+
+        水位线之前的时间范围读取汇总表（NodeHealthRollup），分组查询得到每个时间桶内每个节点的最差状态；
+        水位线之后尚未汇总的部分读取原始记录（InfluxDB，读取失败时使用 NodeHealth）；
+        时间桶内没有记录的启用节点按当前状态统计
+        """
         now = timezone.now()
         if start_date and end_date:
             # 使用传入的日期范围
@@ -1632,171 +1683,6 @@ class MonitorDashboardView(View):
             end_date = timezone.localtime(timezone.make_aware(end_date)) if end_date.tzinfo is None else timezone.localtime(end_date)
         else:
             # 根据周期参数确定时间范围
-            if period == 'day':
-                # 对于日周期，从24小时前开始到当前时间
-                start_date = timezone.localtime(now) - timedelta(days=1)
-            elif period == 'week':
-                start_date = timezone.localtime(now) - timedelta(weeks=1)
-            elif period == 'month':
-                start_date = timezone.localtime(now) - timedelta(days=30)
-            elif period == 'quarter':
-                start_date = timezone.localtime(now) - timedelta(days=90)
-            elif period == 'year':
-                start_date = timezone.localtime(now) - timedelta(days=365)
-            else:
-                # 默认为周
-                start_date = timezone.localtime(now) - timedelta(weeks=1)
-            end_date = timezone.localtime(now)
-
-        try:
-            # 使用InfluxDB获取健康趋势数据
-            influxdb_manager = InfluxDBManager()
-            
-            # 获取所有活跃节点的UUID列表
-            active_node_uuids = [str(node.uuid) for node in Node.objects.filter(is_active=True)]
-            
-            if not active_node_uuids:
-                return {
-                    'period': period,
-                    'data': []
-                }
-            
-            # 查询指定时间范围内的健康数据
-            health_records = influxdb_manager.query_multiple_nodes_health(
-                node_uuids=active_node_uuids,
-                start_time=start_date.isoformat(),
-                end_time=end_date.isoformat() if end_date else None
-            )
-            
-            # 按时间段统计健康状态
-            trend_data = []
-            
-            # 根据周期生成时间点
-            time_points = []
-            if period == 'day':
-                # 按小时统计
-                current_time = start_date.replace(minute=0, second=0, microsecond=0)
-                end_time = end_date.replace(minute=0, second=0, microsecond=0)
-                while current_time <= end_time:
-                    if timezone.is_naive(current_time):
-                        current_time = timezone.make_aware(current_time)
-                    time_points.append(current_time)
-                    current_time += timedelta(hours=1)
-            elif period == 'week':
-                # 按天统计
-                current_date = start_date.date()
-                end_date_obj = end_date.date()
-                while current_date <= end_date_obj:
-                    current_time = timezone.make_aware(datetime.combine(current_date, datetime.min.time()))
-                    time_points.append(current_time)
-                    current_date += timedelta(days=1)
-            elif period == 'month':
-                # 按天统计
-                current_date = start_date.date()
-                end_date_obj = end_date.date()
-                while current_date <= end_date_obj:
-                    current_time = timezone.make_aware(datetime.combine(current_date, datetime.min.time()))
-                    time_points.append(current_time)
-                    current_date += timedelta(days=1)
-            elif period == 'quarter':
-                # 按周统计
-                current_date = start_date.date()
-                end_date_obj = end_date.date()
-                while current_date <= end_date_obj:
-                    current_time = timezone.make_aware(datetime.combine(current_date, datetime.min.time()))
-                    time_points.append(current_time)
-                    current_date += timedelta(weeks=1)
-            else:  # year
-                # 按月统计
-                current_date = start_date.date()
-                end_date_obj = end_date.date()
-                while current_date <= end_date_obj:
-                    current_time = timezone.make_aware(datetime.combine(current_date, datetime.min.time()))
-                    time_points.append(current_time)
-                    if current_date.month == 12:
-                        current_date = current_date.replace(year=current_date.year + 1, month=1)
-                    else:
-                        try:
-                            current_date = current_date.replace(month=current_date.month + 1)
-                        except ValueError:  # 处理月份天数问题
-                            if current_date.month in [1, 3, 5, 7, 8, 10, 12]:
-                                current_date = current_date.replace(day=30, month=current_date.month + 1)
-                            else:
-                                current_date = current_date.replace(day=28, month=current_date.month + 1)
-            
-            # 为每个时间段统计健康状态
-            for i in range(len(time_points) - 1):
-                period_start = time_points[i]
-                period_end = time_points[i + 1]
-                
-                # 统计该时间段内的状态
-                status_counts = {'green': 0, 'yellow': 0, 'red': 0, 'unknown': 0}
-                
-                # 遍历每个节点的数据
-                for node_id, records in health_records.items():
-                    # 确保时间范围是timezone-aware的
-                    if timezone.is_naive(period_start):
-                        period_start = timezone.make_aware(period_start)
-                    if timezone.is_naive(period_end):
-                        period_end = timezone.make_aware(period_end)
-                    
-                    # 找到该时间段内该节点的记录
-                    period_records = []
-                    for r in records:
-                        record_time = r['time']
-                        # 确保record_time是timezone-aware的
-                        if timezone.is_naive(record_time):
-                            record_time = timezone.make_aware(record_time)
-                            
-                        if period_start <= record_time < period_end:
-                            period_records.append(r)
-                    
-                    if period_records:
-                        # 以最新的记录为准
-                        latest_record = max(period_records, key=lambda x: x['time'])
-                        status = latest_record.get('healthy_status', 'unknown')
-                        if status in status_counts:
-                            status_counts[status] += 1
-                    else:
-                        # 如果该时间段内没有记录，使用节点当前状态
-                        node = Node.objects.filter(uuid=node_id).first()
-                        if node:
-                            current_status = node.healthy_status
-                            if current_status in status_counts:
-                                status_counts[current_status] += 1
-                
-                trend_data.append({
-                    'date': period_start.isoformat(),
-                    'green_count': status_counts['green'],
-                    'yellow_count': status_counts['yellow'],
-                    'red_count': status_counts['red'],
-                    'unknown_count': status_counts['unknown']
-                })
-            
-            # 如果InfluxDB没有足够的数据，使用回退逻辑
-            if not trend_data or all(
-                item['green_count'] == 0 and item['yellow_count'] == 0 and 
-                item['red_count'] == 0 and item['unknown_count'] == 0 
-                for item in trend_data
-            ):
-                # 使用原有的基于MySQL的逻辑作为回退
-                return self._get_health_trend_data_fallback(period, start_date, end_date)
-
-            return {
-                'period': period,
-                'data': trend_data
-            }
-            
-        except Exception as e:
-            color_logger.error(f"从InfluxDB获取健康趋势数据失败: {str(e)}", exc_info=True)
-            # 回退到原有逻辑
-            return self._get_health_trend_data_fallback(period, start_date, end_date)
-    
-    def _get_health_trend_data_fallback(self, period, start_date, end_date):
-        """回退到MySQL获取健康趋势数据"""
-        # 原有逻辑...
-        now = timezone.now()
-        if not start_date or not end_date:
             if period == 'day':
                 start_date = now - timedelta(days=1)
             elif period == 'week':
@@ -1808,52 +1694,59 @@ class MonitorDashboardView(View):
             elif period == 'year':
                 start_date = now - timedelta(days=365)
             else:
+                # 默认为周
                 start_date = now - timedelta(weeks=1)
             end_date = now
 
-        time_points = []
-        if period == 'day':
-            start_hour_point = start_date.replace(minute=0, second=0, microsecond=0)
-            end_hour_point = end_date.replace(minute=0, second=0, microsecond=0)
-            current_hour = start_hour_point
-            while current_hour <= end_hour_point:
-                time_points.append(current_hour)
-                current_hour += timedelta(hours=1)
-        elif period in ['week', 'month']:
-            current_date = start_date.date()
-            end_date_date = end_date.date()
-            while current_date <= end_date_date:
-                time_points.append(timezone.make_aware(datetime.combine(current_date, datetime.min.time())))
-                current_date += timedelta(days=1)
+        kind, time_points, range_end = self._get_trend_buckets(period, start_date, end_date)
+        # 启用节点的当前状态（一次查询），时间桶内没有记录时使用
+        active_node_status = dict(Node.objects.filter(is_active=True).values_list('uuid', 'healthy_status'))
+        if not time_points or not active_node_status:
+            return {
+                'period': period,
+                'data': []
+            }
+
+        # 使用固定时差截断时间（Asia/Shanghai 无夏令时），MySQL 无需加载时区表
+        bucket_tz = dt_timezone(timezone.localtime(time_points[0]).utcoffset())
+
+        # 已汇总的时间范围读取汇总表，其余部分读取原始记录
+        rollup_granularity = 'hour' if kind == 'hour' else 'day'
+        rollup_end = get_rollup_watermark(rollup_granularity)
+        rollup_end = min(max(rollup_end, time_points[0]), range_end) if rollup_end else time_points[0]
+
+        node_worst_status = {}
+        if rollup_end > time_points[0]:
+            rollup_rows = self._get_worst_status_rows(
+                NodeHealthRollup.objects.filter(
+                    granularity=rollup_granularity,
+                    bucket_start__gte=time_points[0],
+                    bucket_start__lt=rollup_end,
+                    node__is_active=True
+                ),
+                'bucket_start', 'worst_status', kind, bucket_tz
+            )
+            for row in rollup_rows:
+                node_worst_status[(row['bucket'], row['node_id'])] = row['worst_status']
+        if rollup_end < range_end:
+            for key, worst_status in self._get_raw_worst_status(kind, rollup_end, range_end, active_node_status, bucket_tz).items():
+                node_worst_status[key] = max(node_worst_status.get(key, worst_status), worst_status)
+
+        active_status_counts = Counter(active_node_status.values())
+        priority_status = {priority: status for status, priority in self.TREND_STATUS_PRIORITY.items()}
+
+        bucket_counts = {}
+        for (bucket, node_id), worst_status in node_worst_status.items():
+            status_counts = bucket_counts.get(bucket)
+            if status_counts is None:
+                status_counts = bucket_counts[bucket] = active_status_counts.copy()
+            status_counts[priority_status[worst_status]] += 1
+            # 有记录的节点不再按当前状态统计
+            status_counts[active_node_status[node_id]] -= 1
 
         trend_data = []
         for time_point in time_points:
-            end_time = time_point + timedelta(days=1) if period in ['week', 'month'] else time_point + timedelta(hours=1)
-            
-            records_in_period = NodeHealth.objects.filter(
-                create_time__gte=time_point,
-                create_time__lt=end_time
-            )
-            
-            node_highest_status = {}
-            status_priority = {'red': 3, 'yellow': 2, 'unknown': 1, 'green': 0}
-            
-            for record in records_in_period:
-                node_id = record.node_id
-                current_status = record.healthy_status
-                if (node_id not in node_highest_status or 
-                    status_priority[current_status] > status_priority[node_highest_status[node_id]]):
-                    node_highest_status[node_id] = current_status
-            
-            all_node_ids_in_records = set(node_highest_status.keys())
-            nodes_without_records = Node.objects.filter(is_active=True).exclude(uuid__in=all_node_ids_in_records)
-            
-            for node in nodes_without_records:
-                node_highest_status[node.uuid] = node.healthy_status
-            
-            from collections import Counter
-            status_counts = Counter(node_highest_status.values())
-            
+            status_counts = bucket_counts.get(time_point, active_status_counts)
             trend_data.append({
                 'date': time_point.isoformat(),
                 'green_count': status_counts['green'],
@@ -1861,12 +1754,106 @@ class MonitorDashboardView(View):
                 'red_count': status_counts['red'],
                 'unknown_count': status_counts['unknown']
             })
-        
+
         return {
             'period': period,
             'data': trend_data
         }
-    
+
+    def _get_trend_buckets(self, period, start_date, end_date):
+        """
+        生成趋势图时间桶
+        :return: (截断粒度, 各时间桶起点列表, 最后一个时间桶的结束时间)
+        """
+        kind = self.TREND_BUCKET_KINDS.get(period, 'day')
+        start_date = timezone.localtime(start_date)
+        end_date = timezone.localtime(end_date)
+
+        if kind == 'hour':
+            current = start_date.replace(minute=0, second=0, microsecond=0)
+            last = end_date.replace(minute=0, second=0, microsecond=0)
+            step = lambda point: point + timedelta(hours=1)
+        else:
+            start_day = start_date.date()
+            end_day = end_date.date()
+            if kind == 'week':
+                start_day -= timedelta(days=start_day.weekday())
+                end_day -= timedelta(days=end_day.weekday())
+            elif kind == 'month':
+                start_day = start_day.replace(day=1)
+                end_day = end_day.replace(day=1)
+            current = timezone.make_aware(datetime.combine(start_day, datetime.min.time()))
+            last = timezone.make_aware(datetime.combine(end_day, datetime.min.time()))
+
+            def step(point):
+                if kind == 'day':
+                    next_day = point.date() + timedelta(days=1)
+                elif kind == 'week':
+                    next_day = point.date() + timedelta(weeks=1)
+                else:
+                    next_day = (point.date().replace(day=28) + timedelta(days=4)).replace(day=1)
+                return timezone.make_aware(datetime.combine(next_day, datetime.min.time()))
+
+        time_points = []
+        while current <= last:
+            time_points.append(current)
+            current = step(current)
+        return kind, time_points, current
+
+    def _get_worst_status_rows(self, queryset, time_field, status_field, kind, bucket_tz):
+        """按时间桶和节点分组，取每个节点在时间桶内的最差状态（状态优先级）"""
+        return queryset.annotate(
+            bucket=Trunc(time_field, kind, tzinfo=bucket_tz)
+        ).values('bucket', 'node_id').annotate(
+            worst_status=Max(Case(
+                *[When(**{status_field: status}, then=priority) for status, priority in self.TREND_STATUS_PRIORITY.items()],
+                default=self.TREND_STATUS_PRIORITY['unknown'],
+                output_field=IntegerField()
+            ))
+        ).order_by()
+
+    def _truncate_trend_bucket(self, value, kind):
+        """将时间截断到所在趋势图时间桶的开始时间（与 _get_trend_buckets 一致）"""
+        value = timezone.localtime(value)
+        if kind == 'hour':
+            return value.replace(minute=0, second=0, microsecond=0)
+        day = value.date()
+        if kind == 'week':
+            day -= timedelta(days=day.weekday())
+        elif kind == 'month':
+            day = day.replace(day=1)
+        return timezone.make_aware(datetime.combine(day, datetime.min.time()))
+
+    def _get_raw_worst_status(self, kind, range_start, range_end, active_node_status, bucket_tz):
+        """
+        读取 [range_start, range_end) 内的原始记录（水位线之后尚未汇总的部分）
+        :return: {(时间桶开始时间, 节点UUID): 最差状态优先级}，只包含启用节点
+        """
+        source = get_rollup_config()['source']
+        if source != 'mysql':
+            try:
+                unknown_priority = self.TREND_STATUS_PRIORITY['unknown']
+                raw_worst_status = {}
+                for node_id, record_time, healthy_status, _ in iter_health_records('node', range_start, range_end, source):
+                    try:
+                        node_id = UUID(str(node_id))
+                    except (TypeError, ValueError):
+                        continue
+                    if node_id not in active_node_status:
+                        continue
+                    key = (self._truncate_trend_bucket(record_time, kind), node_id)
+                    priority = self.TREND_STATUS_PRIORITY.get(healthy_status, unknown_priority)
+                    raw_worst_status[key] = max(raw_worst_status.get(key, priority), priority)
+                return raw_worst_status
+            except Exception as e:
+                color_logger.error(f"从InfluxDB获取健康趋势数据失败，使用MySQL记录: {str(e)}", exc_info=True)
+
+        raw_rows = self._get_worst_status_rows(
+            NodeHealth.objects.filter(create_time__gte=range_start, create_time__lt=range_end, node__is_active=True),
+            'create_time', 'healthy_status', kind, bucket_tz
+        )
+        return {(row['bucket'], row['node_id']): row['worst_status'] for row in raw_rows}
+
     def get_recent_alerts(self):
         """获取最近告警"""
         # 按状态和时间排序
@@ -1877,11 +1864,15 @@ class MonitorDashboardView(View):
                 'status_order': "CASE WHEN status='OPEN' THEN 3 WHEN status='SILENCED' THEN 2 WHEN status='CLOSED' THEN 1 ELSE 0 END"
             }
         ).order_by('-status_order', '-last_occurred')[:10]
+        recent_alerts = list(recent_alerts)
+
+        # 一次查询所有告警关联的节点及架构图
+        node_map = get_node_map_by_ids([alert.node_id for alert in recent_alerts])
         
         result = []
         for alert in recent_alerts:
             # 尝试获取关联的节点名称
-            node = Node.objects.filter(uuid=alert.node_id).first()
+            node = get_alert_node(node_map, alert.node_id)
             node_name = node.name if node else f'Node {alert.node_id}'
             
             result.append({
@@ -1889,7 +1880,7 @@ class MonitorDashboardView(View):
                 'title': alert.title,
                 'node_id': alert.node_id,
                 'node_name': node_name,
-                'link_name': node.link.name if node.link else 'Unknown',
+                'link_name': node.link.name if node and node.link else 'Unknown',
                 'level': alert.severity.lower() if alert.severity else 'medium',
                 'time': utc_obj_to_time_zone_str(alert.last_occurred),
                 # 'time': alert.last_occurred.isoformat() if alert.last_occurred else None,
@@ -1904,6 +1895,7 @@ class MonitorDashboardView(View):
 class BaseInfoView(View):
     """基础信息相关接口"""
     
+    @monitor_response_cache((TOPOLOGY_CACHE_DOMAIN, HEALTH_CACHE_DOMAIN))
     def get(self, request):
         """获取基础信息列表"""
         try:
@@ -1961,6 +1953,7 @@ class BaseInfoView(View):
                     'port': base_info.port,
                     'is_healthy': base_info.is_healthy,
                     'is_ping_disabled': base_info.is_ping_disabled,  # 全局默认配置
+                    'extra_probes': base_info.extra_probes,
                     'remarks': base_info.remarks,
                     'nodes': nodes_info,  # 使用此服务的所有节点
                     'create_time': utc_obj_to_time_zone_str(base_info.create_time),
@@ -1989,8 +1982,10 @@ class BaseInfoView(View):
             base_info = BaseInfo.objects.filter(uuid=uuid).first()
             assert base_info, '更新的基础信息不存在'
 
-            update_keys = ['is_ping_disabled', 'remarks']
+            update_keys = ['is_ping_disabled', 'remarks', 'extra_probes']
             update_dict = {key: value for key, value in body.items() if key in update_keys}
+            if 'extra_probes' in update_dict:
+                validate_extra_probes(update_dict['extra_probes'])
             
             for key, value in update_dict.items():
                 setattr(base_info, key, value)
@@ -2016,6 +2011,7 @@ class BaseInfoView(View):
                 'port': base_info.port,
                 'is_healthy': base_info.is_healthy,
                 'is_ping_disabled': base_info.is_ping_disabled,
+                'extra_probes': base_info.extra_probes,
                 'remarks': base_info.remarks,
                 'nodes': nodes_info
             })
@@ -2068,4 +2064,71 @@ class NodeHealthTSView(View):
             
         except Exception as e:
             color_logger.error(f"获取节点健康时序数据失败: {e.args}")
-            return pub_error_response(f"获取节点健康时序数据失败: {e.args}")
\ No newline at end of file
+            return pub_error_response(f"获取节点健康时序数据失败: {e.args}")
+
+
+class MonitorEventView(View):
+    """监控事件接口（短轮询），返回节点/基础信息状态变化和告警打开/关闭事件"""
+
+    def get(self, request):
+        """
+        获取上次轮询之后的事件，可通过 link_uuid 只获取指定链路的事件
+
+        首次请求不带 last_event_id，只返回当前位置；之后携带上次返回的 last_event_id。
+        返回 reset 为 true 时事件有遗漏，需全量刷新；versions 变化时刷新对应的数据。
+        """
+        try:
+            body = pub_get_request_body(request)
+            link_uuid = body.get('link_uuid') or None
+            if link_uuid:
+                link = Link.objects.filter(uuid=link_uuid).only('uuid').first()
+                assert link, '链路不存在'
+                link_uuid = str(link.uuid)
+
+            last_event_id = body.get('last_event_id') or None
+            try:
+                result = get_monitor_events(link_uuid, last_event_id)
+            except ValueError:
+                raise AssertionError('last_event_id 格式不正确')
+            return pub_success_response(result)
+        except Exception as e:
+            color_logger.error(f"获取监控事件失败: {e.args}")
+            return pub_error_response(f"获取监控事件失败: {e.args}")
+
+
+class SlaReportView(View):
+    """可用性 / SLA 统计接口（基于健康状态汇总）"""
+
+    def parse_time(self, value):
+        """解析 ISO 格式时间，无时区时按本地时区处理"""
+        if not value:
+            return None
+        value = datetime.fromisoformat(value.replace('Z', '+00:00'))
+        return timezone.make_aware(value) if timezone.is_naive(value) else value
+
+    def get(self, request):
+        """获取节点 / 链路 / 基础信息的可用率、MTTR、MTBF 和故障次数"""
+        try:
+            body = pub_get_request_body(request)
+            target_type = body.get('target_type', 'node')
+            target_uuid = body.get('uuid') or None
+            if target_uuid:
+                target_uuid = str(UUID(str(target_uuid)))
+
+            start_time, end_time = get_sla_range(
+                body.get('period', 'month'),
+                self.parse_time(body.get('start_date')),
+                self.parse_time(body.get('end_date'))
+            )
+            assert start_time < end_time, '开始时间必须早于结束时间'
+
+            report = compute_sla(target_type, start_time, end_time, target_uuid, body.get('granularity') or None)
+            for item in report['items']:
+                item['last_incident_start'] = utc_obj_to_time_zone_str(item['last_incident_start'])
+            for key in ('start_time', 'end_time', 'covered_until'):
+                report[key] = utc_obj_to_time_zone_str(report[key])
+
+            return pub_success_response(report)
+        except Exception as e:
+            color_logger.error(f"获取SLA统计失败: {e.args}")
+            return pub_error_response(f"获取SLA统计失败: {e.args}")
@@ -1,7 +1,10 @@
 import re
 from apps.myAuth.token_utils import TokenManager
 from apps.perm.utils import check_user_api_permission
-from lib.request_tool import get_authorization_token, pub_error_response, set_current_request
+from lib.request_tool import (
+    get_authorization_token, get_client_ip, pub_error_response, reset_current_operator,
+    set_current_operator, set_current_request
+)
 from backend.settings import config_data
 from lib.log import color_logger
 
@@ -12,10 +15,15 @@ class AuthMiddleware:
 
     def __call__(self, request):
         set_current_request(request)
-        response = self.process_request(request)
-        if response:
-            return response
-        return self.get_response(request)
+        # 默认为匿名操作者，token校验通过后再设置用户名
+        operator_token = set_current_operator(None, None)
+        try:
+            response = self.process_request(request)
+            if response:
+                return response
+            return self.get_response(request)
+        finally:
+            reset_current_operator(operator_token)
 
     def process_request(self, request):
         """处理请求"""
@@ -70,6 +78,8 @@ class AuthMiddleware:
 
                 # 将用户名和用户类型设置到request中
                 request.user_name = user_name
+                # 审计信号直接读取，无需重复解析token
+                set_current_operator(user_name, get_client_ip(request))
 
                 return None
             except Exception as e:
@@ -3,7 +3,11 @@ import jwt
 from backend.settings import config_data
 from lib.log import color_logger
 
-from lib.redis_tool import delete_redis_value, get_redis_value, set_redis_value
+from lib.redis_tool import delete_redis_value, encode_redis_value, get_redis_value, redis_pipeline, set_redis_value
+from lib.local_cache_tool import get_local_cache, invalidate_local_cache
+
+# 进程内缓存 access_token:{username} -> Redis 中存储的 access token
+ACCESS_TOKEN_LOCAL_CACHE = 'auth_access_token'
 
 class TokenManager:
     def _generate_token(self, username, expire_time):
@@ -34,19 +38,21 @@ class TokenManager:
             config_data.get('AUTH', {}).get('REFRESH_TOKEN_EXPIRE')
         )
 
-        # 存储到Redis
-        set_redis_value(
-            redis_db_name='AUTH',
-            redis_key_name=f"access_token:{username}",
-            redis_key_value=access_token,
-            set_expire=config_data.get('AUTH', {}).get('ACCESS_TOKEN_EXPIRE')
-        )
-        set_redis_value(
-            redis_db_name='AUTH',
-            redis_key_name=f"refresh_token:{username}",
-            redis_key_value=refresh_token,
-            set_expire=config_data.get('AUTH', {}).get('REFRESH_TOKEN_EXPIRE')
-        )
+        # 存储到Redis（一次往返）
+        with redis_pipeline('AUTH') as pipeline:
+            pipeline.set(
+                f"access_token:{username}",
+                encode_redis_value(access_token),
+                ex=config_data.get('AUTH', {}).get('ACCESS_TOKEN_EXPIRE')
+            )
+            pipeline.set(
+                f"refresh_token:{username}",
+                encode_redis_value(refresh_token),
+                ex=config_data.get('AUTH', {}).get('REFRESH_TOKEN_EXPIRE')
+            )
+
+        # 之前的access token立即失效（通知所有进程剔除本地缓存）
+        invalidate_local_cache(ACCESS_TOKEN_LOCAL_CACHE, f"access_token:{username}")
         
         return access_token, refresh_token
         
@@ -61,14 +67,22 @@ class TokenManager:
             )
             # color_logger.debug(f"verify_token payload: {payload}")
             
+            # 先查进程内缓存，命中且一致时无需访问Redis
+            redis_key = f"access_token:{payload['username']}"
+            local_cache = get_local_cache(ACCESS_TOKEN_LOCAL_CACHE)
+            if local_cache.get(redis_key) == token:
+                return payload
+
             # 检查Redis中是否存在
+            # 本地缓存不一致时（如其他进程刷新了token）也以Redis为准
             stored_token = get_redis_value(
                 redis_db_name='AUTH',
-                redis_key_name=f"access_token:{payload['username']}"
+                redis_key_name=redis_key
             )
             if not stored_token or stored_token != token:
                 return None
-                
+
+            local_cache.set(redis_key, stored_token)
             return payload
         except Exception as e:
             # color_logger.error(f"verify_token error: {e}")
@@ -109,6 +123,9 @@ class TokenManager:
                 set_expire=config_data.get('AUTH', {}).get('ACCESS_TOKEN_EXPIRE')
             )
             color_logger.debug(f"refresh_access_token 更新Redis")
+
+            # 旧的access token立即失效
+            invalidate_local_cache(ACCESS_TOKEN_LOCAL_CACHE, f"access_token:{payload['username']}")
             
             return access_token, payload['username']
         except Exception as e:
@@ -118,14 +135,9 @@ class TokenManager:
     def invalidate_tokens(self, username):
         """使指定用户的所有token失效"""
         try:
-            delete_redis_value(
-                redis_db_name='AUTH',
-                redis_key_name=f"access_token:{username}"
-            )
-            delete_redis_value(
-                redis_db_name='AUTH',
-                redis_key_name=f"refresh_token:{username}"
-            ) 
+            delete_redis_value('AUTH', f"access_token:{username}", f"refresh_token:{username}")
+            # 通知所有进程剔除本地缓存
+            invalidate_local_cache(ACCESS_TOKEN_LOCAL_CACHE, f"access_token:{username}")
         except Exception as e:
             color_logger.error(f"invalidate_tokens error: {e}")
             return None
@@ -0,0 +1,199 @@
+"""
+接口权限匹配器
+
+将合并后的权限JSON（backend.api）预编译为：
+- 路径 -> 允许的请求方法集合 的哈希表（精确路径）
+- 按路径段组织的前缀树 + 请求方法位掩码（通配路径）
+
+同一份权限JSON（按内容指纹区分版本）只编译一次，编译结果缓存在进程内，
+校验时只做字典查找与集合/位运算。
+
+匹配规则：
+- 未加前缀的路径与原有校验一致：路径按字面完全相等匹配（不去掉结尾斜杠、查询参数），
+  请求方法按字面匹配，需要校验的方法必须全部在授权的方法列表中
+- 以 `pattern:` 开头的路径为通配路径（显式启用），按路径段匹配（忽略空路径段），
+  例如 `pattern:/api/monitor/node/{uuid}/`：
+  - `*`、`{name}`、`<name>`、`:name` 匹配任意一个路径段
+  - `**` 只能作为最后一段，匹配剩余的任意多个路径段（包括零个）
+  - 方法只支持标准请求方法（大写），未知方法忽略（记录日志）
+- 同一路径的精确授权与通配授权取并集
+- 不支持 `*` / `ALL` 等表示全部方法的写法；授权的方法需为列表，否则忽略该路径（记录日志）
+- 需要校验的方法为空时一律拒绝
+"""
+import hashlib
+import json
+
+from lib.local_cache_tool import get_local_cache
+from lib.log import color_logger
+
+METHOD_BITS = {
+    'GET': 1,
+    'POST': 1 << 1,
+    'PUT': 1 << 2,
+    'DELETE': 1 << 3,
+    'PATCH': 1 << 4,
+    'HEAD': 1 << 5,
+    'OPTIONS': 1 << 6,
+}
+
+# 编译结果按权限指纹缓存，不同用户权限相同时共享
+COMPILED_MATCHER_LOCAL_CACHE = 'api_permission_matcher'
+COMPILED_MATCHER_TTL = 600
+# 通配路径前缀
+PATTERN_PREFIX = 'pattern:'
+
+
+def split_api_path(path):
+    """通配匹配使用的路径段（忽略空路径段）"""
+    return [seg for seg in path.split('/') if seg]
+
+
+def methods_to_mask(methods):
+    """方法列表（或单个方法）转为位掩码，包含未知方法时返回 None"""
+    if isinstance(methods, str):
+        methods = [methods]
+
+    mask = 0
+    for method in methods:
+        bit = METHOD_BITS.get(method)
+        if bit is None:
+            return None
+        mask |= bit
+    return mask
+
+
+def _is_param_segment(segment):
+    return (
+        segment == '*'
+        or (segment.startswith('{') and segment.endswith('}'))
+        or (segment.startswith('<') and segment.endswith('>'))
+        or segment.startswith(':')
+    )
+
+
+class _TrieNode:
+    __slots__ = ('children', 'param_child', 'mask', 'rest_mask')
+
+    def __init__(self):
+        self.children = {}
+        self.param_child = None
+        # 路径恰好结束于此节点时允许的方法
+        self.mask = 0
+        # `**` 匹配剩余路径时允许的方法
+        self.rest_mask = 0
+
+
+class CompiledApiPermission:
+    """预编译的接口权限"""
+
+    __slots__ = ('version', 'exact', 'trie', 'has_pattern')
+
+    def __init__(self, api_permission_json, version=None):
+        self.version = version
+        self.exact = {}
+        self.trie = _TrieNode()
+        self.has_pattern = False
+
+        for api_path, methods in (api_permission_json or {}).items():
+            if not isinstance(methods, (list, tuple)):
+                color_logger.warning(f"接口权限 {api_path} 的请求方法需为列表，已忽略: {methods}")
+                continue
+
+            if not api_path.startswith(PATTERN_PREFIX):
+                self.exact[api_path] = frozenset(methods)
+                continue
+
+            mask = self._grant_mask(api_path, methods)
+            if not mask:
+                continue
+            self.has_pattern = True
+            self._insert(split_api_path(api_path[len(PATTERN_PREFIX):]), mask)
+
+    @staticmethod
+    def _grant_mask(api_path, methods):
+        """通配路径授权的方法转为位掩码，未知方法只跳过该方法"""
+        mask = 0
+        for method in methods:
+            bit = METHOD_BITS.get(method)
+            if bit is None:
+                color_logger.warning(f"接口权限 {api_path} 包含未知的请求方法: {method}，已忽略")
+                continue
+            mask |= bit
+        return mask
+
+    def _insert(self, segments, mask):
+        node = self.trie
+        for segment in segments:
+            if segment == '**':
+                # `**` 之后的路径段忽略
+                node.rest_mask |= mask
+                return
+            if _is_param_segment(segment):
+                if node.param_child is None:
+                    node.param_child = _TrieNode()
+                node = node.param_child
+            else:
+                child = node.children.get(segment)
+                if child is None:
+                    child = node.children[segment] = _TrieNode()
+                node = child
+        node.mask |= mask
+
+    def _match_mask(self, segments):
+        """返回所有匹配模式允许的方法并集"""
+        mask = 0
+        # 深度优先遍历，同时沿精确段与参数段两个分支
+        stack = [(self.trie, 0)]
+        segment_count = len(segments)
+        while stack:
+            node, index = stack.pop()
+            mask |= node.rest_mask
+            if index == segment_count:
+                mask |= node.mask
+                continue
+            child = node.children.get(segments[index])
+            if child is not None:
+                stack.append((child, index + 1))
+            if node.param_child is not None:
+                stack.append((node.param_child, index + 1))
+        return mask
+
+    def allows(self, api_path, methods):
+        """检查是否允许以指定方法访问接口"""
+        if isinstance(methods, str):
+            methods = [methods]
+        # 空方法列表一律拒绝
+        if not methods:
+            return False
+
+        allow_methods = self.exact.get(api_path)
+        if allow_methods is not None:
+            if allow_methods.issuperset(methods):
+                return True
+            # 精确路径未授权的方法再由通配路径判断
+            methods = [method for method in methods if method not in allow_methods]
+        if not self.has_pattern:
+            return False
+
+        # 通配路径只授权标准请求方法，包含未知方法时拒绝
+        need_mask = methods_to_mask(methods)
+        if need_mask is None:
+            return False
+        return self._match_mask(split_api_path(api_path)) & need_mask == need_mask
+
+
+def get_api_permission_version(api_permission_json):
+    """权限JSON的内容指纹，作为编译结果的版本号"""
+    raw = json.dumps(api_permission_json or {}, sort_keys=True, ensure_ascii=False)
+    return hashlib.md5(raw.encode('utf-8')).hexdigest()
+
+
+def get_compiled_api_permission(api_permission_json):
+    """获取权限JSON对应的编译结果（同一版本只编译一次）"""
+    version = get_api_permission_version(api_permission_json)
+    local_cache = get_local_cache(COMPILED_MATCHER_LOCAL_CACHE)
+    compiled = local_cache.get(version)
+    if compiled is None:
+        compiled = CompiledApiPermission(api_permission_json, version=version)
+        local_cache.set(version, compiled, ttl=COMPILED_MATCHER_TTL)
+    return compiled
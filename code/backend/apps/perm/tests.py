@@ -1,3 +1,115 @@
-from django.test import TestCase
+from django.test import SimpleTestCase
 
-# Create your tests here.
+from .permission_matcher import CompiledApiPermission
+
+
+def baseline_allows(api_permission_json, api_path, methods):
+    """预编译之前的校验逻辑（精确路径、方法按字面比较）"""
+    if api_path not in api_permission_json:
+        return False
+    if isinstance(methods, str):
+        methods = [methods]
+    return not set(methods) - set(api_permission_json[api_path])
+
+
+class ExactPermissionTest(SimpleTestCase):
+    """未加前缀的路径与原有校验结果一致"""
+
+    PERMISSION_JSON = {
+        '/api/v1/monitor/nodes/': ['GET', 'POST'],
+        '/api/v1/monitor/links': ['GET'],
+        '/api/v1/monitor/node/{uuid}/': ['GET'],
+        '/api/v1/audit/logs/': ['*'],
+    }
+    CHECKS = [
+        ('/api/v1/monitor/nodes/', 'GET'),
+        ('/api/v1/monitor/nodes/', ['GET', 'POST']),
+        ('/api/v1/monitor/nodes/', ['GET', 'DELETE']),
+        ('/api/v1/monitor/nodes/', 'get'),
+        # 结尾斜杠、重复斜杠、查询参数不做规范化
+        ('/api/v1/monitor/nodes', 'GET'),
+        ('/api/v1/monitor/links/', 'GET'),
+        ('/api/v1/monitor//nodes/', 'GET'),
+        ('/api/v1/monitor/nodes/?page=1', 'GET'),
+        # 未加前缀的路径中的参数写法按字面匹配
+        ('/api/v1/monitor/node/1/', 'GET'),
+        ('/api/v1/monitor/node/{uuid}/', 'GET'),
+        # `*` 不表示全部方法
+        ('/api/v1/audit/logs/', 'GET'),
+        ('/api/v1/audit/logs/', '*'),
+        ('/api/v1/unknown/', 'GET'),
+    ]
+
+    def test_same_result_as_baseline(self):
+        compiled = CompiledApiPermission(self.PERMISSION_JSON)
+        for api_path, methods in self.CHECKS:
+            with self.subTest(api_path=api_path, methods=methods):
+                self.assertEqual(
+                    compiled.allows(api_path, methods),
+                    baseline_allows(self.PERMISSION_JSON, api_path, methods)
+                )
+
+    def test_non_list_methods_ignored(self):
+        compiled = CompiledApiPermission({'/api/v1/user/': 'GET', '/api/v1/group/': None})
+        self.assertFalse(compiled.allows('/api/v1/user/', 'GET'))
+        self.assertFalse(compiled.allows('/api/v1/user/', 'G'))
+        self.assertFalse(compiled.allows('/api/v1/group/', 'GET'))
+
+    def test_empty_methods_denied(self):
+        compiled = CompiledApiPermission(self.PERMISSION_JSON)
+        self.assertFalse(compiled.allows('/api/v1/monitor/nodes/', []))
+        self.assertFalse(compiled.allows('/api/v1/monitor/nodes/', ''))
+        self.assertFalse(compiled.allows('/api/v1/unknown/', []))
+
+
+class PatternPermissionTest(SimpleTestCase):
+    """`pattern:` 前缀的通配路径"""
+
+    PERMISSION_JSON = {
+        'pattern:/api/v1/monitor/node/{uuid}/': ['GET', 'PUT'],
+        'pattern:/api/v1/monitor/link/*/nodes/': ['GET'],
+        'pattern:/api/v1/audit/**': ['GET', 'ALL', 'BREW'],
+        '/api/v1/monitor/node/special/': ['DELETE'],
+    }
+
+    def setUp(self):
+        self.compiled = CompiledApiPermission(self.PERMISSION_JSON)
+
+    def test_param_segment(self):
+        self.assertTrue(self.compiled.allows('/api/v1/monitor/node/1/', 'GET'))
+        self.assertTrue(self.compiled.allows('/api/v1/monitor/node/1/', ['GET', 'PUT']))
+        self.assertFalse(self.compiled.allows('/api/v1/monitor/node/1/', 'DELETE'))
+        self.assertFalse(self.compiled.allows('/api/v1/monitor/node/1/2/', 'GET'))
+        self.assertFalse(self.compiled.allows('/api/v1/monitor/node/', 'GET'))
+        self.assertTrue(self.compiled.allows('/api/v1/monitor/link/1/nodes/', 'GET'))
+        self.assertFalse(self.compiled.allows('/api/v1/monitor/link/1/nodes/', 'POST'))
+
+    def test_rest_segments(self):
+        self.assertTrue(self.compiled.allows('/api/v1/audit/', 'GET'))
+        self.assertTrue(self.compiled.allows('/api/v1/audit/logs/1/', 'GET'))
+        self.assertFalse(self.compiled.allows('/api/v1/audit/logs/1/', 'POST'))
+        self.assertFalse(self.compiled.allows('/api/v1/auditx/', 'GET'))
+
+    def test_method_mask(self):
+        # 未知方法（含 ALL）只忽略该方法，不授权全部方法
+        for method in ('POST', 'PUT', 'DELETE', 'PATCH', 'HEAD', 'OPTIONS', 'ALL', 'BREW', 'get'):
+            with self.subTest(method=method):
+                self.assertFalse(self.compiled.allows('/api/v1/audit/logs/', method))
+        self.assertFalse(self.compiled.allows('/api/v1/audit/logs/', ['GET', 'BREW']))
+        self.assertFalse(self.compiled.allows('/api/v1/audit/logs/', []))
+
+    def test_path_segments(self):
+        # 通配路径按路径段匹配，结尾斜杠与空路径段不影响结果
+        self.assertTrue(self.compiled.allows('/api/v1/monitor/node/1', 'GET'))
+        self.assertTrue(self.compiled.allows('/api/v1/monitor//node/1/', 'GET'))
+        # 查询参数不去掉，视为路径段的一部分
+        self.assertFalse(self.compiled.allows('/api/v1/monitor/node/1/?a=1', 'GET'))
+
+    def test_union_with_exact(self):
+        self.assertTrue(self.compiled.allows('/api/v1/monitor/node/special/', 'DELETE'))
+        self.assertTrue(self.compiled.allows('/api/v1/monitor/node/special/', 'GET'))
+        self.assertTrue(self.compiled.allows('/api/v1/monitor/node/special/', ['GET', 'DELETE']))
+
+    def test_unprefixed_pattern_is_literal(self):
+        compiled = CompiledApiPermission({'/api/v1/monitor/node/{uuid}/': ['GET']})
+        self.assertFalse(compiled.allows('/api/v1/monitor/node/1/', 'GET'))
@@ -1,3 +1,5 @@
+import copy
+
 from apps.user.models import User, UserGroup
 from .models import Permission, Role
 from lib.log import color_logger
@@ -5,6 +7,13 @@ from lib.json_tools import merge_jsons
 from lib.time_tools import utc_obj_to_time_zone_str
 from backend.settings import config_data
 from lib.redis_tool import get_redis_value, set_redis_value
+from lib.local_cache_tool import get_local_cache
+from .permission_matcher import get_compiled_api_permission
+
+# 进程内缓存 user_perm_json_all:{user} -> 合并后的权限JSON
+USER_PERM_LOCAL_CACHE = 'user_perm_json_all'
+# 进程内缓存 user -> 预编译的接口权限
+USER_API_PERM_LOCAL_CACHE = 'user_api_permission'
 
 def format_permission_data(permission: Permission, only_basic=False):
     """格式化权限数据"""
@@ -59,15 +68,24 @@ def get_user_perm_json_all(user_uuid, is_user_name=False):
     - 用户所在用户组的角色包含的权限
     - 用户所在用户组的所有父级用户组的权限
     - 用户所在用户组的所有父级用户组的角色包含的权限
+
+    返回的JSON可能是进程内缓存中共享的对象，只读；调用方需要修改时自行复制
     """
     try:
         redis_key = f"user_perm_json_all:{user_uuid}"
+
+        # 进程内缓存命中时直接返回共享对象（只读），写入缓存时保存独立副本
+        local_cache = get_local_cache(USER_PERM_LOCAL_CACHE)
+        user_perm_json_all = local_cache.get(redis_key)
+        if user_perm_json_all:
+            return user_perm_json_all
         
         user_perm_json_all = get_redis_value(
             redis_db_name='default',
             redis_key_name=redis_key
         )
         if user_perm_json_all:
+            local_cache.set(redis_key, copy.deepcopy(user_perm_json_all))
             return user_perm_json_all
 
         # color_logger.debug(f"获取用户权限JSON: {user_uuid}")
@@ -124,6 +142,7 @@ def get_user_perm_json_all(user_uuid, is_user_name=False):
             redis_key_value=merged_permission_json,
             set_expire=60
         )
+        local_cache.set(redis_key, copy.deepcopy(merged_permission_json))
 
         return merged_permission_json
         
@@ -135,6 +154,19 @@ def get_user_perm_json_all(user_uuid, is_user_name=False):
         return {}
 
 
+def get_user_api_permission(user_uuid, is_user_name=False):
+    """获取用户预编译的接口权限"""
+    cache_key = f"{'name' if is_user_name else 'uuid'}:{user_uuid}"
+    local_cache = get_local_cache(USER_API_PERM_LOCAL_CACHE)
+    compiled = local_cache.get(cache_key)
+    if compiled is None:
+        user_perm_json_all = get_user_perm_json_all(user_uuid, is_user_name)
+        compiled = get_compiled_api_permission(
+            user_perm_json_all.get('backend', {}).get('api', {}))
+        local_cache.set(cache_key, compiled)
+    return compiled
+
+
 def check_user_api_permission(user_uuid, check_permission_dict, is_user_name=False):
     """
     检查用户是否具有api权限
@@ -145,19 +177,10 @@ def check_user_api_permission(user_uuid, check_permission_dict, is_user_name=Fal
     }
     """
     color_logger.debug(f"检查用户权限: {user_uuid}, {check_permission_dict}")
-    user_api_permission_in_server = get_user_perm_json_all(user_uuid, is_user_name)
-    user_api_permission_in_server = user_api_permission_in_server.get('backend', {}).get('api', {})
-    # color_logger.debug(f"用户api权限JSON: {user_api_permission_in_server}")
+    user_api_permission = get_user_api_permission(user_uuid, is_user_name)
 
     for check_api, check_methods in check_permission_dict.items():
-        if check_api not in user_api_permission_in_server:
-            return False
-        
-        allow_methods = user_api_permission_in_server[check_api]
-        if isinstance(check_methods, str):
-            check_methods = [check_methods]
-        if len(set(check_methods) - set(allow_methods)) > 0:
+        if not user_api_permission.allows(check_api, check_methods):
             return False
 
     return True
-
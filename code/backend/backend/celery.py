@@ -44,6 +44,8 @@ app.conf.update(
     imports=(
         'apps.demo.tasks',
         'apps.monitor.tasks',
+        'apps.audit.tasks',
+        'lib.redis_tasks',
     ),
     beat_schedule={
         # 每30秒 测试任务
@@ -65,6 +67,16 @@ app.conf.update(
         'check-all-alerts': {
             'task': 'apps.monitor.tasks.check_all_alerts',
             'schedule': timedelta(minutes=1),  # 每1分钟执行一次
+        },
+        # 每5分钟重建仪表板概要统计计数器
+        'reconcile-dashboard-summary': {
+            'task': 'apps.monitor.tasks.reconcile_dashboard_summary',
+            'schedule': timedelta(minutes=5),
+        },
+        # 每10分钟汇总节点健康记录（小时/天）
+        'rollup-node-health-records': {
+            'task': 'apps.monitor.tasks.rollup_node_health_records',
+            'schedule': timedelta(minutes=10),
         }
     }
 )
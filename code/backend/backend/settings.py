@@ -116,6 +116,8 @@ MIDDLEWARE = [
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
 
     'apps.myAuth.middleware.AuthMiddleware',
+    # 请求范围内批量写入审计日志
+    'apps.audit.middleware.AuditLogBufferMiddleware',
 ]
 
 ROOT_URLCONF = 'backend.urls'
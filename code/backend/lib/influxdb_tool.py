@@ -4,6 +4,7 @@ from django.conf import settings
 from lib.log import color_logger
 import os
 import re
+from datetime import timezone as dt_timezone
 
 
 class InfluxDBManager:
@@ -103,6 +104,71 @@ class InfluxDBManager:
             color_logger.error(f"Failed to write node health data to InfluxDB: {str(e)}")
             # 记录错误但不抛出异常，以避免影响正常业务流程
     
+    def write_base_info_health_data(self, base_info_details):
+        """
+        批量写入基础信息健康数据到InfluxDB
+        :param base_info_details: [{'uuid': 基础信息ID, 'is_healthy': True/False/None, 'error_type': 失败类型, 'dns_time': 解析耗时}, ...]
+        """
+        try:
+            if not self.write_api:
+                self.connect()
+
+            points = []
+            for detail in base_info_details:
+                is_healthy = detail.get('is_healthy')
+                healthy_status = 'unknown' if is_healthy is None else ('green' if is_healthy else 'red')
+                point = (
+                    Point("base_info_health")
+                    .tag("base_info_id", str(detail['uuid']))
+                    .field("healthy_status", healthy_status)
+                    .time(None, WritePrecision.NS)
+                )
+                if detail.get('error_type'):
+                    point.field("error_type", detail['error_type'])
+                if detail.get('dns_time') is not None:
+                    point.field("dns_time", float(detail['dns_time']))
+                points.append(point)
+
+            if points:
+                self.write_api.write(bucket=self.bucket, org=self.org, record=points)
+
+        except Exception as e:
+            color_logger.error(f"Failed to write base info health data to InfluxDB: {str(e)}")
+
+    def iter_health_records(self, measurement, tag_key, start_time, end_time):
+        """
+        流式读取 [start_time, end_time) 内的健康记录（不一次性加载到内存），同一目标的记录连续且按时间排序
+        :param measurement: node_health / base_info_health
+        :param tag_key: node_id / base_info_id
+        :param start_time: 时区感知的开始时间
+        :param end_time: 时区感知的结束时间
+        :return: 生成器，元素为 (目标ID, 时间, 健康状态, 响应时间)
+        """
+        if not self.query_api:
+            self.connect()
+
+        # range 需要时间类型，显式转换 RFC3339 字符串
+        start_time_formatted = f'time(v: "{start_time.astimezone(dt_timezone.utc).isoformat()}")'
+        end_time_formatted = f'time(v: "{end_time.astimezone(dt_timezone.utc).isoformat()}")'
+        query = f'''
+        from(bucket: "{self.bucket}")
+          |> range(start: {start_time_formatted}, stop: {end_time_formatted})
+          |> filter(fn: (r) => r["_measurement"] == "{measurement}")
+          |> filter(fn: (r) => r["_field"] == "healthy_status" or r["_field"] == "response_time")
+          |> pivot(rowKey: ["_time"], columnKey: ["_field"], valueColumn: "_value")
+          |> group(columns: ["{tag_key}"])
+          |> sort(columns: ["_time"])
+        '''
+
+        # 按目标分组、组内按时间排序，同一目标的记录连续输出，调用方可逐个时间桶流式汇总
+        for record in self.query_api.query_stream(org=self.org, query=query):
+            yield (
+                record.values.get(tag_key),
+                record.get_time(),
+                record.values.get('healthy_status'),
+                record.values.get('response_time'),
+            )
+
     def query_node_health_data(self, node_uuid, start_time, end_time=None, limit=100):
         """查询节点健康数据"""
         try:
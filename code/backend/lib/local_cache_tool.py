@@ -0,0 +1,200 @@
+"""
+进程内本地缓存
+
+在 Redis 前面加一层进程内 TTL + LRU 缓存，用于鉴权、权限等高频读取的数据，
+命中时不产生任何网络请求。
+
+失效方式：
+- TTL 到期自动失效（兜底，保证最终一致）
+- 通过 Redis pub/sub 广播失效消息，所有进程中的同名缓存立即剔除对应的 key
+"""
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+
+from django_redis import get_redis_connection
+
+from backend.settings import config_data
+from lib.log import color_logger
+
+# 失效广播使用的 Redis 库与频道
+LOCAL_CACHE_REDIS_DB = 'default'
+LOCAL_CACHE_INVALIDATE_CHANNEL = 'local_cache_invalidate'
+
+_MISSING = object()
+
+
+def get_local_cache_config():
+    """获取本地缓存配置"""
+    return config_data.get('LOCAL_CACHE', {}) or {}
+
+
+class LocalTTLCache:
+    """线程安全的 TTL + LRU 缓存"""
+
+    def __init__(self, name, max_size=1024, ttl=5):
+        self.name = name
+        self.max_size = max_size
+        self.ttl = ttl
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key, default=None):
+        """获取缓存值，不存在或已过期时返回 default"""
+        with self._lock:
+            item = self._data.get(key, _MISSING)
+            if item is _MISSING:
+                return default
+
+            expire_at, value = item
+            if expire_at < time.monotonic():
+                del self._data[key]
+                return default
+
+            self._data.move_to_end(key)
+            return value
+
+    def set(self, key, value, ttl=None):
+        """设置缓存值，超出容量时淘汰最久未使用的 key"""
+        expire_at = time.monotonic() + (self.ttl if ttl is None else ttl)
+        with self._lock:
+            self._data[key] = (expire_at, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.max_size:
+                self._data.popitem(last=False)
+
+    def delete(self, key):
+        with self._lock:
+            self._data.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def __len__(self):
+        return len(self._data)
+
+
+_local_caches = {}
+_local_caches_lock = threading.Lock()
+
+# 订阅线程按进程启动，fork 出来的子进程需要重新启动
+_listener_pid = None
+_listener_lock = threading.Lock()
+
+
+def get_local_cache(name, max_size=None, ttl=None):
+    """
+    获取（或创建）指定名称的进程内缓存
+
+    :param name: 缓存名称，失效广播按名称匹配
+    :param max_size: 最大条目数，默认读取配置 LOCAL_CACHE.MAX_SIZE
+    :param ttl: 过期时间（秒），默认读取配置 LOCAL_CACHE.TTL
+    """
+    cache = _local_caches.get(name)
+    if cache is None:
+        cache_config = get_local_cache_config()
+        with _local_caches_lock:
+            cache = _local_caches.get(name)
+            if cache is None:
+                cache = LocalTTLCache(
+                    name,
+                    max_size=max_size or cache_config.get('MAX_SIZE', 1024),
+                    ttl=ttl if ttl is not None else cache_config.get('TTL', 5)
+                )
+                _local_caches[name] = cache
+
+    _ensure_invalidate_listener()
+    return cache
+
+
+def invalidate_local_cache(name, key=None, broadcast=True):
+    """
+    使本地缓存失效
+
+    :param name: 缓存名称
+    :param key: 需要失效的 key，None 表示清空整个缓存
+    :param broadcast: 是否通过 Redis 广播给其他进程
+    """
+    _evict_local_cache(name, key)
+
+    if not broadcast:
+        return
+
+    try:
+        redis_conn = get_redis_connection(LOCAL_CACHE_REDIS_DB)
+        redis_conn.publish(
+            LOCAL_CACHE_INVALIDATE_CHANNEL,
+            json.dumps({'name': name, 'key': key})
+        )
+    except Exception as e:
+        # 广播失败时其他进程依赖 TTL 兜底失效
+        color_logger.error(f"广播本地缓存失效消息失败: {name}, {key}, {e}")
+
+
+def _evict_local_cache(name, key=None):
+    cache = _local_caches.get(name)
+    if cache is None:
+        return
+    if key is None:
+        cache.clear()
+    else:
+        cache.delete(key)
+
+
+def _ensure_invalidate_listener():
+    """确保当前进程已启动失效消息订阅线程"""
+    global _listener_pid
+
+    if not get_local_cache_config().get('PUBSUB_INVALIDATE', True):
+        return
+
+    current_pid = os.getpid()
+    if _listener_pid == current_pid:
+        return
+
+    with _listener_lock:
+        if _listener_pid == current_pid:
+            return
+        _listener_pid = current_pid
+        thread = threading.Thread(
+            target=_invalidate_listener_loop,
+            name='local-cache-invalidate-listener',
+            daemon=True
+        )
+        thread.start()
+
+
+def _invalidate_listener_loop():
+    """订阅失效频道，断线后自动重连"""
+    while True:
+        pubsub = None
+        try:
+            redis_conn = get_redis_connection(LOCAL_CACHE_REDIS_DB)
+            pubsub = redis_conn.pubsub(ignore_subscribe_messages=True)
+            pubsub.subscribe(LOCAL_CACHE_INVALIDATE_CHANNEL)
+            # 重连期间可能丢失消息，保守起见清空所有本地缓存
+            for cache in list(_local_caches.values()):
+                cache.clear()
+
+            for message in pubsub.listen():
+                if message.get('type') != 'message':
+                    continue
+                try:
+                    data = json.loads(message.get('data'))
+                except (TypeError, ValueError):
+                    continue
+                _evict_local_cache(data.get('name'), data.get('key'))
+        except Exception as e:
+            color_logger.error(f"本地缓存失效订阅异常，5秒后重连: {e}")
+            for cache in list(_local_caches.values()):
+                cache.clear()
+            time.sleep(5)
+        finally:
+            if pubsub is not None:
+                try:
+                    pubsub.close()
+                except Exception:
+                    pass
@@ -1,6 +1,10 @@
+import base64
+import json
+from datetime import datetime
 from django.core.paginator import Paginator, EmptyPage, InvalidPage
-from typing import Union, List, Tuple
-from django.db.models import QuerySet
+from typing import Optional, Union, List, Tuple
+from django.db import connections
+from django.db.models import Q, QuerySet
 
 
 def pub_paging_tool(page: int, query: Union[QuerySet, List], page_size: int = 20) -> Tuple[bool, int, List, int, Union[QuerySet, List]]:
@@ -24,9 +28,9 @@ def pub_paging_tool(page: int, query: Union[QuerySet, List], page_size: int = 20
         
         return bool(end < total), page + 1, list(range(1, (total // page_size) + 2)), total, data
     
-    # 处理 QuerySet
-    total = query.count()
+    # 处理 QuerySet（总数由 Paginator 统计，避免重复 count）
     paginator = Paginator(query, page_size)
+    total = paginator.count
     
     try:
         current_page = paginator.page(page)
@@ -34,4 +38,110 @@ def pub_paging_tool(page: int, query: Union[QuerySet, List], page_size: int = 20
         current_page = paginator.page(1)
     
     return bool(current_page.has_next()), current_page.next_page_number() if current_page.has_next() else 1, \
-           list(range(1, paginator.num_pages + 1)), total, current_page.object_list
\ No newline at end of file
+           list(range(1, paginator.num_pages + 1)), total, current_page.object_list
+
+
+def is_cursor_paging(body: dict) -> bool:
+    """请求是否使用游标分页（pagination=cursor 或带有 cursor 参数）"""
+    return body.get('pagination') == 'cursor' or bool(body.get('cursor'))
+
+
+def encode_paging_cursor(create_time: datetime, uuid_value, direction: str) -> str:
+    """生成不透明的游标"""
+    raw = json.dumps({
+        't': create_time.isoformat(),
+        'u': str(uuid_value),
+        'd': direction,
+    }, separators=(',', ':'))
+    return base64.urlsafe_b64encode(raw.encode('utf-8')).decode('ascii').rstrip('=')
+
+
+def decode_paging_cursor(cursor: str) -> Tuple[datetime, str, str]:
+    """解析游标，返回 (create_time, uuid, direction)"""
+    try:
+        padding = '=' * (-len(cursor) % 4)
+        data = json.loads(base64.urlsafe_b64decode(cursor + padding).decode('utf-8'))
+        direction = data.get('d', 'next')
+        if direction not in ('next', 'prev'):
+            raise ValueError(direction)
+        return datetime.fromisoformat(data['t']), data['u'], direction
+    except Exception as e:
+        raise ValueError(f"无效的分页游标: {cursor}") from e
+
+
+def get_approximate_count(query: QuerySet) -> Optional[int]:
+    """
+    从表统计信息获取近似总数（仅 MySQL）
+
+    只有查询条件仅为软删除过滤（is_del）时才使用表统计，其他情况返回 None
+    """
+    for child in query.query.where.children:
+        target = getattr(getattr(child, 'lhs', None), 'target', None)
+        if target is None or target.name != 'is_del':
+            return None
+
+    connection = connections[query.db]
+    if connection.vendor != 'mysql':
+        return None
+
+    with connection.cursor() as cursor:
+        cursor.execute(
+            "SELECT TABLE_ROWS FROM information_schema.TABLES "
+            "WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = %s",
+            [query.model._meta.db_table]
+        )
+        row = cursor.fetchone()
+    return int(row[0]) if row and row[0] is not None else None
+
+
+def pub_cursor_paging_tool(query: QuerySet, cursor: Optional[str] = None, page_size: int = 20,
+                           with_count: bool = False) -> Tuple[bool, Optional[str], Optional[str], Optional[int], List]:
+    """游标（keyset）分页工具
+
+    按 (create_time, uuid) 倒序分页，不使用 OFFSET，不统计精确总数，也不返回分页列表，
+    适合 audit_log、alert 等大表的深度翻页。
+
+    Args:
+        query: 查询集（模型需包含 create_time 和 uuid 字段）
+        cursor: 上一次返回的 next_cursor / prev_cursor，为空表示第一页
+        page_size: 每页数量
+        with_count: 是否返回近似总数（来自表统计信息，无法获取时为 None）
+
+    Returns:
+        Tuple[bool, Optional[str], Optional[str], Optional[int], List]:
+        (是否有下一页, 下一页游标, 上一页游标, 近似总数, 当前页数据)
+    """
+    total = get_approximate_count(query) if with_count else None
+    query = query.order_by()
+
+    direction = 'next'
+    if cursor:
+        create_time, uuid_value, direction = decode_paging_cursor(cursor)
+        if direction == 'next':
+            query = query.filter(
+                Q(create_time__lt=create_time) | Q(create_time=create_time, uuid__lt=uuid_value)
+            ).order_by('-create_time', '-uuid')
+        else:
+            query = query.filter(
+                Q(create_time__gt=create_time) | Q(create_time=create_time, uuid__gt=uuid_value)
+            ).order_by('create_time', 'uuid')
+    else:
+        query = query.order_by('-create_time', '-uuid')
+
+    # 多取一条判断是否还有更多数据
+    data = list(query[:page_size + 1])
+    has_more = len(data) > page_size
+    data = data[:page_size]
+
+    if direction == 'next':
+        has_next = has_more
+        has_prev = bool(cursor)
+    else:
+        data.reverse()
+        has_next = True
+        has_prev = has_more
+
+    next_cursor = encode_paging_cursor(data[-1].create_time, data[-1].uuid, 'next') if data and has_next else None
+    prev_cursor = encode_paging_cursor(data[0].create_time, data[0].uuid, 'prev') if data and has_prev else None
+
+    return has_next, next_cursor, prev_cursor, total, data
@@ -0,0 +1,23 @@
+"""
+Redis 相关的 Celery 任务
+
+lib.redis_tool 中的函数均为同步调用，不依赖 Celery；
+确实需要异步写入（不关心结果、不阻塞当前请求）时使用这里的任务。
+"""
+from celery import shared_task
+
+from lib.redis_tool import set_redis_value
+
+
+# 沿用原 lib.redis_tool.set_redis_value 的任务名，兼容队列中已有的消息
+@shared_task(name='lib.redis_tool.set_redis_value')
+def set_redis_value_task(redis_db_name, redis_key_name, redis_key_value, set_expire=3600):
+    set_redis_value(redis_db_name, redis_key_name, redis_key_value, set_expire)
+
+
+def set_redis_value_async(redis_db_name, redis_key_name, redis_key_value, set_expire=3600):
+    """
+    异步设置 Redis 键值（由 Celery worker 执行）
+    :param redis_key_value: 键值，需可被 Celery 的 JSON 序列化
+    """
+    return set_redis_value_task.delay(redis_db_name, redis_key_name, redis_key_value, set_expire)
@@ -1,32 +1,131 @@
 import json
 import uuid
+from contextlib import contextmanager
 from django_redis import get_redis_connection
+from backend.settings import config_data
 from lib.json_tools import DateTimeEncoder
 from lib.log import color_logger
-from celery import shared_task
+
+try:
+    import msgpack
+except ImportError:  # 可选依赖，未安装时只使用 JSON
+    msgpack = None
+    if (config_data.get('REDIS', {}) or {}).get('VALUE_CODEC') == 'msgpack':
+        color_logger.warning("REDIS.VALUE_CODEC 配置为 msgpack，但未安装 msgpack，使用 JSON 编码")
+
+# msgpack 编码的值以该字节开头（msgpack 中永不使用的字节），与 JSON 编码的旧数据区分
+MSGPACK_VALUE_PREFIX = b'\xc1'
+# SCAN / MGET 每批处理的键数量
+REDIS_SCAN_BATCH_SIZE = 500
+
+
+def get_redis_value_codec():
+    """值编码方式：json（默认）/ msgpack（需安装 msgpack）"""
+    codec = (config_data.get('REDIS', {}) or {}).get('VALUE_CODEC', 'json')
+    if codec == 'msgpack' and msgpack is None:
+        return 'json'
+    return codec
+
+
+def _msgpack_default(value):
+    # 与 DateTimeEncoder 保持一致
+    return DateTimeEncoder().default(value)
+
+
+def encode_redis_value(value):
+    """编码写入 Redis 的值"""
+    if get_redis_value_codec() == 'msgpack':
+        return MSGPACK_VALUE_PREFIX + msgpack.packb(value, default=_msgpack_default, use_bin_type=True)
+    return json.dumps(value, cls=DateTimeEncoder)
+
+
+def decode_redis_value(redis_data):
+    """解码 Redis 中的值，兼容 JSON 和 msgpack 编码"""
+    if not redis_data:
+        return None
+    if isinstance(redis_data, bytes) and redis_data.startswith(MSGPACK_VALUE_PREFIX):
+        if msgpack is None:
+            raise RuntimeError('读取 msgpack 编码的值需要安装 msgpack')
+        return msgpack.unpackb(redis_data[len(MSGPACK_VALUE_PREFIX):], raw=False)
+    return json.loads(redis_data)
+
+
+def _decode_key(key):
+    return key.decode('utf-8') if isinstance(key, bytes) else key
+
 
 def get_redis_value(redis_db_name, redis_key_name):
     redis_conn = get_redis_connection(redis_db_name)
-    redis_data = redis_conn.get(redis_key_name)
-    
-    if redis_data:
-        return json.loads(redis_data)
-    
-    return None
+    return decode_redis_value(redis_conn.get(redis_key_name))
 
-def get_redis_value_with_prefix(redis_db_name, redis_key_prefix):
+
+def scan_keys(redis_db_name, pattern, count=REDIS_SCAN_BATCH_SIZE):
+    """基于 SCAN 迭代匹配的键（不阻塞 Redis）"""
     redis_conn = get_redis_connection(redis_db_name)
-    redis_data = redis_conn.keys(redis_key_prefix)
-    # color_logger.debug(f'redis_key_prefix: {redis_key_prefix}')
-    # color_logger.debug(f'redis_data: {redis_data}')
-    
-    if redis_data:
-        return {key.decode('utf-8') if isinstance(key, bytes) else key: json.loads(redis_conn.get(key)) for key in redis_data}
-    
-    return None
+    for key in redis_conn.scan_iter(match=pattern, count=count):
+        yield _decode_key(key)
+
+
+def mget_values(redis_db_name, redis_key_names):
+    """
+    批量获取（一次 MGET）
+    :return: {键名: 值}，不存在的键不返回
+    """
+    redis_key_names = list(redis_key_names)
+    if not redis_key_names:
+        return {}
+    redis_conn = get_redis_connection(redis_db_name)
+    return {
+        _decode_key(key): decode_redis_value(redis_data)
+        for key, redis_data in zip(redis_key_names, redis_conn.mget(redis_key_names))
+        if redis_data
+    }
+
+
+def mset_values(redis_db_name, redis_key_values, set_expire=3600):
+    """
+    批量设置（一次往返）
+    :param redis_key_values: {键名: 值}
+    :param set_expire: 过期时间（秒），None 表示永不过期
+    """
+    if not redis_key_values:
+        return
+    with redis_pipeline(redis_db_name) as pipeline:
+        for redis_key_name, redis_key_value in redis_key_values.items():
+            pipeline.set(redis_key_name, encode_redis_value(redis_key_value), ex=set_expire)
+
+
+@contextmanager
+def redis_pipeline(redis_db_name, transaction=False):
+    """
+    Redis pipeline 上下文，退出时一次性发送所有命令
+    with redis_pipeline('default') as pipeline:
+        pipeline.set(...)
+        pipeline.expire(...)
+    """
+    pipeline = get_redis_connection(redis_db_name).pipeline(transaction=transaction)
+    try:
+        yield pipeline
+        pipeline.execute()
+    finally:
+        pipeline.reset()
+
+
+def get_redis_value_with_prefix(redis_db_name, redis_key_prefix):
+    """获取匹配的所有键值（SCAN 分批 + MGET）"""
+    result = {}
+    batch = []
+    for key in scan_keys(redis_db_name, redis_key_prefix):
+        batch.append(key)
+        if len(batch) >= REDIS_SCAN_BATCH_SIZE:
+            result.update(mget_values(redis_db_name, batch))
+            batch = []
+    if batch:
+        result.update(mget_values(redis_db_name, batch))
+
+    return result or None
         
 
-@shared_task
 def set_redis_value(redis_db_name, redis_key_name, redis_key_value, set_expire=3600):
     """
     设置 Redis 键值
@@ -34,51 +133,164 @@ def set_redis_value(redis_db_name, redis_key_name, redis_key_value, set_expire=3
     :param redis_key_name: 键名
     :param redis_key_value: 键值
     :param set_expire: 过期时间（秒），默认为 3600 秒，None 表示永不过期
+
+    同步执行；需要异步写入时使用 lib.redis_tasks.set_redis_value_async
     """
     redis_conn = get_redis_connection(redis_db_name)
     
-    # 更新 Redis
-    if set_expire is not None:
-        # 设置带过期时间的键值
-        redis_conn.set(
-            redis_key_name,
-            json.dumps(redis_key_value, cls=DateTimeEncoder),
-            ex=set_expire
-        )
-    else:
-        # 设置永不过期的键值
-        redis_conn.set(
-            redis_key_name,
-            json.dumps(redis_key_value, cls=DateTimeEncoder)
-        )
+    # 更新 Redis（set_expire 为 None 时永不过期）
+    redis_conn.set(redis_key_name, encode_redis_value(redis_key_value), ex=set_expire)
 
 
-def delete_redis_value(redis_db_name, redis_key_name):
+def delete_redis_value(redis_db_name, redis_key_name, *redis_key_names):
+    """删除一个或多个键（一次 DEL）"""
     redis_conn = get_redis_connection(redis_db_name)
-    redis_conn.delete(redis_key_name)
+    redis_conn.delete(redis_key_name, *redis_key_names)
 
 
-def can_get_work_lock(redis_db_name, work_flag, lock_time=10, need_expire=False):
-    redis_conn = get_redis_connection(redis_db_name)
-    redis_key_name = f'work_lock_{work_flag}'
-    if redis_conn.exists(redis_key_name):
-        _key_expire = redis_conn.ttl(redis_key_name)
+# 获取锁：SET NX PX 成功后递增 fencing token，两步在同一脚本内原子完成
+_LOCK_ACQUIRE_SCRIPT = """
+if redis.call('SET', KEYS[1], ARGV[1], 'NX', 'PX', ARGV[2]) then
+    return redis.call('INCR', KEYS[2])
+end
+return 0
+"""
+
+# 释放锁：只删除自己持有的锁
+_LOCK_RELEASE_SCRIPT = """
+if redis.call('GET', KEYS[1]) == ARGV[1] then
+    return redis.call('DEL', KEYS[1])
+end
+return 0
+"""
+
+# 续期：只续期自己持有的锁
+_LOCK_EXTEND_SCRIPT = """
+if redis.call('GET', KEYS[1]) == ARGV[1] then
+    return redis.call('PEXPIRE', KEYS[1], ARGV[2])
+end
+return 0
+"""
+
+
+class RedisLock:
+    """
+    分布式锁
+
+    - SET NX PX 原子获取，锁的值为持有者令牌
+    - 释放/续期通过 Lua 脚本比较令牌，不会误删其他持有者的锁
+    - 每次获取成功递增 fencing token，下游可据此丢弃过期持有者的操作
+    """
+
+    def __init__(self, redis_db_name, name, ttl=10, token=None):
+        """
+        :param redis_db_name: Redis 数据库名
+        :param name: 锁的键名
+        :param ttl: 锁的过期时间（秒），持有者异常退出时自动释放
+        :param token: 持有者令牌，默认随机生成
+        """
+        self.redis_db_name = redis_db_name
+        self.name = name
+        self.ttl = ttl
+        self.token = token or uuid.uuid4().hex
+        self.fence_token = None
+
+    @staticmethod
+    def get_fence_key(name):
+        return f'{name}:fence'
+
+    @classmethod
+    def get_current_fence_token(cls, redis_db_name, name):
+        """获取锁当前（最近一次获取）的 fencing token"""
+        value = get_redis_connection(redis_db_name).get(cls.get_fence_key(name))
+        return int(value) if value else 0
+
+    def acquire(self):
+        """获取锁，成功时返回 True 并设置 fence_token"""
+        fence_token = get_redis_connection(self.redis_db_name).eval(
+            _LOCK_ACQUIRE_SCRIPT, 2, self.name, self.get_fence_key(self.name),
+            self.token, int(self.ttl * 1000)
+        )
+        if not fence_token:
+            return False
+        self.fence_token = int(fence_token)
+        return True
+
+    def release(self):
+        """释放锁，锁已过期或被其他持有者获取时返回 False"""
+        return bool(get_redis_connection(self.redis_db_name).eval(
+            _LOCK_RELEASE_SCRIPT, 1, self.name, self.token
+        ))
+
+    def extend(self, ttl=None):
+        """续期（重置过期时间），锁已不属于自己时返回 False"""
+        return bool(get_redis_connection(self.redis_db_name).eval(
+            _LOCK_EXTEND_SCRIPT, 1, self.name, self.token, int((ttl or self.ttl) * 1000)
+        ))
+
+    def is_owner(self):
+        value = get_redis_connection(self.redis_db_name).get(self.name)
+        if isinstance(value, bytes):
+            value = value.decode('utf-8')
+        return value == self.token
+
+    def ttl_remaining(self):
+        """锁的剩余时间（秒）"""
+        return get_redis_connection(self.redis_db_name).ttl(self.name)
+
+    def __enter__(self):
+        if not self.acquire():
+            raise RuntimeError(f'获取锁失败: {self.name}')
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.release()
+
+
+# 本进程获取的工作锁 {(redis_db_name, work_flag): RedisLock}，未指定令牌释放时使用
+_work_locks = {}
+
+
+def can_get_work_lock(redis_db_name, work_flag, lock_time=10, need_expire=False, token=None):
+    """
+    获取工作锁
+
+    :param token: 持有者令牌（如任务ID）。由其他进程释放（如一轮任务的最后一个子任务）时需指定，
+                  释放时传入同一令牌；未指定时随机生成，只能由本进程释放
+    """
+    lock = RedisLock(redis_db_name, f'work_lock_{work_flag}', ttl=lock_time, token=token)
+    if not lock.acquire():
+        _key_expire = lock.ttl_remaining()
         color_logger.info(f'获取锁失败: {work_flag}, 剩余时间: {_key_expire}秒')
         if need_expire:
             return False, _key_expire
         else:
             return False
+
+    color_logger.info(f'获取锁成功: {work_flag}')
+    _work_locks[(redis_db_name, work_flag)] = lock
+    if need_expire:
+        return True, 0
     else:
-        color_logger.info(f'获取锁成功: {work_flag}')
-        redis_conn.set(redis_key_name, uuid.uuid4().hex, lock_time)
-        if need_expire:
-            return True, 0
-        else:
-            return True
+        return True
 
 
-def release_work_lock(redis_db_name, work_flag):
-    redis_conn = get_redis_connection(redis_db_name)
-    color_logger.info(f'释放锁: {work_flag}')
-    redis_key_name = f'work_lock_{work_flag}'
-    redis_conn.delete(redis_key_name)
+def release_work_lock(redis_db_name, work_flag, token=None):
+    """
+    释放工作锁，只释放令牌一致（仍由自己持有）的锁
+
+    :param token: 获取锁时指定的令牌，未指定时使用本进程获取锁时的令牌
+    """
+    lock = _work_locks.pop((redis_db_name, work_flag), None)
+    if token is not None:
+        lock = RedisLock(redis_db_name, f'work_lock_{work_flag}', token=token)
+    elif lock is None:
+        color_logger.warning(f'释放锁失败，未指定令牌且锁不是由当前进程获取: {work_flag}')
+        return False
+
+    released = lock.release()
+    if released:
+        color_logger.info(f'释放锁: {work_flag}')
+    else:
+        color_logger.warning(f'释放锁失败，锁已过期或被其他任务持有: {work_flag}')
+    return released
@@ -11,9 +11,14 @@ from apps.myAuth.token_utils import TokenManager
 from lib.log import color_logger
 from backend.settings import config_data
 import threading
+import contextvars
 
 _thread_locals = threading.local()
 
+# 当前请求的操作者信息 (username, ip_address)，由中间件在校验token后设置
+# 使用 contextvar 以便在 ASGI 下同样按请求隔离；None 表示尚未解析
+_current_operator = contextvars.ContextVar('current_operator', default=None)
+
 def set_current_request(request):
     """设置当前请求到线程本地存储"""
     _thread_locals.request = request
@@ -22,6 +27,18 @@ def get_current_request():
     """从线程本地存储获取当前请求"""
     return getattr(_thread_locals, 'request', None)
 
+def set_current_operator(username, ip_address):
+    """设置当前请求的操作者信息，返回用于 reset 的 token"""
+    return _current_operator.set((username, ip_address))
+
+def reset_current_operator(token):
+    """恢复操作者信息到 set 之前的状态"""
+    _current_operator.reset(token)
+
+def get_current_operator():
+    """获取当前请求的操作者信息 (username, ip_address)，未解析时返回 None"""
+    return _current_operator.get()
+
 def get_client_ip(request):
     """获取客户端IP"""
     x_forwarded_for = request.META.get('HTTP_X_FORWARDED_FOR')
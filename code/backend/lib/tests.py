@@ -0,0 +1,76 @@
+from unittest import mock
+
+from django.test import SimpleTestCase
+from django_redis import get_redis_connection
+
+from celery.app.task import Task
+
+from lib import redis_tool
+from lib.redis_tasks import set_redis_value_async, set_redis_value_task
+from lib.redis_tool import can_get_work_lock, get_redis_value, release_work_lock, set_redis_value
+
+WORK_FLAG = 'lib_tests_work_lock'
+
+
+class WorkLockTest(SimpleTestCase):
+    """工作锁由其他进程（如一轮任务的最后一个子任务）释放"""
+
+    def setUp(self):
+        self.lock_key = f'work_lock_{WORK_FLAG}'
+        get_redis_connection('default').delete(self.lock_key)
+
+    def tearDown(self):
+        get_redis_connection('default').delete(self.lock_key)
+
+    def _in_other_process(self):
+        # 其他进程没有本进程记录的锁
+        return mock.patch.dict(redis_tool._work_locks, clear=True)
+
+    def test_release_with_token_from_other_process(self):
+        self.assertTrue(can_get_work_lock('default', WORK_FLAG, lock_time=30, token='sweep-1'))
+        with self._in_other_process():
+            self.assertTrue(release_work_lock('default', WORK_FLAG, token='sweep-1'))
+        self.assertFalse(get_redis_connection('default').exists(self.lock_key))
+        self.assertTrue(can_get_work_lock('default', WORK_FLAG, lock_time=30))
+
+    def test_release_requires_owner_token(self):
+        self.assertTrue(can_get_work_lock('default', WORK_FLAG, lock_time=30, token='sweep-1'))
+        self.assertEqual(can_get_work_lock('default', WORK_FLAG, lock_time=30, need_expire=True, token='sweep-2')[0], False)
+        with self._in_other_process():
+            self.assertFalse(release_work_lock('default', WORK_FLAG, token='sweep-2'))
+            self.assertFalse(release_work_lock('default', WORK_FLAG))
+        self.assertTrue(get_redis_connection('default').exists(self.lock_key))
+
+    def test_release_in_same_process_without_token(self):
+        self.assertTrue(can_get_work_lock('default', WORK_FLAG, lock_time=30))
+        self.assertTrue(release_work_lock('default', WORK_FLAG))
+        self.assertFalse(get_redis_connection('default').exists(self.lock_key))
+
+
+class SetRedisValueTest(SimpleTestCase):
+    """set_redis_value 同步写入，不投递 Celery 任务；异步写入使用原任务名"""
+
+    KEY = 'lib_tests_set_redis_value'
+
+    def tearDown(self):
+        get_redis_connection('default').delete(self.KEY)
+
+    def test_sync_path_does_not_dispatch_task(self):
+        with mock.patch.object(Task, 'apply_async', autospec=True) as apply_async:
+            set_redis_value('default', self.KEY, {'a': 1}, set_expire=60)
+        apply_async.assert_not_called()
+        self.assertEqual(get_redis_value('default', self.KEY), {'a': 1})
+
+    def test_async_path_dispatches_renamed_task(self):
+        with mock.patch.object(Task, 'apply_async', autospec=True) as apply_async:
+            set_redis_value_async('default', self.KEY, {'a': 1}, set_expire=60)
+        apply_async.assert_called_once()
+        task, args = apply_async.call_args[0][:2]
+        self.assertEqual(task.name, 'lib.redis_tool.set_redis_value')
+        self.assertEqual(tuple(args), ('default', self.KEY, {'a': 1}, 60))
+        # 队列中的消息按任务名路由到同一个任务
+        self.assertIs(task.app.tasks['lib.redis_tool.set_redis_value'], set_redis_value_task._get_current_object())
+
+    def test_task_writes_value(self):
+        set_redis_value_task.apply(args=('default', self.KEY, {'a': 2}, 60)).get()
+        self.assertEqual(get_redis_value('default', self.KEY), {'a': 2})